@@ -0,0 +1,29 @@
+import os
+import tempfile
+from typing import Callable
+import pytest
+from watdo.database import Database
+from watdo.backends import Backend
+from watdo.backends.memory import MemoryBackend
+from watdo.backends.sqlite import SQLiteBackend
+
+
+def create_sqlite_backend() -> Backend:
+    return SQLiteBackend(os.path.join(tempfile.mkdtemp(), "watdo.sqlite3"))
+
+
+def create_fake_redis_backend() -> Backend:
+    """Runs the Lua sources of the scripts, unlike the other backends."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from watdo.backends.redis_backend import RedisBackend
+
+    return RedisBackend(fakeredis.FakeAsyncRedis())
+
+
+@pytest.fixture(
+    params=[MemoryBackend, create_sqlite_backend, create_fake_redis_backend]
+)
+def db(request: pytest.FixtureRequest) -> Database:
+    create_backend: Callable[[], Backend] = request.param
+    return Database(create_backend())
@@ -0,0 +1,389 @@
+import time
+import asyncio
+from uuid import uuid4
+from typing import Any, Coroutine, TypeVar
+import pytest
+from watdo import scripts
+from watdo.models import Profile, Task, ScheduledTask
+from watdo.database import Database
+from watdo.errors import VersionConflict
+from watdo.safe_data import (
+    TaskCategory,
+    TaskDescription,
+    TaskTitle,
+    Timestamp,
+    UnitRange,
+)
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+def create_profile(db: Database) -> Profile:
+    return Profile(
+        db,
+        utc_offset=0,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+def create_task(db: Database, profile: Profile, title: str, category: str) -> Task:
+    return Task(
+        db,
+        profile=profile,
+        title=title,
+        category=category,
+        importance=0,
+        energy=0,
+        description=None,
+        last_done=None,
+        profile_id=profile.uuid.value,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+async def get_stored_task(db: Database, profile: Profile, uuid: str) -> Any:
+    """The record of a task and every index entry about it."""
+    profile_id = profile.uuid.value
+    categories = await db.hgetall(Task._categories_key(profile_id))
+    return (
+        await db.hget_bytes(Task._records_key(profile_id), uuid),
+        await db.hgetall(Task._meta_key(profile_id)),
+        await db.hgetall(Task._titles_key(profile_id)),
+        categories,
+        {c: await db.smembers(Task._category_key(profile_id, c)) for c in categories},
+        await db.zrangebyscore(Task._priorities_key(profile_id), "-inf", "+inf"),
+        await db.zrangebyscore_withscores(Task._reminders_key(), "-inf", "+inf"),
+    )
+
+
+class TestBackends:
+    def test_commands(self, db: Database) -> None:
+        run(db.set("key", "value"))
+        run(db.hset("hash", key="a", value="1"))
+        run(db.sadd("set", "a", "b"))
+        run(db.lpush("list", "a"))
+        run(db.lpush("list", "b"))
+
+        assert run(db.get("key")) == "value"
+        assert run(db.hincrby("hash", "a", 2)) == 3
+        assert run(db.hgetall("hash")) == {"a": "3"}
+        assert sorted(run(db.smembers("set"))) == ["a", "b"]
+        assert run(db.lrange("list")) == ["b", "a"]
+        assert run(db.delete("key", "hash", "missing")) == 2
+        assert run(db.get("key")) is None
+
+    def test_sorted_set_ranges(self, db: Database) -> None:
+        run(db.zadd("zset", {"a": 1, "b": 2, "c": 3}))
+
+        assert run(db.zrangebyscore("zset", "-inf", 2)) == ["a", "b"]
+        assert run(db.zrangebyscore("zset", "(1", "+inf")) == ["b", "c"]
+        assert run(
+            db.zrangebyscore_withscores("zset", "(1", "+inf", start=0, num=1)
+        ) == [("b", 2)]
+
+    def test_pipeline(self, db: Database) -> None:
+        async def execute() -> Any:
+            async with db.transaction() as pipe:
+                pipe.set("key", "value")
+                pipe.get("key")
+                pipe.hsetnx("hash", key="a", value="1")
+                pipe.hsetnx("hash", key="a", value="2")
+                return await pipe.execute()
+
+        assert run(execute()) == [True, "value", True, False]
+
+    def test_iter_keys(self, db: Database) -> None:
+        async def iter_keys() -> Any:
+            return sorted([k async for k in db.iter_keys("profile.*")])
+
+        run(db.set("profile.a", "1"))
+        run(db.hset("profile.b", key="a", value="1"))
+        run(db.set("task.a", "1"))
+
+        assert run(iter_keys()) == ["profile.a", "profile.b"]
+
+    def test_task_scripts(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+
+        task = create_task(db, profile, "a", "x")
+        run(task.save())
+        run(create_task(db, profile, "b", "x").save())
+
+        stored_task = run(Task.from_title(db, profile, "a"))
+        assert stored_task is not None
+        assert run(Task.get_category_counts(db, profile)) == {"x": 2}
+
+        stored_task.category = TaskCategory("y")
+        run(stored_task.save())
+        assert run(Task.get_category_counts(db, profile)) == {"x": 1, "y": 1}
+
+        run(stored_task.done())
+        assert run(Task.from_title(db, profile, "a")) is None
+        assert run(Task.get_category_counts(db, profile)) == {"x": 1}
+
+    def test_stale_writes_conflict(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        run(create_task(db, profile, "a", "x").save())
+
+        task = run(Task.from_title(db, profile, "a"))
+        stale_task = run(Task.from_title(db, profile, "a"))
+        assert task is not None and stale_task is not None
+        assert task.version.value == 1
+
+        task.title = TaskTitle("b")
+        run(task.save())
+        assert task.version.value == 2
+        stored_task = run(Task.from_title(db, profile, "b"))
+        assert stored_task is not None and stored_task.version.value == 2
+
+        stored = run(get_stored_task(db, profile, task.uuid.value))
+        stale_task.title = TaskTitle("c")
+        stale_task.category = TaskCategory("y")
+
+        for write in (stale_task.save, stale_task.update, stale_task.complete):
+            with pytest.raises(VersionConflict):
+                run(write())
+
+            assert stale_task.version.value == 1
+            assert run(get_stored_task(db, profile, task.uuid.value)) == stored
+
+        with pytest.raises(VersionConflict):
+            run(Task.save_many(db, [stale_task]))
+
+        assert run(get_stored_task(db, profile, task.uuid.value)) == stored
+
+    def test_unchecked_write(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        run(create_task(db, profile, "a", "x").save())
+
+        task = run(Task.from_title(db, profile, "a"))
+        stale_task = run(Task.from_title(db, profile, "a"))
+        assert task is not None and stale_task is not None
+        run(task.save())
+
+        # An empty expected version skips the check
+        stale_task.title = TaskTitle("c")
+        result = run(
+            db.run_script(
+                scripts.SAVE_TASK,
+                stale_task._script_keys(),
+                stale_task._write_args(False, is_checked=False),
+            )
+        )
+        assert result != scripts.CONFLICT and result
+
+        stored_task = run(Task.from_title(db, profile, "c"))
+        assert stored_task is not None
+        assert stored_task.uuid.value == task.uuid.value
+        assert run(Task.from_title(db, profile, "a")) is None
+
+    def test_update_where_retries_conflicts(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        run(Task.save_many(db, [create_task(db, profile, t, "x") for t in "abcd"]))
+        tasks = run(Task.get_tasks_of_profile(db, profile))
+
+        # Writes of another process, after the tasks were loaded
+        changed_task = run(Task.from_title(db, profile, "b"))
+        assert changed_task is not None
+        changed_task.description = TaskDescription("Changed")
+        run(changed_task.save())
+
+        unmatched_task = run(Task.from_title(db, profile, "c"))
+        assert unmatched_task is not None
+        unmatched_task.category = TaskCategory("y")
+        run(unmatched_task.save())
+
+        deleted_task = run(Task.from_title(db, profile, "d"))
+        assert deleted_task is not None
+        run(deleted_task.delete())
+
+        def update(task: Task) -> None:
+            task.importance = UnitRange(1)
+
+        updated_count = run(
+            tasks.update_where(update, where=lambda t: t.category.value == "x")
+        )
+        assert updated_count == 2
+
+        stored_tasks = {
+            t.title.value: t for t in run(Task.get_tasks_of_profile(db, profile))
+        }
+        assert sorted(stored_tasks) == ["a", "b", "c"]
+        assert stored_tasks["a"].importance.value == 1
+        assert stored_tasks["b"].importance.value == 1
+        assert stored_tasks["c"].importance.value == 0
+
+        # Updated on top of the other write
+        description = stored_tasks["b"].description
+        assert description is not None and description.value == "Changed"
+        assert stored_tasks["b"].version.value == 3
+
+    def test_save_many_reports_conflicts(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        run(Task.save_many(db, [create_task(db, profile, t, "x") for t in "ab"]))
+        tasks = run(Task.get_tasks_of_profile(db, profile)).items
+
+        changed_task = run(Task.from_title(db, profile, "b"))
+        assert changed_task is not None
+        run(changed_task.save())
+
+        for task in tasks:
+            task.importance = UnitRange(1)
+
+        with pytest.raises(VersionConflict) as error:
+            run(Task.save_many(db, tasks))
+
+        assert [t.title.value for t in error.value.tasks] == ["b"]
+
+        # The others are saved anyway
+        stored_tasks = run(Task.get_tasks_of_profile(db, profile))
+        importances = {t.title.value: t.importance.value for t in stored_tasks}
+        assert importances == {"a": 1, "b": 0}
+
+    def test_delete_where(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        run(Task.save_many(db, [create_task(db, profile, t, "x") for t in "abc"]))
+        tasks = run(Task.get_tasks_of_profile(db, profile))
+
+        deleted_task = run(Task.from_title(db, profile, "b"))
+        assert deleted_task is not None
+        run(deleted_task.delete())
+
+        assert run(tasks.delete_where(where=lambda t: t.title.value != "c")) == 1
+        assert [t.title.value for t in tasks] == ["c"]
+        assert [t.title.value for t in run(Task.get_tasks_of_profile(db, profile))] == [
+            "c"
+        ]
+
+    def test_priority_index(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+
+        tasks = [create_task(db, profile, title, "x") for title in "abc"]
+        tasks[1].importance = UnitRange(1)
+
+        for created_at, task in enumerate(tasks):
+            task.created_at = Timestamp(created_at)
+        run(Task.save_many(db, tasks))
+
+        def titles(**kwargs: Any) -> Any:
+            tasks = run(Task.get_by_priority(db, profile, **kwargs))
+            return [t.title.value for t in tasks]
+
+        assert titles() == ["b", "c", "a"]
+        assert titles(start=1, num=1) == ["c"]
+
+        run(tasks[0].done())
+        assert titles() == ["b", "c"]
+        assert run(Task.count_undone(db, profile)) == 2
+
+    def test_exhausted_recurrence(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+
+        task = ScheduledTask(
+            db,
+            profile=profile,
+            title="a",
+            category="x",
+            importance=0,
+            energy=0,
+            description=None,
+            last_done=None,
+            profile_id=profile.uuid.value,
+            due="DTSTART:20200101T090000\nRRULE:FREQ=DAILY;COUNT=2",
+            uuid=uuid4().hex,
+            created_at=time.time(),
+            created_by=10**17,
+            channel_id=10**17,
+        )
+        run(task.save())
+        assert not task.is_done
+        assert run(Task.count_undone(db, profile)) == 1
+
+        # No occurrence is left after it's done
+        done_task = run(task.done())
+        assert isinstance(done_task, ScheduledTask)
+        assert done_task.due_date is None
+        assert done_task.is_done
+        assert not done_task.is_overdue
+        assert run(Task.count_undone(db, profile)) == 0
+
+        with pytest.raises(ValueError, match="already done"):
+            run(done_task.complete())
+
+    def test_migrate_legacy_tasks(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        profile_id = profile.uuid.value
+
+        stored_task = create_task(db, profile, "a", "x")
+        run(stored_task.save())
+        legacy_task = create_task(db, profile, "b", "x")
+        stale_task = create_task(db, profile, "old a", "x")
+        stale_task.uuid = stored_task.uuid
+
+        for task in (legacy_task, stale_task):
+            run(db.lpush(Task._legacy_key(profile_id), task.as_json_str()))
+
+        run(db.delete(Task._schema_key(profile_id)))
+        Task._migrated_profiles.discard(profile_id)
+
+        assert run(Task.migrate_profile(db, profile_id)) == 1
+        assert run(db.lrange(Task._legacy_key(profile_id))) == []
+
+        titles = [t.title.value for t in run(Task.get_tasks_of_profile(db, profile))]
+        assert sorted(titles) == ["a", "b"]
+
+    def test_rebuild_keeps_concurrent_writes(
+        self, db: Database, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        profile_id = profile.uuid.value
+
+        deleted_task = create_task(db, profile, "a", "x")
+        renamed_task = create_task(db, profile, "b", "x")
+        run(Task.save_many(db, [deleted_task, renamed_task]))
+
+        read_records = db.hvals_bytes
+
+        async def write_after_read(name: str) -> Any:
+            # Writes of another process, landing after the records were read
+            records = await read_records(name)
+            await deleted_task.delete()
+            renamed_task.title = TaskTitle("c")
+            renamed_task.category = TaskCategory("y")
+            await renamed_task.save()
+            return records
+
+        monkeypatch.setattr(db, "hvals_bytes", write_after_read)
+        run(db.delete(Task._schema_key(profile_id)))
+        run(Task.migrate_profile(db, profile_id))
+
+        assert run(Task.from_uuid(db, profile, deleted_task.uuid.value)) is None
+        assert run(Task.from_title(db, profile, "b")) is None
+
+        stored_task = run(Task.from_title(db, profile, "c"))
+        assert stored_task is not None
+        assert stored_task.version.value == renamed_task.version.value
+        assert run(Task.get_category_counts(db, profile)) == {"y": 1}
+        assert run(Task.count_undone(db, profile)) == 1
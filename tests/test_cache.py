@@ -0,0 +1,298 @@
+import time
+import asyncio
+from uuid import uuid4
+from typing import Any, Coroutine, List, TypeVar
+import pytest
+from watdo import cache, codecs, models
+from watdo.cache import TTLCache
+from watdo.models import PROFILE_INVALIDATIONS_CHANNEL, Profile
+from watdo.database import Database
+from watdo.backends.memory import MemoryBackend
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> Database:
+    # Caches of this test alone, as they're shared by the whole process
+    for name in ("_cache", "_channel_cache"):
+        monkeypatch.setattr(Profile, name, TTLCache(max_size=16, ttl=60))
+
+    return Database(MemoryBackend())
+
+
+def create_profile(db: Database, utc_offset: float = 0) -> Profile:
+    return Profile(
+        db,
+        utc_offset=utc_offset,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+class TestTTLCache:
+    def test_expiry(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        ttl_cache.set("a", 1)
+
+        clock.now += 9.9
+        assert ttl_cache.get("a") == 1
+
+        clock.now += 0.1
+        with pytest.raises(KeyError):
+            ttl_cache.get("a")
+
+        assert len(ttl_cache) == 0
+        assert (ttl_cache.hits, ttl_cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2)
+        assert ttl_cache.get("a") == 1
+
+        ttl_cache.set("c", 3)
+        assert len(ttl_cache) == 2
+        assert ttl_cache.get("a") == 1
+        assert ttl_cache.get("c") == 3
+
+        with pytest.raises(KeyError):
+            ttl_cache.get("b")
+
+    def test_invalidate(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2)
+        generation = ttl_cache.generation
+
+        ttl_cache.invalidate("a")
+        assert ttl_cache.generation != generation
+        assert ttl_cache.get("b") == 2
+
+        with pytest.raises(KeyError):
+            ttl_cache.get("a")
+
+        ttl_cache.clear()
+        assert len(ttl_cache) == 0
+
+    def test_set_after_invalidation(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        generation = ttl_cache.generation
+        ttl_cache.invalidate("b")
+
+        ttl_cache.set("a", 1, generation=generation)
+        assert len(ttl_cache) == 0
+
+    def test_load_racing_invalidation_isnt_cached(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        values = [1, 2]
+
+        async def scenario() -> List[int]:
+            loaded = asyncio.Event()
+            invalidated = asyncio.Event()
+
+            async def slow_load() -> int:
+                value = values.pop(0)
+                loaded.set()
+                await invalidated.wait()
+                return value
+
+            slow_get = asyncio.create_task(ttl_cache.get_or_load("a", slow_load))
+            await loaded.wait()
+
+            # The value being loaded is already stale
+            ttl_cache.invalidate("a")
+            invalidated.set()
+
+            return [await slow_get, await ttl_cache.get_or_load("a", slow_load)]
+
+        assert run(scenario()) == [1, 2]
+        assert ttl_cache.get("a") == 2
+
+    def test_concurrent_loads_share_a_call(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+        calls: List[str] = []
+
+        async def load() -> int:
+            calls.append("a")
+            await asyncio.sleep(0.01)
+            return 1
+
+        async def scenario() -> List[int]:
+            return await asyncio.gather(
+                *(ttl_cache.get_or_load("a", load) for _ in range(5))
+            )
+
+        assert run(scenario()) == [1] * 5
+        assert calls == ["a"]
+
+    def test_failed_load_isnt_cached(self, clock: Clock) -> None:
+        ttl_cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=10)
+
+        async def failing_load() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError("Failed")
+
+        async def scenario() -> List[Any]:
+            return await asyncio.gather(
+                *(ttl_cache.get_or_load("a", failing_load) for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        assert [type(e) for e in run(scenario())] == [ValueError] * 3
+        assert len(ttl_cache) == 0
+
+
+class TestProfileCache:
+    def test_save_is_seen_by_next_read(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+
+        copy = run(Profile.from_id(db, profile.uuid.value))
+        assert copy is not None
+        copy.utc_offset = 8
+        run(copy.save())
+
+        stored_profile = run(Profile.from_id(db, profile.uuid.value))
+        assert stored_profile is not None
+        assert stored_profile.utc_offset.value == 8
+
+    def test_load_racing_save_isnt_cached(
+        self, db: Database, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+        Profile._cache.clear()
+        get_bytes = db.get_bytes
+
+        async def scenario() -> Any:
+            read = asyncio.Event()
+            saved = asyncio.Event()
+
+            async def slow_get_bytes(name: str) -> Any:
+                raw_data = await get_bytes(name)
+                read.set()
+                await saved.wait()
+                return raw_data
+
+            with monkeypatch.context() as patch:
+                patch.setattr(db, "get_bytes", slow_get_bytes)
+                slow_read = asyncio.create_task(Profile.from_id(db, profile.uuid.value))
+                await read.wait()
+
+            profile.utc_offset = 8
+            await profile.save()
+            saved.set()
+            await slow_read
+
+            return await Profile.from_id(db, profile.uuid.value)
+
+        stored_profile = run(scenario())
+        assert stored_profile is not None
+        assert stored_profile.utc_offset.value == 8
+
+    def test_from_ids(self, db: Database) -> None:
+        profiles = [create_profile(db, utc_offset=i) for i in range(3)]
+
+        for profile in profiles:
+            run(profile.save())
+
+        Profile._cache.clear()
+        run(Profile.from_id(db, profiles[0].uuid.value))
+        missing_uuid = uuid4().hex
+        uuids = [p.uuid.value for p in profiles] + [missing_uuid]
+
+        result = run(Profile.from_ids(db, uuids))
+        assert {u: p and p.utc_offset.value for u, p in result.items()} == {
+            **{p.uuid.value: p.utc_offset.value for p in profiles},
+            missing_uuid: None,
+        }
+
+        # All of them are cached now, missing ones included
+        assert len(Profile._cache) == 4
+        hits = Profile._cache.hits
+        run(Profile.from_ids(db, uuids))
+        assert Profile._cache.hits == hits + 4
+
+    def test_channels(self, db: Database) -> None:
+        profile = create_profile(db)
+        run(profile.save())
+
+        assert run(Profile.from_channel_id(db, 1)) is None
+
+        run(profile.add_channel(1))
+        channel_profile = run(Profile.from_channel_id(db, 1))
+        assert channel_profile is not None
+        assert channel_profile.uuid.value == profile.uuid.value
+
+    def test_invalidations_over_pubsub(
+        self, db: Database, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(models, "PROFILE_CACHE_PUBSUB", True)
+        profile = create_profile(db)
+        run(profile.save())
+        run(profile.add_channel(1))
+        key = Profile._key(profile.uuid.value)
+
+        async def scenario() -> Any:
+            listener = asyncio.create_task(Profile.listen_for_invalidations(db))
+
+            # Subscribed once the cache got cleared
+            while len(Profile._cache):
+                await asyncio.sleep(0.01)
+
+            await Profile.from_id(db, profile.uuid.value)
+            await Profile.from_channel_id(db, 1)
+
+            # Writes of another process
+            other_profile = create_profile(db, utc_offset=8)
+            other_profile.uuid = profile.uuid
+            await db.set(key, other_profile.as_record())
+            await db.publish(PROFILE_INVALIDATIONS_CHANNEL, key)
+            await db.delete(Profile._channel_key(1))
+            await db.publish(PROFILE_INVALIDATIONS_CHANNEL, Profile._channel_key(1))
+            await asyncio.sleep(0.01)
+
+            try:
+                return (
+                    await Profile.from_id(db, profile.uuid.value),
+                    await Profile.from_channel_id(db, 1),
+                )
+            finally:
+                listener.cancel()
+
+        stored_profile, channel_profile = run(scenario())
+        assert stored_profile is not None
+        assert stored_profile.utc_offset.value == 8
+        assert channel_profile is None
+
+    def test_records_use_the_codec(self, db: Database) -> None:
+        profile = create_profile(db, utc_offset=5.5)
+        run(profile.save())
+
+        raw_data = run(db.get_bytes(Profile._key(profile.uuid.value)))
+        assert raw_data is not None
+        assert codecs.decode_record(raw_data) == profile.as_json()
@@ -0,0 +1,117 @@
+import json
+from typing import Any, Dict
+import pytest
+from watdo import codecs
+from watdo.environ import RECORD_CODEC
+from watdo.codecs import MAGIC, FORMAT_VERSION, JSONCodec, BinaryCodec
+
+
+def create_record(**fields: Any) -> Dict[str, Any]:
+    return {
+        "uuid": "6e0a3e69c27f45a1ae7596debcd01587",
+        "created_at": 1700000000.25,
+        "created_by": 10**17,
+        "channel_id": 10**17 + 1,
+        "title": "Write tests",
+        "category": "Work",
+        "importance": 1,
+        "energy": -0.5,
+        "description": None,
+        "last_done": None,
+        "profile_id": "0f6e5c8c0d1f4f4b9b0b0a2f3e4d5c6b",
+        "version": 3,
+        "due": "DTSTART:20240101T090000\nRRULE:FREQ=DAILY",
+        "has_reminder": True,
+        "is_auto_done": False,
+        "next_reminder": 1700003600.0,
+        **fields,
+    }
+
+
+class TestCodecs:
+    def test_binary_round_trip(self) -> None:
+        record = create_record()
+        raw_data = BinaryCodec().encode(record)
+
+        assert raw_data[:1] == MAGIC
+        assert BinaryCodec().decode(raw_data) == record
+        assert codecs.decode_record(raw_data) == record
+
+    def test_round_trip_keeps_value_types(self) -> None:
+        decoded = BinaryCodec().decode(BinaryCodec().encode(create_record()))
+
+        assert type(decoded["importance"]) is int
+        assert type(decoded["energy"]) is float
+        assert decoded["has_reminder"] is True
+        assert decoded["is_auto_done"] is False
+        assert decoded["description"] is None
+
+    @pytest.mark.parametrize(
+        "value",
+        [2**63 - 1, -(2**63), 2**63, -(2**63) - 1, 10**30, -(10**30)],
+    )
+    def test_large_ints(self, value: int) -> None:
+        record = create_record(created_by=value)
+        assert BinaryCodec().decode(BinaryCodec().encode(record)) == record
+
+    @pytest.mark.parametrize(
+        "text", ["", "Café ☕", "買い物", "🧹 Clean up\nthe room", "a\x00b"]
+    )
+    def test_unicode(self, text: str) -> None:
+        record = create_record(title=text, description=text)
+        assert BinaryCodec().decode(BinaryCodec().encode(record)) == record
+
+    def test_missing_fields(self) -> None:
+        record = {"uuid": "a" * 32, "title": "Only a few fields", "energy": 0}
+        assert BinaryCodec().decode(BinaryCodec().encode(record)) == record
+
+    def test_reads_legacy_json_records(self) -> None:
+        record = create_record()
+        legacy_data = json.dumps(record)
+
+        assert codecs.decode_record(legacy_data) == record
+        assert codecs.decode_record(legacy_data.encode()) == record
+        assert codecs.decode_record(JSONCodec().encode(record)) == record
+
+    def test_unknown_field_is_stored_as_json(self) -> None:
+        record = create_record(not_tagged_yet="value")
+
+        with pytest.raises(ValueError):
+            BinaryCodec().encode(record)
+
+        if RECORD_CODEC == "binary":
+            assert codecs.encode_record(record)[:1] != MAGIC
+
+        assert codecs.decode_record(codecs.encode_record(record)) == record
+
+    def test_unknown_field_tag(self) -> None:
+        raw_data = MAGIC + bytes((FORMAT_VERSION, 1, 255, 0))
+
+        with pytest.raises(ValueError, match="Unknown field tag"):
+            BinaryCodec().decode(raw_data)
+
+    def test_unknown_value_kind(self) -> None:
+        raw_data = MAGIC + bytes((FORMAT_VERSION, 1, 1, 200))
+
+        with pytest.raises(ValueError, match="Unknown value kind"):
+            BinaryCodec().decode(raw_data)
+
+    def test_unknown_format_version(self) -> None:
+        raw_data = BinaryCodec().encode(create_record())
+        raw_data = raw_data[:1] + bytes((FORMAT_VERSION + 1,)) + raw_data[2:]
+
+        with pytest.raises(ValueError, match="Unknown record format version"):
+            BinaryCodec().decode(raw_data)
+
+    @pytest.mark.parametrize("size", [40, -1])
+    def test_truncated_record(self, size: int) -> None:
+        raw_data = BinaryCodec().encode(create_record())
+
+        with pytest.raises(ValueError):
+            BinaryCodec().decode(raw_data[:size])
+
+    def test_trailing_bytes(self) -> None:
+        raw_data = BinaryCodec().encode(create_record())
+
+        with pytest.raises(ValueError):
+            BinaryCodec().decode(raw_data + b"x")
@@ -0,0 +1,315 @@
+import math
+import time
+import asyncio
+import random
+import itertools
+from uuid import uuid4
+from collections import defaultdict
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence, TypeVar
+import pytest
+from watdo import dt
+from watdo.models import Profile, Task, ScheduledTask
+from watdo.database import Database
+from watdo.collections import TaskCounts, TasksCollection
+from watdo.backends.memory import MemoryBackend
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+# Few distinct values, so the tasks tie on every field
+IMPORTANCES = [0, 0.5, 1]
+DUES: List[Optional[float | str]] = [
+    None,
+    1700000000.0,
+    1800000000.0,
+    "DTSTART:20231101T090000\nRRULE:FREQ=DAILY",
+    "DTSTART:20231101T090000\nRRULE:FREQ=WEEKLY;COUNT=10",
+    # Runs out once done, after it's due
+    "DTSTART:20231101T090000\nRRULE:FREQ=DAILY;COUNT=2",
+]
+LAST_DONES = [None, 1700000000.0, 1700086400.0]
+CREATED_ATS = [1600000000.0, 1600000001.0]
+CATEGORIES = ["x", "y", "z", "y"]
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+def create_tasks(db: Database, profile: Profile) -> List[Task]:
+    """Every combination of the values above, newest first like tasks are
+    loaded."""
+    tasks: List[Task] = []
+
+    for importance, due, last_done, created_at in itertools.product(
+        IMPORTANCES, DUES, LAST_DONES, CREATED_ATS
+    ):
+        kwargs: Dict[str, Any] = dict(
+            profile=profile,
+            title=f"Task {len(tasks)}",
+            category=CATEGORIES[len(tasks) % len(CATEGORIES)],
+            importance=importance,
+            energy=0,
+            description=None,
+            last_done=last_done,
+            profile_id=profile.uuid.value,
+            uuid=uuid4().hex,
+            created_at=created_at,
+            created_by=10**17,
+            channel_id=10**17,
+        )
+
+        if due is None:
+            tasks.append(Task(db, **kwargs))
+        else:
+            kwargs["due"] = due
+            tasks.append(ScheduledTask(db, **kwargs))
+
+    random.Random(0).shuffle(tasks)
+    tasks.sort(key=lambda t: t.created_at.value, reverse=True)
+    return tasks
+
+
+def sort_by_priority(tasks: List[Task]) -> List[Task]:
+    """The order `TasksCollection.sort_by_priority` gave before it was
+    columnar."""
+    items = list(tasks)
+    items.sort(key=lambda t: t.importance.value, reverse=True)
+    items.sort(
+        key=lambda t: (
+            t.due_date.timestamp()
+            if isinstance(t, ScheduledTask) and t.due_date
+            else math.inf
+        )
+    )
+    items.sort(key=lambda t: t.last_done.value if t.last_done else math.inf)
+    return items
+
+
+def count(tasks: List[Task]) -> TaskCounts:
+    """What the summary counted before `TasksCollection.count`."""
+    total = important = overdue = recurring = one_time = done = 0
+
+    for task in tasks:
+        total += 1
+
+        if task.importance.value:
+            important += 1
+
+        if isinstance(task, ScheduledTask):
+            if task.is_overdue:
+                overdue += 1
+
+        if isinstance(task, ScheduledTask) and task.is_recurring:
+            recurring += 1
+        else:
+            one_time += 1
+
+        if task.is_done:
+            done += 1
+
+    return TaskCounts(total, important, overdue, recurring, one_time, done)
+
+
+def group_by_category(tasks: List[Task]) -> Dict[str, List[Task]]:
+    """How clist grouped tasks before `TasksCollection.group_by_category`."""
+    categories = defaultdict(list)
+
+    for task in tasks:
+        categories[task.category.value].append(task)
+
+    return dict(categories)
+
+
+def get_dailies(tasks: List[Task], *, overdue_only: bool) -> List[Task]:
+    """The tasks `TasksCollection.get_dailies` gave before it was columnar."""
+    dailies: List[Task] = []
+
+    for task in tasks:
+        if isinstance(task, ScheduledTask) and task.is_daily:
+            if not overdue_only or task.is_overdue:
+                dailies.append(task)
+
+    return dailies
+
+
+def create_many_tasks(profile: Profile) -> List[Task]:
+    """About 5000 tasks."""
+    return [t for _ in range(46) for t in create_tasks(profile.db, profile)]
+
+
+def best_times(
+    functions: Sequence[Callable[[List[Task]], Any]],
+    tasks: Callable[[], List[Task]],
+    *,
+    runs: int = 5,
+) -> List[float]:
+    """The best time of each function on new tasks, plus the best on the same
+    tasks again. They run in turns, so changes in load affect them alike."""
+    cold = [math.inf] * len(functions)
+    warm = [math.inf] * len(functions)
+
+    for _ in range(runs):
+        for i, function in enumerate(functions):
+            run_tasks = tasks()
+            start = time.perf_counter()
+            function(run_tasks)
+            cold[i] = min(cold[i], time.perf_counter() - start)
+
+            start = time.perf_counter()
+            function(run_tasks)
+            warm[i] = min(warm[i], time.perf_counter() - start)
+
+    return [c + w for c, w in zip(cold, warm)]
+
+
+@pytest.fixture
+def profile() -> Profile:
+    return Profile(
+        Database(MemoryBackend()),
+        utc_offset=0,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+@pytest.fixture
+def tasks(profile: Profile) -> List[Task]:
+    return create_tasks(profile.db, profile)
+
+
+class TestTasksCollection:
+    def test_sort_by_priority(self, tasks: List[Task]) -> None:
+        expected = sort_by_priority(tasks)
+        assert TasksCollection(tasks).sort_by_priority().items == expected
+
+    def test_sort_by_priority_empty(self) -> None:
+        assert TasksCollection([]).sort_by_priority().items == []
+
+    def test_sort_by_priority_isnt_slower(self, profile: Profile) -> None:
+        def sort_collection(tasks: List[Task]) -> List[Task]:
+            return TasksCollection(list(tasks)).sort_by_priority().items
+
+        def new_tasks() -> List[Task]:
+            return create_many_tasks(profile)
+
+        new_time, old_time = best_times([sort_collection, sort_by_priority], new_tasks)
+        assert new_time <= old_time
+
+    def test_count(self, tasks: List[Task]) -> None:
+        with dt.frozen_now():
+            expected = count(tasks)
+            assert TasksCollection(tasks).count() == expected
+
+        assert expected.overdue > 0
+        assert expected.done > 0
+        assert TasksCollection([]).count() == TaskCounts(0, 0, 0, 0, 0, 0)
+
+    def test_group_by_category(self, tasks: List[Task]) -> None:
+        groups = TasksCollection(tasks).group_by_category()
+        assert groups == group_by_category(tasks)
+        assert list(groups) == list(group_by_category(tasks))
+
+    @pytest.mark.parametrize("overdue_only", [True, False])
+    def test_get_dailies(self, tasks: List[Task], overdue_only: bool) -> None:
+        with dt.frozen_now():
+            expected = get_dailies(tasks, overdue_only=overdue_only)
+            dailies = TasksCollection(tasks).get_dailies(overdue_only=overdue_only)
+
+        assert dailies == expected
+        assert expected
+
+    def test_columns_are_built_as_needed(self, tasks: List[Task]) -> None:
+        collection = TasksCollection(tasks)
+        columns = collection.columns
+        collection.group_by_category()
+
+        assert collection.columns is columns
+        assert set(vars(columns)) == {"tasks", "_categories"}
+
+        collection.sort_by_priority()
+        assert set(vars(collection.columns)) == {"tasks"}
+        assert collection.columns is not columns
+
+    def test_columns_are_rebuilt_after_updates(self, profile: Profile) -> None:
+        run(profile.save())
+        tasks = create_tasks(profile.db, profile)
+        run(Task.save_many(profile.db, tasks))
+        collection = TasksCollection(tasks)
+        groups = collection.group_by_category()
+
+        def move(task: Task) -> None:
+            task.category = "moved"
+
+        run(collection.update_where(move, where=lambda t: t.category.value == "x"))
+
+        assert collection.group_by_category() == {
+            "moved": groups["x"],
+            "y": groups["y"],
+            "z": groups["z"],
+        }
+
+    def test_iter_by_priority(self, tasks: List[Task]) -> None:
+        expected = sort_by_priority(tasks)
+        assert list(TasksCollection(tasks).iter_by_priority()) == expected
+
+        # Resumes where it was left off
+        iterator = TasksCollection(tasks).iter_by_priority()
+        assert list(itertools.islice(iterator, 5)) == expected[:5]
+        assert list(iterator) == expected[5:]
+
+        # Fewer than a page
+        assert list(TasksCollection(tasks[:3]).iter_by_priority()) == (
+            sort_by_priority(tasks[:3])
+        )
+        assert list(TasksCollection([]).iter_by_priority()) == []
+
+    def test_first_page_is_cheaper_than_sorting(self, profile: Profile) -> None:
+        tasks = create_many_tasks(profile)
+
+        def best_time(take: Callable[[TasksCollection], List[Task]]) -> float:
+            best = math.inf
+
+            for _ in range(10):
+                collection = TasksCollection(list(tasks))
+
+                # Read the fields first, as both need all of them
+                collection.columns.priority_keys()
+
+                start = time.perf_counter()
+                take(collection)
+                best = min(best, time.perf_counter() - start)
+
+            return best
+
+        def iterate(collection: TasksCollection) -> List[Task]:
+            return list(itertools.islice(collection.iter_by_priority(), 10))
+
+        def sort(collection: TasksCollection) -> List[Task]:
+            return collection.sort_by_priority().items[:10]
+
+        assert iterate(TasksCollection(tasks)) == sort(TasksCollection(tasks))
+        assert best_time(iterate) < best_time(sort)
+
+    def test_get_by_priority(self, profile: Profile, tasks: List[Task]) -> None:
+        db = profile.db
+        run(profile.save())
+        run(Task.save_many(db, tasks))
+
+        undone = run(Task.get_tasks_of_profile(db, profile, ignore_done=True))
+        expected = [t.uuid.value for t in sort_by_priority(undone.items)]
+        assert run(Task.count_undone(db, profile)) == len(expected)
+
+        uuids = []
+
+        for start in range(0, len(expected), 7):
+            page = run(Task.get_by_priority(db, profile, start=start, num=7))
+            uuids += [t.uuid.value for t in page]
+
+        assert uuids == expected
+        assert [t.uuid.value for t in run(Task.get_by_priority(db, profile))] == (
+            expected
+        )
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Coroutine, Iterator, List, Optional, Tuple, TypeVar
+import pytest
+from watdo import due_dates
+from watdo.due_dates import TIME_BUCKET, normalize, parse, parse_due
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+# 2024-01-01 12:00 UTC, a Monday and the start of a time bucket
+NOW = 1704110400.0
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+@pytest.fixture
+def parses(monkeypatch: pytest.MonkeyPatch) -> Iterator[List[Tuple[str, float, float]]]:
+    """Records the calls to `parse` made by `parse_due`, from an empty cache."""
+    calls: List[Tuple[str, float, float]] = []
+
+    def record(phrase: str, utc_offset: float, now: float) -> Optional[str | float]:
+        calls.append((phrase, utc_offset, now))
+        return now
+
+    due_dates._cache.clear()
+    monkeypatch.setattr(due_dates, "parse", record)
+    monkeypatch.setattr(due_dates, "time", SimpleNamespace(time=lambda: NOW + 1))
+    yield calls
+    due_dates._cache.clear()
+
+
+class TestDueDates:
+    def test_normalize(self) -> None:
+        assert normalize("  Tomorrow   at\t5PM\n") == "tomorrow at 5pm"
+        assert normalize("") == ""
+
+    def test_absolute(self) -> None:
+        assert parse("2024-03-01 09:00", 0, NOW) == 1709283600.0
+        assert parse("2024-03-01 09:00", 7, NOW) == 1709283600.0 - 7 * 3600
+
+    def test_relative(self) -> None:
+        assert parse("in 2 hours", 0, NOW) == NOW + 2 * 3600
+        assert parse("in 2 hours", 7, NOW) == NOW + 2 * 3600
+        assert parse("tomorrow at 5pm", 0, NOW) == NOW + 29 * 3600
+        assert parse("tomorrow at 5pm", 7, NOW) == NOW + 22 * 3600
+
+    def test_recurring(self) -> None:
+        assert parse("every monday at 9am", 0, NOW) == (
+            "DTSTART:20240101T120000\n"
+            "RRULE:BYDAY=MO;BYHOUR=9;BYMINUTE=0;INTERVAL=1;FREQ=WEEKLY"
+        )
+
+        # Starts at the local time
+        rrule = parse("every monday at 9am", 7, NOW)
+        assert isinstance(rrule, str)
+        assert rrule.startswith("DTSTART:20240101T190000\n")
+
+    @pytest.mark.parametrize("phrase", ["", "gibberish xyz"])
+    def test_unparsable(self, phrase: str) -> None:
+        assert parse(phrase, 0, NOW) is None
+
+    def test_parse_due(self, parses: List[Tuple[str, float, float]]) -> None:
+        # Relative to the start of the time bucket
+        assert run(parse_due("In 2  hours", 0)) == NOW
+        assert parses == [("in 2 hours", 0, NOW)]
+
+    def test_parse_due_cache(
+        self,
+        parses: List[Tuple[str, float, float]],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        run(parse_due("in 2 hours", 0))
+        run(parse_due(" In 2 HOURS ", 0))
+        run(parse_due("in 2 hours", 7))
+
+        monkeypatch.setattr(
+            due_dates, "time", SimpleNamespace(time=lambda: NOW + TIME_BUCKET)
+        )
+        run(parse_due("in 2 hours", 0))
+
+        assert parses == [
+            ("in 2 hours", 0, NOW),
+            ("in 2 hours", 7, NOW),
+            ("in 2 hours", 0, NOW + TIME_BUCKET),
+        ]
+
+    def test_parse_due_concurrent(self, parses: List[Tuple[str, float, float]]) -> None:
+        async def scenario() -> List[Optional[str | float]]:
+            return await asyncio.gather(
+                *(parse_due("in 2 hours", 0) for _ in range(10))
+            )
+
+        assert run(scenario()) == [NOW] * 10
+        assert parses == [("in 2 hours", 0, NOW)]
@@ -0,0 +1,92 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, TypeVar
+import pytest
+from watdo import loop_monitor
+from watdo.metrics import metrics
+from watdo.loop_monitor import LoopMonitor
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch: pytest.MonkeyPatch) -> Any:
+    # Without the handlers get_logger adds, so nothing is written to logs.txt
+    monkeypatch.setattr(loop_monitor, "get_logger", logging.getLogger)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestLoopMonitor:
+    def test_reports_stall(self, caplog: pytest.LogCaptureFixture) -> None:
+        monitor = LoopMonitor(loop, interval=0.01, threshold=0.1)
+
+        async def block_loop() -> None:
+            time.sleep(0.3)
+
+        async def scenario() -> None:
+            monitor.start()
+            await asyncio.sleep(0.05)
+
+            with metrics.scope("blocker"):
+                await asyncio.create_task(block_loop(), name="blocking")
+
+            # Reported once the loop is free again
+            await asyncio.sleep(0.05)
+            monitor.stop()
+
+        with caplog.at_level(logging.WARNING, logger="LoopMonitor"):
+            run(scenario())
+
+        assert metrics.stalls == {"blocker": 1}
+        assert metrics.loop_lag.max >= 0.25
+
+        [record] = caplog.records
+        assert record.levelno == logging.WARNING
+        assert "by blocker (task blocking)" in record.message
+        assert "in block_loop" in record.message
+
+    def test_stop(self) -> None:
+        monitor = LoopMonitor(loop, interval=0.01, threshold=0.1)
+
+        async def scenario() -> None:
+            monitor.start()
+            await asyncio.sleep(0.05)
+            monitor.stop()
+            await asyncio.sleep(0.05)
+
+        run(scenario())
+
+        assert not any(t.name == "LoopMonitor" for t in threading.enumerate())
+        assert loop.get_task_factory() is None
+        assert asyncio.all_tasks(loop) == set()
+        assert metrics.stalls == {}
+
+    def test_quick_callbacks_arent_reported(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        monitor = LoopMonitor(loop, interval=0.01, threshold=0.1)
+
+        async def scenario() -> None:
+            monitor.start()
+
+            for _ in range(5):
+                time.sleep(0.02)
+                await asyncio.sleep(0.01)
+
+            monitor.stop()
+
+        with caplog.at_level(logging.WARNING, logger="LoopMonitor"):
+            run(scenario())
+
+        assert caplog.records == []
+        assert metrics.stalls == {}
@@ -0,0 +1,151 @@
+import math
+import asyncio
+from typing import Any, Coroutine, TypeVar
+import pytest
+from watdo import metrics as metrics_module
+from watdo.metrics import (
+    DEFAULT_SCOPE,
+    LATENCY_BUCKETS,
+    Histogram,
+    Metrics,
+    metrics,
+    payload_size,
+    scoped_task_factory,
+)
+from watdo.database import Database
+from watdo.backends.memory import MemoryBackend
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(metrics_module, "time", clock)
+    return clock
+
+
+def bucket_count(histogram: Histogram, bound: float) -> int:
+    return histogram.counts[histogram.buckets.index(bound)]
+
+
+class TestMetrics:
+    def test_histogram(self) -> None:
+        histogram = Histogram()
+
+        for value in (0.0002, 0.003, 0.003, 0.005, 20):
+            histogram.observe(value)
+
+        # Bounds are inclusive
+        assert bucket_count(histogram, 0.0005) == 1
+        assert bucket_count(histogram, 0.005) == 3
+        assert bucket_count(histogram, math.inf) == 1
+        assert sum(histogram.counts) == histogram.count == 5
+        assert histogram.sum == pytest.approx(20.0112)
+        assert histogram.max == 20
+        assert histogram.quantile(0.5) == 0.005
+        assert histogram.quantile(1) == 20
+        assert Histogram().quantile(0.5) == 0
+
+    def test_measure(self, clock: Clock) -> None:
+        metrics = Metrics()
+
+        with metrics.scope("add"):
+            with metrics.measure("get", "key") as measurement:
+                clock.now += 0.003
+                measurement.set_result("value")
+
+            with metrics.measure("pipeline", ["a", "b"], commands=2):
+                clock.now += 0.02
+
+        operation_stats = metrics.operations["get"]
+        assert operation_stats.calls == 1
+        assert (operation_stats.bytes_out, operation_stats.bytes_in) == (3, 5)
+
+        scope_stats = metrics.scopes["add"]
+        assert scope_stats.invocations == 1
+        assert scope_stats.calls == 2
+        assert scope_stats.commands == 3
+        assert scope_stats.errors == 0
+        assert scope_stats.latency.count == 2
+        assert scope_stats.latency.sum == pytest.approx(0.023)
+        assert bucket_count(scope_stats.latency, 0.005) == 1
+        assert bucket_count(scope_stats.latency, 0.025) == 1
+        assert sum(scope_stats.latency.counts) == 2
+
+        assert metrics.summary().splitlines()[1] == "add: 1, 2.0, 5.0ms/20.0ms, 5/5"
+
+    def test_measure_error(self, clock: Clock) -> None:
+        metrics = Metrics()
+
+        with pytest.raises(ConnectionError):
+            with metrics.measure("get", "key"):
+                clock.now += 1
+                raise ConnectionError
+
+        stats = metrics.scopes[DEFAULT_SCOPE]
+        assert (stats.calls, stats.errors) == (1, 1)
+        assert bucket_count(stats.latency, 1.0) == 1
+
+    def test_scope_is_reset_after_block(self, clock: Clock) -> None:
+        metrics = Metrics()
+
+        with metrics.scope("a"):
+            pass
+
+        with metrics.measure("get", "key"):
+            pass
+
+        assert metrics.scopes["a"].calls == 0
+        assert metrics.scopes[DEFAULT_SCOPE].calls == 1
+
+    def test_tasks_inherit_scope(self) -> None:
+        db = Database(MemoryBackend())
+        metrics.reset()
+
+        async def scenario() -> None:
+            asyncio.get_running_loop().set_task_factory(scoped_task_factory)
+
+            try:
+                with metrics.scope("add"):
+                    task = asyncio.create_task(db.get("key"))
+
+                assert metrics.get_task_scope(task) == "add"
+                await task
+                await db.get("key")
+            finally:
+                asyncio.get_running_loop().set_task_factory(None)
+
+        run(scenario())
+        assert metrics.scopes["add"].calls == 1
+        assert metrics.scopes[DEFAULT_SCOPE].calls == 1
+        assert metrics.operations["get"].calls == 2
+        assert metrics.operations["get"].latency.count == 2
+        metrics.reset()
+
+    def test_payload_size(self) -> None:
+        assert payload_size(None) == 0
+        assert payload_size(b"abc") == payload_size("abc") == 3
+        assert payload_size(12.5) == 4
+        assert payload_size({"a": ["bc", None]}) == 3
+
+    def test_latency_buckets_are_sorted(self) -> None:
+        assert list(LATENCY_BUCKETS) == sorted(LATENCY_BUCKETS)
+        assert LATENCY_BUCKETS[-1] == math.inf
@@ -0,0 +1,157 @@
+import re
+import asyncio
+from typing import Any, Coroutine, Dict, List, Set, TypeVar
+import pytest
+from watdo import metrics_server
+from watdo.metrics import Metrics
+from watdo.database import Database
+from watdo.metrics_server import CONTENT_TYPE, render, serve_metrics
+from watdo.backends.memory import MemoryBackend
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+SAMPLE = re.compile(r"^([a-z_]+)(\{.*\})? (\S+)$")
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+@pytest.fixture
+def metrics(monkeypatch: pytest.MonkeyPatch) -> Metrics:
+    metrics = Metrics()
+    monkeypatch.setattr(metrics_server, "metrics", metrics)
+    return metrics
+
+
+def render_metrics() -> str:
+    """Render on the event loop, as the server does."""
+
+    async def render_on_loop() -> str:
+        return render(Database(MemoryBackend()))
+
+    return run(render_on_loop())
+
+
+def parse(text: str) -> Dict[str, List[str]]:
+    """The sample lines of each declared metric, checking that every sample
+    belongs to a metric declared before it."""
+    types: Dict[str, str] = {}
+    samples: Dict[str, List[str]] = {}
+    helps: Set[str] = set()
+
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            helps.add(line.split()[2])
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            assert name in helps
+            assert kind in ("counter", "gauge", "histogram")
+            types[name] = kind
+            samples[name] = []
+        else:
+            match = SAMPLE.match(line)
+            assert match is not None, line
+            name = match.group(1)
+
+            if name not in types:
+                name = re.sub(r"_(bucket|sum|count)$", "", name)
+                assert types[name] == "histogram", line
+
+            samples[name].append(line)
+
+    return samples
+
+
+class TestMetricsServer:
+    def test_histograms(self, metrics: Metrics) -> None:
+        metrics.observe_command("add", 0.003)
+        metrics.observe_command("add", 0.02)
+        text = render_metrics()
+
+        assert text.endswith("\n")
+        assert "# TYPE watdo_command_latency_seconds histogram" in text
+        assert parse(text)["watdo_command_latency_seconds"] == [
+            'watdo_command_latency_seconds_bucket{command="add",le="0.0005"} 0',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.001"} 0',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.0025"} 0',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.005"} 1',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.01"} 1',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.025"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.05"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.1"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.25"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="0.5"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="1.0"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="2.5"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="5.0"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="10.0"} 2',
+            'watdo_command_latency_seconds_bucket{command="add",le="+Inf"} 2',
+            'watdo_command_latency_seconds_sum{command="add"} 0.023',
+            'watdo_command_latency_seconds_count{command="add"} 2',
+        ]
+
+        # Without labels
+        reminder_lag = parse(text)["watdo_reminder_lag_seconds"]
+        assert reminder_lag[-3] == 'watdo_reminder_lag_seconds_bucket{le="+Inf"} 0'
+        assert reminder_lag[-2:] == [
+            "watdo_reminder_lag_seconds_sum 0.0",
+            "watdo_reminder_lag_seconds_count 0",
+        ]
+
+    def test_counters(self, metrics: Metrics) -> None:
+        with metrics.scope("add"):
+            with metrics.measure("get", "key") as measurement:
+                measurement.set_result("value")
+
+        samples = parse(render_metrics())
+        assert samples["watdo_db_round_trips_total"] == [
+            'watdo_db_round_trips_total{scope="add"} 1'
+        ]
+        assert samples["watdo_db_sent_bytes_total"] == [
+            'watdo_db_sent_bytes_total{scope="add"} 3'
+        ]
+        assert samples["watdo_scope_invocations_total"] == [
+            'watdo_scope_invocations_total{scope="add"} 1'
+        ]
+        assert 'watdo_db_pool_connections{state="in_use"} 0' in (
+            samples["watdo_db_pool_connections"]
+        )
+
+    def test_escapes_label_values(self, metrics: Metrics) -> None:
+        metrics.observe_stall('say "hi"\\\nbye')
+        samples = parse(render_metrics())
+
+        assert samples["watdo_event_loop_stalls_total"] == [
+            'watdo_event_loop_stalls_total{scope="say \\"hi\\"\\\\\\nbye"} 1'
+        ]
+
+    def test_serve(self, metrics: Metrics) -> None:
+        async def request(request_line: bytes) -> bytes:
+            server = await serve_metrics(Database(MemoryBackend()), "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(request_line + b"Host: localhost\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+                return response
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        response = run(request(b"GET /metrics?x=1 HTTP/1.1\r\n"))
+        head, body = response.split(b"\r\n\r\n", 1)
+        assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert f"Content-Type: {CONTENT_TYPE}".encode() in head
+        assert b"# TYPE watdo_background_tasks gauge" in body
+
+        assert run(request(b"GET /other HTTP/1.1\r\n")).startswith(
+            b"HTTP/1.1 404 Not Found\r\n"
+        )
+        assert run(request(b"POST /metrics HTTP/1.1\r\n")).startswith(
+            b"HTTP/1.1 405 Method Not Allowed\r\n"
+        )
@@ -0,0 +1,325 @@
+import time
+import datetime
+from uuid import uuid4
+from typing import Any, Callable, List, Optional
+import pytest
+from dateutil import rrule
+from watdo import dt
+from watdo.errors import InvalidData
+from watdo.models import Profile, Task, ScheduledTask, _compile_rrule
+from watdo.safe_data import SafeData, TaskCategory, TaskTitle, Timestamp
+from watdo.database import Database
+from watdo.backends.memory import MemoryBackend
+
+DAILY = "DTSTART:20200101T090000\nRRULE:FREQ=DAILY"
+RULES = [
+    DAILY,
+    "DTSTART:20240101T190000\nRRULE:BYDAY=MO;BYHOUR=9;BYMINUTE=0;INTERVAL=1;FREQ=WEEKLY",
+    "DTSTART:20240131T080000\nRRULE:FREQ=MONTHLY;COUNT=5",
+]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(dt, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def due_date_calls(monkeypatch: pytest.MonkeyPatch) -> List[ScheduledTask[Any]]:
+    """Tasks whose due date got computed, in order."""
+    calls: List[ScheduledTask[Any]] = []
+    compute: Callable[[ScheduledTask[Any]], Optional[datetime.datetime]] = (
+        ScheduledTask._compute_due_date
+    )
+
+    def record(task: ScheduledTask[Any]) -> Optional[datetime.datetime]:
+        calls.append(task)
+        return compute(task)
+
+    monkeypatch.setattr(ScheduledTask, "_compute_due_date", record)
+    return calls
+
+
+@pytest.fixture
+def db() -> Database:
+    return Database(MemoryBackend())
+
+
+@pytest.fixture
+def profile(db: Database) -> Profile:
+    return Profile(
+        db,
+        utc_offset=7,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+def create_task(db: Database, profile: Profile) -> Task:
+    return Task(
+        db,
+        profile=profile,
+        title="a",
+        category="x",
+        importance=0,
+        energy=0,
+        description=None,
+        last_done=None,
+        profile_id=profile.uuid.value,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+def create_scheduled_task(
+    db: Database, profile: Profile, due: float | str
+) -> ScheduledTask[Any]:
+    return ScheduledTask(
+        db,
+        profile=profile,
+        title="a",
+        category="x",
+        importance=0,
+        energy=0,
+        description=None,
+        last_done=None,
+        profile_id=profile.uuid.value,
+        due=due,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+class TestCompileRRule:
+    @pytest.mark.parametrize("due", RULES)
+    @pytest.mark.parametrize("utc_offset", [0, 7, -3.5])
+    def test_same_occurrences_as_rrulestr(self, due: str, utc_offset: float) -> None:
+        tz = dt.utc_offset_to_tz(utc_offset)
+        expected = list(rrule.rrulestr(due)[:5])
+        occurrences = list(_compile_rrule(due, utc_offset)[:5])
+
+        # The same local times, in the timezone of the offset
+        assert [d.replace(tzinfo=None) for d in occurrences] == expected
+        assert {d.tzinfo for d in occurrences} == {tz}
+
+    def test_is_cached(self) -> None:
+        assert _compile_rrule(DAILY, 7) is _compile_rrule(DAILY, 7)
+        assert _compile_rrule(DAILY, 7) is not _compile_rrule(DAILY, 0)
+
+    def test_shared_rule_cant_be_changed(self, db: Database, profile: Profile) -> None:
+        first = create_scheduled_task(db, profile, DAILY)
+        second = create_scheduled_task(db, profile, DAILY)
+        due_date = second.due_date
+        rule = first.rrule
+
+        rule._until = rule._dtstart
+        assert rule.after(rule._dtstart) is None
+
+        assert first.rrule.after(rule._dtstart) is not None
+        assert _compile_rrule(DAILY, 7)._until is None
+        assert create_scheduled_task(db, profile, DAILY).due_date == due_date
+        assert due_date == datetime.datetime(
+            2020, 1, 2, 9, tzinfo=dt.utc_offset_to_tz(7)
+        )
+
+
+class TestScheduleMemo:
+    def test_memo_is_created_on_first_use(self, db: Database, profile: Profile) -> None:
+        task = create_scheduled_task(db, profile, DAILY)
+        assert task._memo is None
+
+        task.due_date
+        assert list(task._memo or ()) == ["due_date"]
+
+    def test_dropped_when_last_done_changes(
+        self,
+        db: Database,
+        profile: Profile,
+        due_date_calls: List[ScheduledTask[Any]],
+    ) -> None:
+        tz = dt.utc_offset_to_tz(7)
+        task = create_scheduled_task(db, profile, DAILY)
+
+        first_due_date = datetime.datetime(2020, 1, 2, 9, tzinfo=tz)
+        assert [task.due_date, task.is_done, task.due_date] == [
+            first_due_date,
+            False,
+            first_due_date,
+        ]
+        assert len(due_date_calls) == 1
+
+        task.last_done = datetime.datetime(2020, 1, 5, 10, tzinfo=tz).timestamp()
+        assert [task.due_date, task.is_done] == [
+            datetime.datetime(2020, 1, 6, 9, tzinfo=tz),
+            True,
+        ]
+        assert len(due_date_calls) == 2
+
+    def test_dropped_when_due_changes(
+        self,
+        db: Database,
+        profile: Profile,
+        due_date_calls: List[ScheduledTask[Any]],
+    ) -> None:
+        task = create_scheduled_task(db, profile, DAILY)
+        assert [task.is_recurring, task._due_time] == [
+            True,
+            datetime.datetime(2020, 1, 2, 2, tzinfo=datetime.timezone.utc).timestamp(),
+        ]
+
+        task.due = 1000.0
+        assert [task.is_recurring, task._due_time] == [False, 1000.0]
+        assert task.due_date == dt.fromtimestamp(1000.0, 7)
+        assert len(due_date_calls) == 2
+
+    def test_recomputed_once_frozen_now_exits(
+        self,
+        db: Database,
+        profile: Profile,
+        clock: Clock,
+        due_date_calls: List[ScheduledTask[Any]],
+    ) -> None:
+        task = create_scheduled_task(db, profile, 1000.5)
+
+        with dt.frozen_now():
+            is_overdue = [task.is_overdue]
+            clock.now += 1
+            is_overdue.append(task.is_overdue)
+
+        assert len(due_date_calls) == 1
+        is_overdue.append(task.is_overdue)
+
+        # Without frozen time it isn't reused
+        clock.now -= 1
+        is_overdue.append(task.is_overdue)
+        assert is_overdue == [False, False, True, False]
+
+
+class TestFields:
+    @pytest.mark.parametrize(
+        "name, value",
+        [
+            ("title", ""),
+            ("title", "a" * 201),
+            ("category", "a" * 51),
+            ("importance", 1.5),
+            ("energy", -2),
+            ("last_done", -1.0),
+            ("version", -1),
+            ("uuid", "abc"),
+            ("created_by", 1),
+        ],
+    )
+    def test_invalid_assignment(
+        self, db: Database, profile: Profile, name: str, value: Any
+    ) -> None:
+        task = create_task(db, profile)
+        record = task.as_json()
+
+        with pytest.raises(InvalidData):
+            setattr(task, name, value)
+
+        # Left as it was
+        assert task.as_json() == record
+
+    @pytest.mark.parametrize("due", ["daily", 1e11, -1.0])
+    def test_invalid_due(self, db: Database, profile: Profile, due: Any) -> None:
+        task = create_scheduled_task(db, profile, 1000.0)
+
+        with pytest.raises(InvalidData):
+            task.due = due
+
+        assert task.due.value == 1000.0
+
+    def test_invalid_utc_offset(self, profile: Profile) -> None:
+        with pytest.raises(InvalidData):
+            profile.utc_offset = 24
+
+        assert profile.utc_offset.value == 7
+
+    def test_assignment_cleans_values(self, db: Database, profile: Profile) -> None:
+        task = create_task(db, profile)
+        task.title = "  b \n"
+        task.category = TaskCategory(" y ")
+
+        assert task.title.value == "b"
+        assert task.category.value == "y"
+        assert TaskTitle.clean("  c ") == "c"
+
+        with pytest.raises(InvalidData):
+            TaskTitle.clean("  ")
+
+    def test_reads_arent_validated(
+        self, db: Database, profile: Profile, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        task = create_task(db, profile)
+        validated: List[str] = []
+
+        def validate(value: str) -> None:
+            validated.append(value)
+
+        monkeypatch.setattr(TaskTitle, "validate", validate)
+
+        assert [task.title.value, task.title.value] == ["a", "a"]
+        assert validated == []
+
+        # Nor values validated as the same type already
+        task.title = TaskTitle.trusted("b")
+        assert validated == []
+
+        task.title = "c"
+        assert validated == ["c"]
+
+    def test_other_types_are_validated(self, db: Database, profile: Profile) -> None:
+        task = create_task(db, profile)
+
+        # A valid title, but too long for a category
+        with pytest.raises(InvalidData):
+            task.category = TaskTitle("a" * 100)
+
+        assert task.category.value == "x"
+
+    def test_trusted_isnt_validated(self) -> None:
+        assert TaskTitle.trusted("").value == ""
+        assert Timestamp.trusted(-1.0).value == -1.0
+
+        with pytest.raises(InvalidData):
+            TaskTitle("")
+
+    def test_immutable_data(self) -> None:
+        with pytest.raises(AttributeError):
+            TaskTitle("a").set("b")
+
+    def test_no_instance_dict(self, db: Database, profile: Profile) -> None:
+        instances: List[Any] = [
+            profile,
+            create_task(db, profile),
+            create_scheduled_task(db, profile, DAILY),
+            create_scheduled_task(db, profile, 1000.0),
+            TaskTitle("a"),
+            Timestamp(1.0),
+        ]
+
+        for instance in instances:
+            assert not hasattr(instance, "__dict__"), instance
+
+            with pytest.raises(AttributeError):
+                instance.other = 1
+
+        assert all(isinstance(i, SafeData) for i in instances[-2:])
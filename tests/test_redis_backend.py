@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Coroutine, TypeVar
+import pytest
+import redis.exceptions
+from watdo.environ import REDIS_POOL_MAX_SIZE
+from watdo.database import Database
+from watdo.backends import Command
+from watdo.backends.redis_backend import RedisBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+class TestRedisBackend:
+    def test_exhausted_pool_doesnt_reconnect(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        backend = RedisBackend(fakeredis.FakeAsyncRedis())
+        db = Database(backend)
+
+        async def execute(name: str, *args: Any, **kwargs: Any) -> Any:
+            raise redis.exceptions.MaxConnectionsError("Too many connections")
+
+        monkeypatch.setattr(backend, "execute", execute)
+
+        with pytest.raises(redis.exceptions.MaxConnectionsError):
+            run(db.get("key"))
+
+        assert db._reconnect_task is None
+
+    def test_reconnect_keeps_pipelines_in_flight(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        backend = RedisBackend(fakeredis.FakeAsyncRedis())
+        db = Database(backend)
+
+        async def execute(name: str, *args: Any, **kwargs: Any) -> Any:
+            raise redis.exceptions.ConnectionError("Connection refused")
+
+        async def scenario() -> Any:
+            # Holds its connection until something is pushed
+            in_flight = asyncio.create_task(
+                db._execute_many(
+                    [Command("blpop", ("list",), {"timeout": 5})], transaction=False
+                )
+            )
+            await asyncio.sleep(0.1)
+
+            with monkeypatch.context() as patch:
+                patch.setattr(backend, "execute", execute)
+
+                with pytest.raises(redis.exceptions.ConnectionError):
+                    await db.get("key")
+
+            assert db._reconnect_task is not None
+            await db._reconnect_task
+            await db.lpush("list", "a")
+            return await in_flight
+
+        assert run(scenario()) == [(b"list", b"a")]
+        assert db.pool_stats.reconnect_count == 1
+
+    def test_subscription_leaves_pool_to_commands(self) -> None:
+        backend = RedisBackend(
+            fakeredis.FakeAsyncRedis(max_connections=REDIS_POOL_MAX_SIZE)
+        )
+        db = Database(backend)
+
+        async def scenario() -> Any:
+            messages = db.subscribe("channel")
+            assert await anext(messages) is None
+
+            # Each holds a connection until it times out
+            results = await asyncio.gather(
+                *(
+                    db._command("blpop", f"list.{i}", timeout=0.1)
+                    for i in range(REDIS_POOL_MAX_SIZE)
+                )
+            )
+            assert db._reconnect_task is None
+
+            await db.publish("channel", "message")
+            return results, await anext(messages)
+
+        results, message = run(scenario())
+        assert results == [None] * REDIS_POOL_MAX_SIZE
+        assert message == "message"
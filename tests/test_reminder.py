@@ -0,0 +1,250 @@
+import time
+import asyncio
+from uuid import uuid4
+from types import SimpleNamespace
+from typing import Any, Callable, Coroutine, List, Optional, TypeVar
+import pytest
+from watdo.models import Profile, Task, ScheduledTask
+from watdo.database import Database
+from watdo.reminder import Reminder
+from watdo.backends.memory import MemoryBackend
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+DAILY = "DTSTART:20200101T090000\nRRULE:FREQ=DAILY"
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+async def wait_until(predicate: Callable[[], bool], timeout: float = 2) -> None:
+    deadline = time.time() + timeout
+
+    while not predicate():
+        if time.time() > deadline:
+            raise TimeoutError
+
+        await asyncio.sleep(0.01)
+
+
+def create_scheduled_task(
+    db: Database,
+    profile: Profile,
+    title: str,
+    *,
+    due: float | str,
+    next_reminder: float,
+    is_auto_done: bool = False,
+) -> ScheduledTask[Any]:
+    return ScheduledTask(
+        db,
+        profile=profile,
+        title=title,
+        category="x",
+        importance=0,
+        energy=0,
+        description=None,
+        last_done=None,
+        profile_id=profile.uuid.value,
+        due=due,
+        is_auto_done=is_auto_done,
+        next_reminder=next_reminder,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+
+
+@pytest.fixture
+def db() -> Database:
+    return Database(MemoryBackend())
+
+
+@pytest.fixture
+def profile(db: Database) -> Profile:
+    profile = Profile(
+        db,
+        utc_offset=0,
+        uuid=uuid4().hex,
+        created_at=time.time(),
+        created_by=10**17,
+        channel_id=10**17,
+    )
+    run(profile.save())
+    return profile
+
+
+@pytest.fixture
+def reminded() -> List[ScheduledTask[Any]]:
+    """Tasks reminded by `reminder`, in order."""
+    return []
+
+
+@pytest.fixture
+def reminder(
+    db: Database,
+    reminded: List[ScheduledTask[Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Reminder:
+    # Only the listener of this reminder, as the list is shared
+    monkeypatch.setattr(ScheduledTask, "_reminder_listeners", [])
+    reminder = Reminder(loop, db, SimpleNamespace(loop=loop))  # type: ignore[arg-type]
+
+    async def send_reminder(task: ScheduledTask[Any]) -> None:
+        reminded.append(task)
+
+    monkeypatch.setattr(reminder, "_send_reminder", send_reminder)
+    return reminder
+
+
+def run_reminder(reminder: Reminder, scenario: Coroutine[Any, Any, T]) -> T:
+    async def run_scenario() -> T:
+        running = asyncio.create_task(reminder._run())
+
+        try:
+            return await scenario
+        finally:
+            running.cancel()
+
+    return run(run_scenario())
+
+
+async def get_reminders(db: Database) -> List[Any]:
+    return await db.zrangebyscore_withscores(Task._reminders_key(), "-inf", "+inf")
+
+
+class TestReminder:
+    def test_earlier_reminder_wakes_loop(
+        self,
+        db: Database,
+        profile: Profile,
+        reminder: Reminder,
+        reminded: List[ScheduledTask[Any]],
+    ) -> None:
+        later = time.time() + 100
+        run(
+            create_scheduled_task(
+                db, profile, "later", due=later, next_reminder=later
+            ).save()
+        )
+
+        async def scenario() -> Optional[float]:
+            await wait_until(lambda: reminder._next_wake is not None)
+            next_wake = reminder._next_wake
+
+            soon = time.time() + 0.1
+            task = create_scheduled_task(
+                db, profile, "soon", due=soon, next_reminder=soon
+            )
+            await task.save()
+
+            await wait_until(lambda: len(reminded) == 1)
+            return next_wake
+
+        next_wake = run_reminder(reminder, scenario())
+        assert next_wake == pytest.approx(later, abs=1)
+        assert [t.title.value for t in reminded] == ["soon"]
+
+    def test_pending_reminder_isnt_sent_twice(
+        self,
+        db: Database,
+        profile: Profile,
+        reminder: Reminder,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        now = time.time()
+        task = create_scheduled_task(db, profile, "a", due=now, next_reminder=now)
+        run(task.save())
+
+        calls: List[Task] = []
+        written = asyncio.Event()
+
+        async def reschedule(profile: Profile, task: Task) -> None:
+            # Still due while the write is slow
+            calls.append(task)
+            await written.wait()
+
+        monkeypatch.setattr(reminder, "_reschedule", reschedule)
+
+        async def scenario() -> None:
+            await wait_until(lambda: len(calls) == 1)
+
+            for _ in range(3):
+                reminder._wakeup.set()
+                await asyncio.sleep(0.05)
+
+            written.set()
+            await wait_until(lambda: not reminder._pending)
+
+        run_reminder(reminder, scenario())
+        assert len(calls) == 1
+
+    def test_recurring_task_is_rescheduled(
+        self,
+        db: Database,
+        profile: Profile,
+        reminder: Reminder,
+        reminded: List[ScheduledTask[Any]],
+    ) -> None:
+        now = time.time()
+        task = create_scheduled_task(db, profile, "a", due=DAILY, next_reminder=now)
+        run(task.save())
+
+        async def scenario() -> None:
+            await wait_until(lambda: len(reminded) == 1)
+            await wait_until(lambda: not reminder._pending)
+
+        run_reminder(reminder, scenario())
+
+        saved_task = run(Task.from_uuid(db, profile, task.uuid.value))
+        assert isinstance(saved_task, ScheduledTask)
+        assert saved_task.next_reminder is not None
+        next_time = saved_task.next_reminder.value
+
+        # The next occurrence, at 9:00 UTC within a day
+        assert now < next_time <= now + 24 * 3600
+        assert time.gmtime(next_time).tm_hour == 9
+        assert saved_task.version.value == task.version.value + 1
+        assert not saved_task.is_done
+        assert run(get_reminders(db)) == [
+            (f"{profile.uuid.value}:{task.uuid.value}", next_time)
+        ]
+        assert len(reminded) == 1
+
+    @pytest.mark.parametrize("is_auto_done", [True, False])
+    def test_one_time_task_is_unscheduled(
+        self,
+        db: Database,
+        profile: Profile,
+        reminder: Reminder,
+        reminded: List[ScheduledTask[Any]],
+        is_auto_done: bool,
+    ) -> None:
+        now = time.time()
+        task = create_scheduled_task(
+            db, profile, "a", due=now, next_reminder=now, is_auto_done=is_auto_done
+        )
+        run(task.save())
+
+        async def scenario() -> None:
+            await wait_until(lambda: len(reminded) == 1)
+            await wait_until(lambda: not reminder._pending)
+
+        run_reminder(reminder, scenario())
+
+        saved_task = run(Task.from_uuid(db, profile, task.uuid.value))
+
+        # Completing a one time task deletes it
+        if is_auto_done:
+            assert saved_task is None
+        else:
+            assert isinstance(saved_task, ScheduledTask)
+            assert saved_task.next_reminder is None
+            assert not saved_task.is_done
+
+        assert run(get_reminders(db)) == []
+        assert len(reminded) == 1
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, Coroutine, TypeVar
+from watdo.database import Database
+from watdo.discord import Bot
+from watdo.shortcuts import (
+    LEGACY_SEPARATOR,
+    MAX_SHORTCUT_STEPS,
+    MAX_SHORTCUT_DEPTH,
+    ShortcutStep,
+    encode_shortcut,
+    decode_shortcut,
+)
+
+T = TypeVar("T")
+
+loop = asyncio.new_event_loop()
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    return loop.run_until_complete(coro)
+
+
+def expand(db: Database, name: str) -> Any:
+    bot = Bot(loop=loop, database=db)
+    steps = run(db.get_command_shortcut("1", name))
+    assert steps is not None
+    return run(bot._expand_shortcut("1", steps, parents=(name,)))
+
+
+class TestShortcuts:
+    def test_parse_step(self) -> None:
+        assert ShortcutStep.parse("$add Task 1", "$") == ShortcutStep("add", "Task 1")
+        assert ShortcutStep.parse("$list", "$") == ShortcutStep("list", "")
+        assert ShortcutStep.parse("$", "$") == ShortcutStep("", "")
+        assert ShortcutStep.parse("morning", "$") == ShortcutStep(None, "morning")
+
+    def test_step_as_text(self) -> None:
+        for text in ["$add Task 1", "$list", "morning"]:
+            assert ShortcutStep.parse(text, "$").as_text("$") == text
+
+    def test_round_trip(self) -> None:
+        steps = [ShortcutStep("add", 'Task "1"'), ShortcutStep(None, "morning")]
+        assert decode_shortcut(encode_shortcut(steps)) == steps
+
+    def test_reads_legacy_shortcuts(self) -> None:
+        raw_data = LEGACY_SEPARATOR.join(["$add Task 1", "morning"])
+
+        assert decode_shortcut(raw_data) == [
+            ShortcutStep(None, "$add Task 1"),
+            ShortcutStep(None, "morning"),
+        ]
+
+    def test_database(self, db: Database) -> None:
+        steps = [ShortcutStep("add", "Task 1"), ShortcutStep("list", "")]
+
+        assert run(db.get_command_shortcut("1", "morning")) is None
+        assert run(db.get_all_command_shortcuts("1")) == {}
+
+        # The cached empty table gets invalidated by writes
+        run(db.set_command_shortcut("1", "morning", steps))
+        run(db.set_command_shortcut("1", "evening", steps[1:]))
+        assert run(db.get_command_shortcut("1", "morning")) == steps
+        assert run(db.get_all_command_shortcuts("1")) == {
+            "morning": steps,
+            "evening": steps[1:],
+        }
+        assert run(db.get_all_command_shortcuts("2")) == {}
+
+        assert run(db.delete_command_shortcut("1", "morning")) == 1
+        assert run(db.delete_command_shortcut("1", "morning")) == 0
+        assert run(db.get_command_shortcut("1", "morning")) is None
+
+    def test_database_reads_legacy_shortcuts(self, db: Database) -> None:
+        raw_data = LEGACY_SEPARATOR.join(["$add Task 1", "morning"])
+        run(db.hset("shortcuts:user.1", key="legacy", value=raw_data))
+
+        assert run(db.get_command_shortcut("1", "legacy")) == [
+            ShortcutStep(None, "$add Task 1"),
+            ShortcutStep(None, "morning"),
+        ]
+
+    def test_expand_nested_shortcuts(self, db: Database) -> None:
+        run(db.set_command_shortcut("1", "inner", [ShortcutStep("list", "")]))
+        run(
+            db.hset(
+                "shortcuts:user.1",
+                key="outer",
+                value=LEGACY_SEPARATOR.join(["$add Task 1", "inner", "missing"]),
+            )
+        )
+
+        assert expand(db, "outer") == [
+            ShortcutStep("add", "Task 1"),
+            ShortcutStep("list", ""),
+        ]
+
+    def test_expand_skips_cycles(self, db: Database) -> None:
+        run(
+            db.set_command_shortcut(
+                "1", "a", [ShortcutStep("add", "A"), ShortcutStep(None, "b")]
+            )
+        )
+        run(
+            db.set_command_shortcut(
+                "1", "b", [ShortcutStep("add", "B"), ShortcutStep(None, "a")]
+            )
+        )
+
+        assert expand(db, "a") == [ShortcutStep("add", "A"), ShortcutStep("add", "B")]
+
+    def test_expand_depth_limit(self, db: Database) -> None:
+        for i in range(MAX_SHORTCUT_DEPTH + 2):
+            steps = [ShortcutStep("add", str(i)), ShortcutStep(None, str(i + 1))]
+            run(db.set_command_shortcut("1", str(i), steps))
+
+        assert expand(db, "0") == [
+            ShortcutStep("add", str(i)) for i in range(MAX_SHORTCUT_DEPTH)
+        ]
+
+    def test_expand_steps_limit(self, db: Database) -> None:
+        steps = [ShortcutStep("add", str(i)) for i in range(MAX_SHORTCUT_STEPS)]
+        run(db.set_command_shortcut("1", "inner", steps))
+        run(
+            db.set_command_shortcut(
+                "1", "outer", [ShortcutStep(None, "inner"), ShortcutStep(None, "inner")]
+            )
+        )
+
+        assert expand(db, "outer") == steps
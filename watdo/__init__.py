@@ -1,7 +1,20 @@
 import asyncio
 from watdo.discord import Bot
 from watdo.database import Database
-from watdo.environ import DISCORD_TOKEN
+from watdo.models import Profile
+from watdo.metrics import log_summary_periodically
+from watdo.loop_monitor import LoopMonitor
+from watdo.metrics_server import serve_metrics
+from watdo.environ import (
+    DISCORD_TOKEN,
+    PROFILE_CACHE_PUBSUB,
+    METRICS_SUMMARY_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    LOOP_MONITOR,
+    LOOP_MONITOR_INTERVAL,
+    LOOP_LAG_THRESHOLD,
+)
 from watdo._main_runner import async_main_runner
 
 bot: Bot
@@ -13,6 +26,20 @@ async def async_main(loop: asyncio.AbstractEventLoop) -> int:
     db = Database()
     await db.initialize(loop=loop)
 
+    if PROFILE_CACHE_PUBSUB:
+        loop.create_task(Profile.listen_for_invalidations(db))
+
+    if METRICS_SUMMARY_INTERVAL > 0:
+        loop.create_task(log_summary_periodically(METRICS_SUMMARY_INTERVAL))
+
+    if METRICS_PORT > 0:
+        await serve_metrics(db, METRICS_HOST, METRICS_PORT)
+
+    if LOOP_MONITOR:
+        LoopMonitor(
+            loop, interval=LOOP_MONITOR_INTERVAL, threshold=LOOP_LAG_THRESHOLD
+        ).start()
+
     bot = Bot(loop=loop, database=db)
     await bot.start(DISCORD_TOKEN)
 
@@ -0,0 +1,83 @@
+"""Storage backends behind `watdo.database.Database`.
+
+A backend runs Redis commands by name, with the arguments and raw results
+of `redis.asyncio.Redis`, so `Database` decodes the results the same way
+whichever backend is used. Backends other than Redis only implement the
+commands `Database` uses."""
+
+from abc import ABC, abstractmethod
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    AsyncIterator,
+    NamedTuple,
+)
+from watdo.environ import STORAGE_BACKEND, SQLITE_PATH
+
+if TYPE_CHECKING:
+    from watdo.scripts import Script
+
+
+class Command(NamedTuple):
+    name: str
+    args: Sequence[Any] = ()
+    kwargs: Dict[str, Any] = {}
+
+
+class Backend(ABC):
+    @abstractmethod
+    async def execute(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        """Run the command `name` and return its raw result."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def execute_many(
+        self, commands: Sequence[Command], *, transaction: bool
+    ) -> List[Any]:
+        """Run `commands` in one go, atomically if `transaction` is set.
+
+        A command named "run_script" takes a script, its keys and its args."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def run_script(
+        self, script: "Script", keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> Any:
+        """Run `script` atomically."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> AsyncIterator[Optional[bytes]]:
+        """Yield `None` once subscribed, then the messages published to
+        `channel` until disconnected."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def reconnect(self) -> None:
+        """Drop the current connections and check the storage is reachable
+        again, raising `redis.exceptions.ConnectionError` if it isn't."""
+        raise NotImplementedError
+
+
+def create_backend() -> Backend:
+    """Create the backend named by `STORAGE_BACKEND`."""
+    if STORAGE_BACKEND == "redis":
+        from watdo.backends.redis_backend import RedisBackend
+
+        return RedisBackend()
+
+    if STORAGE_BACKEND == "sqlite":
+        from watdo.backends.sqlite import SQLiteBackend
+
+        return SQLiteBackend(SQLITE_PATH)
+
+    if STORAGE_BACKEND == "memory":
+        from watdo.backends.memory import MemoryBackend
+
+        return MemoryBackend()
+
+    raise ValueError(f'Unknown STORAGE_BACKEND "{STORAGE_BACKEND}"')
@@ -0,0 +1,222 @@
+"""Backends storing data in this process, for tests, benchmarks and single
+node deployments.
+
+Their commands are synchronous and never wait, so every command, pipeline
+and script is atomic without any locking. Scripts run their Python twin,
+and pub/sub only reaches subscribers of the same process."""
+
+import asyncio
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Dict,
+    List,
+    Set,
+    Tuple,
+    Iterator,
+    Optional,
+    Sequence,
+    AsyncIterator,
+)
+from watdo.backends import Backend, Command
+from watdo.scripts import Script
+
+
+def to_bytes(value: Any) -> bytes:
+    """Encode `value` the way redis-py sends it to the server."""
+    if isinstance(value, bytes):
+        return value
+
+    if isinstance(value, str):
+        return value.encode()
+
+    if isinstance(value, float):
+        return repr(value).encode()
+
+    return str(value).encode()
+
+
+def parse_score_bound(bound: float | str) -> Tuple[float, bool]:
+    """Parse a ZRANGEBYSCORE bound into its score and whether it's exclusive."""
+    if isinstance(bound, str) and bound.startswith("("):
+        return float(bound[1:]), True
+
+    return float(bound), False
+
+
+class SyncStore(ABC):
+    """The Redis commands used by `Database`, with the same arguments and
+    results as `redis.Redis`."""
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        yield
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, name: str, value: Any) -> bool:
+        raise NotImplementedError
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self.get(k) for k in keys]
+
+    @abstractmethod
+    def delete(self, *names: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def lrange(self, name: str, start: int, end: int) -> List[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def lpush(self, name: str, *values: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def lrem(self, name: str, count: int, value: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def lset(self, name: str, index: int, value: Any) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def hget(self, name: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        raise NotImplementedError
+
+    def hvals(self, name: str) -> List[bytes]:
+        return list(self.hgetall(name).values())
+
+    def hmget(self, name: str, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self.hget(name, k) for k in keys]
+
+    @abstractmethod
+    def hset(
+        self,
+        name: str,
+        key: Optional[str] = None,
+        value: Any = None,
+        mapping: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        raise NotImplementedError
+
+    def hsetnx(self, name: str, key: str, value: Any) -> int:
+        if self.hget(name, key) is not None:
+            return 0
+
+        return self.hset(name, key=key, value=value)
+
+    @abstractmethod
+    def hdel(self, name: str, *keys: str) -> int:
+        raise NotImplementedError
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        value = int(self.hget(name, key) or 0) + amount
+        self.hset(name, key=key, value=value)
+        return value
+
+    @abstractmethod
+    def smembers(self, name: str) -> Set[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def sadd(self, name: str, *values: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def srem(self, name: str, *values: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def zrem(self, name: str, *values: Any) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def zcard(self, name: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def zrangebyscore(
+        self,
+        name: str,
+        min: float | str,
+        max: float | str,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False,
+    ) -> List[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def scan(
+        self, cursor: int = 0, match: Optional[str] = None
+    ) -> Tuple[int, List[bytes]]:
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        return True
+
+
+class LocalBackend(Backend):
+    def __init__(self, store: SyncStore) -> None:
+        self.store = store
+        self._subscribers: Dict[str, Set[asyncio.Queue[bytes]]] = {}
+
+    def _execute(self, command: Command) -> Any:
+        if command.name == "run_script":
+            script, keys, args = command.args
+            return script.apply(self.store, keys, args)
+
+        if command.name == "publish":
+            channel, message = command.args
+            subscribers = self._subscribers.get(channel, set())
+
+            for queue in subscribers:
+                queue.put_nowait(to_bytes(message))
+
+            return len(subscribers)
+
+        return getattr(self.store, command.name)(*command.args, **command.kwargs)
+
+    async def execute(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        with self.store.transaction():
+            return self._execute(Command(name, args, kwargs))
+
+    async def execute_many(
+        self, commands: Sequence[Command], *, transaction: bool
+    ) -> List[Any]:
+        with self.store.transaction():
+            return [self._execute(c) for c in commands]
+
+    async def run_script(
+        self, script: Script, keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> Any:
+        with self.store.transaction():
+            return script.apply(self.store, keys, args)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Optional[bytes]]:
+        queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self._subscribers.setdefault(channel, set()).add(queue)
+
+        try:
+            yield None
+
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+
+    async def reconnect(self) -> None:
+        pass
@@ -0,0 +1,180 @@
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Set, Tuple, Optional
+from watdo.backends.local import SyncStore, LocalBackend, to_bytes, parse_score_bound
+
+
+class MemoryStore(SyncStore):
+    """Keeps everything in a dict, as Redis would keep it in memory."""
+
+    def __init__(self) -> None:
+        self._data: Dict[bytes, Any] = {}
+
+    def _get_or_create(self, name: str, factory: type) -> Any:
+        return self._data.setdefault(to_bytes(name), factory())
+
+    def _drop_if_empty(self, name: str) -> None:
+        key = to_bytes(name)
+
+        if not self._data.get(key, True):
+            del self._data[key]
+
+    def get(self, name: str) -> Optional[bytes]:
+        value = self._data.get(to_bytes(name))
+        return value if isinstance(value, bytes) else None
+
+    def set(self, name: str, value: Any) -> bool:
+        self._data[to_bytes(name)] = to_bytes(value)
+        return True
+
+    def delete(self, *names: str) -> int:
+        return sum(self._data.pop(to_bytes(n), None) is not None for n in names)
+
+    def lrange(self, name: str, start: int, end: int) -> List[bytes]:
+        items: List[bytes] = self._data.get(to_bytes(name), [])
+        return items[start : None if end == -1 else end + 1]
+
+    def lpush(self, name: str, *values: Any) -> int:
+        items: List[bytes] = self._get_or_create(name, list)
+
+        for value in values:
+            items.insert(0, to_bytes(value))
+
+        return len(items)
+
+    def lrem(self, name: str, count: int, value: Any) -> int:
+        items: List[bytes] = self._data.get(to_bytes(name), [])
+        indexes = [i for i, item in enumerate(items) if item == to_bytes(value)]
+
+        if count < 0:
+            indexes.reverse()
+
+        if count != 0:
+            indexes = indexes[: abs(count)]
+
+        for i in sorted(indexes, reverse=True):
+            del items[i]
+
+        self._drop_if_empty(name)
+        return len(indexes)
+
+    def lset(self, name: str, index: int, value: Any) -> bool:
+        self._data[to_bytes(name)][index] = to_bytes(value)
+        return True
+
+    def hget(self, name: str, key: str) -> Optional[bytes]:
+        return self._data.get(to_bytes(name), {}).get(to_bytes(key))
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        return dict(self._data.get(to_bytes(name), {}))
+
+    def hset(
+        self,
+        name: str,
+        key: Optional[str] = None,
+        value: Any = None,
+        mapping: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        items = dict(mapping or {})
+
+        if key is not None:
+            items[key] = value
+
+        fields: Dict[bytes, bytes] = self._get_or_create(name, dict)
+        added_count = 0
+
+        for k, v in items.items():
+            added_count += to_bytes(k) not in fields
+            fields[to_bytes(k)] = to_bytes(v)
+
+        return added_count
+
+    def hdel(self, name: str, *keys: str) -> int:
+        fields: Dict[bytes, bytes] = self._data.get(to_bytes(name), {})
+        deleted_count = sum(fields.pop(to_bytes(k), None) is not None for k in keys)
+        self._drop_if_empty(name)
+        return deleted_count
+
+    def smembers(self, name: str) -> Set[bytes]:
+        return set(self._data.get(to_bytes(name), set()))
+
+    def sadd(self, name: str, *values: Any) -> int:
+        members: Set[bytes] = self._get_or_create(name, set)
+        added_count = 0
+
+        for value in map(to_bytes, values):
+            added_count += value not in members
+            members.add(value)
+
+        return added_count
+
+    def srem(self, name: str, *values: Any) -> int:
+        members: Set[bytes] = self._data.get(to_bytes(name), set())
+        removed_count = 0
+
+        for value in map(to_bytes, values):
+            removed_count += value in members
+            members.discard(value)
+
+        self._drop_if_empty(name)
+        return removed_count
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        scores: Dict[bytes, float] = self._get_or_create(name, dict)
+        added_count = 0
+
+        for member, score in mapping.items():
+            added_count += to_bytes(member) not in scores
+            scores[to_bytes(member)] = float(score)
+
+        return added_count
+
+    def zrem(self, name: str, *values: Any) -> int:
+        scores: Dict[bytes, float] = self._data.get(to_bytes(name), {})
+        removed_count = sum(scores.pop(to_bytes(v), None) is not None for v in values)
+        self._drop_if_empty(name)
+        return removed_count
+
+    def zcard(self, name: str) -> int:
+        return len(self._data.get(to_bytes(name), {}))
+
+    def zrangebyscore(
+        self,
+        name: str,
+        min: float | str,
+        max: float | str,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False,
+    ) -> List[Any]:
+        min_score, is_min_exclusive = parse_score_bound(min)
+        max_score, is_max_exclusive = parse_score_bound(max)
+        scores: Dict[bytes, float] = self._data.get(to_bytes(name), {})
+        items = sorted(
+            (
+                (score, member)
+                for member, score in scores.items()
+                if (min_score < score if is_min_exclusive else min_score <= score)
+                and (score < max_score if is_max_exclusive else score <= max_score)
+            )
+        )
+
+        if start is not None and num is not None:
+            items = items[start : start + num]
+
+        if withscores:
+            return [(member, score) for score, member in items]
+
+        return [member for _, member in items]
+
+    def scan(
+        self, cursor: int = 0, match: Optional[str] = None
+    ) -> Tuple[int, List[bytes]]:
+        keys = [
+            k for k in self._data if match is None or fnmatchcase(k.decode(), match)
+        ]
+        return 0, keys
+
+
+class MemoryBackend(LocalBackend):
+    def __init__(self) -> None:
+        super().__init__(MemoryStore())
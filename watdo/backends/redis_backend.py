@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Optional, Sequence, AsyncIterator
+from redis.asyncio import Redis, ConnectionPool
+from redis.commands.core import AsyncScript
+from watdo.environ import REDIS_URL, REDIS_POOL_MAX_SIZE
+from watdo.backends import Backend, Command
+from watdo.scripts import Script
+
+
+class RedisBackend(Backend):
+    def __init__(self, conn: Optional[Redis] = None) -> None:
+        if conn is None:
+            pool = ConnectionPool.from_url(
+                REDIS_URL,
+                max_connections=REDIS_POOL_MAX_SIZE,
+                health_check_interval=30,
+            )
+            conn = Redis(connection_pool=pool)
+
+        self._conn = conn
+        self._scripts: Dict[str, AsyncScript] = {}
+
+    def _get_script(self, script: Script) -> AsyncScript:
+        registered_script = self._scripts.get(script.source)
+
+        if registered_script is None:
+            registered_script = self._conn.register_script(script.source)
+            self._scripts[script.source] = registered_script
+
+        return registered_script
+
+    async def execute(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        return await getattr(self._conn, name)(*args, **kwargs)
+
+    async def execute_many(
+        self, commands: Sequence[Command], *, transaction: bool
+    ) -> List[Any]:
+        async with self._conn.pipeline(transaction=transaction) as pipe:
+            for command in commands:
+                if command.name == "run_script":
+                    script, keys, args = command.args
+                    registered_script = self._get_script(script)
+
+                    # Makes the pipeline load the script first if the server lacks it
+                    pipe.scripts.add(registered_script)  # type: ignore[arg-type]
+                    pipe.evalsha(registered_script.sha, len(keys), *keys, *args)
+                else:
+                    getattr(pipe, command.name)(*command.args, **command.kwargs)
+
+            return await pipe.execute()
+
+    async def run_script(
+        self, script: Script, keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> Any:
+        # Loads the script first if the server lacks it
+        return await self._get_script(script)(keys=keys, args=args, client=self._conn)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Optional[bytes]]:
+        # On a connection outside the pool, as it's held for as long as the
+        # subscription lasts and commands may use every one of the pool's
+        pool = self._conn.connection_pool
+        conn = Redis(
+            connection_pool=ConnectionPool(
+                connection_class=pool.connection_class,
+                max_connections=1,
+                **pool.connection_kwargs,
+            )
+        )
+
+        try:
+            async with conn.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(channel)
+                yield None
+
+                async for message in pubsub.listen():
+                    yield message["data"]
+        finally:
+            await conn.aclose()
+
+    async def reconnect(self) -> None:
+        # Closes the idle connections of the old server instead of leaking them.
+        # Those in use are left to fail on their own, or to finish if healthy.
+        await self._conn.connection_pool.disconnect(inuse_connections=False)
+        await self._conn.ping()
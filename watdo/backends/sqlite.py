@@ -0,0 +1,335 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, List, Set, Tuple, Iterator, Optional
+from watdo.backends.local import SyncStore, LocalBackend, to_bytes, parse_score_bound
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS lists (
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (key, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS hashes (
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (key, field)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sets (
+    key TEXT NOT NULL,
+    member TEXT NOT NULL,
+    PRIMARY KEY (key, member)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS zsets (
+    key TEXT NOT NULL,
+    member TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (key, member)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS zsets_by_score ON zsets (key, score, member);
+"""
+
+_TABLES = ("strings", "lists", "hashes", "sets", "zsets")
+
+
+def _to_text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class SQLiteStore(SyncStore):
+    """Keeps each Redis data type in a table of its own, in WAL mode so reads
+    don't wait for writes.
+
+    Queries run on the event loop. They take microseconds on the small
+    databases this is meant for, which is cheaper than handing them to a
+    thread."""
+
+    def __init__(self, path: str) -> None:
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if self._conn.in_transaction:
+            yield
+            return
+
+        self._conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        else:
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql: str, *params: Any) -> List[Any]:
+        return self._conn.execute(sql, params).fetchall()
+
+    def get(self, name: str) -> Optional[bytes]:
+        rows = self._query("SELECT value FROM strings WHERE key = ?", _to_text(name))
+        return bytes(rows[0][0]) if rows else None
+
+    def set(self, name: str, value: Any) -> bool:
+        with self.transaction():
+            self.delete(name)
+            self._query(
+                "INSERT INTO strings VALUES (?, ?)", _to_text(name), to_bytes(value)
+            )
+
+        return True
+
+    def delete(self, *names: str) -> int:
+        deleted_count = 0
+
+        with self.transaction():
+            for name in names:
+                is_deleted = False
+
+                for table in _TABLES:
+                    cursor = self._conn.execute(
+                        f"DELETE FROM {table} WHERE key = ?", (_to_text(name),)
+                    )
+                    is_deleted = is_deleted or cursor.rowcount > 0
+
+                deleted_count += is_deleted
+
+        return deleted_count
+
+    def _list_items(self, name: str) -> List[Tuple[int, bytes]]:
+        rows = self._query(
+            "SELECT position, value FROM lists WHERE key = ? ORDER BY position",
+            _to_text(name),
+        )
+        return [(position, bytes(value)) for position, value in rows]
+
+    def lrange(self, name: str, start: int, end: int) -> List[bytes]:
+        values = [value for _, value in self._list_items(name)]
+        return values[start : None if end == -1 else end + 1]
+
+    def lpush(self, name: str, *values: Any) -> int:
+        with self.transaction():
+            rows = self._query(
+                "SELECT MIN(position), COUNT(*) FROM lists WHERE key = ?",
+                _to_text(name),
+            )
+            head, length = rows[0]
+            position = 0 if head is None else head
+
+            for value in values:
+                position -= 1
+                self._query(
+                    "INSERT INTO lists VALUES (?, ?, ?)",
+                    _to_text(name),
+                    position,
+                    to_bytes(value),
+                )
+
+        return length + len(values)
+
+    def lrem(self, name: str, count: int, value: Any) -> int:
+        positions = [p for p, v in self._list_items(name) if v == to_bytes(value)]
+
+        if count < 0:
+            positions.reverse()
+
+        if count != 0:
+            positions = positions[: abs(count)]
+
+        with self.transaction():
+            for position in positions:
+                self._query(
+                    "DELETE FROM lists WHERE key = ? AND position = ?",
+                    _to_text(name),
+                    position,
+                )
+
+        return len(positions)
+
+    def lset(self, name: str, index: int, value: Any) -> bool:
+        position = self._list_items(name)[index][0]
+        self._query(
+            "UPDATE lists SET value = ? WHERE key = ? AND position = ?",
+            to_bytes(value),
+            _to_text(name),
+            position,
+        )
+        return True
+
+    def hget(self, name: str, key: str) -> Optional[bytes]:
+        rows = self._query(
+            "SELECT value FROM hashes WHERE key = ? AND field = ?",
+            _to_text(name),
+            _to_text(key),
+        )
+        return bytes(rows[0][0]) if rows else None
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        rows = self._query(
+            "SELECT field, value FROM hashes WHERE key = ?", _to_text(name)
+        )
+        return {field.encode(): bytes(value) for field, value in rows}
+
+    def hset(
+        self,
+        name: str,
+        key: Optional[str] = None,
+        value: Any = None,
+        mapping: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        items = dict(mapping or {})
+
+        if key is not None:
+            items[key] = value
+
+        added_count = 0
+
+        with self.transaction():
+            for k, v in items.items():
+                added_count += self.hget(name, k) is None
+                self._query(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?)",
+                    _to_text(name),
+                    _to_text(k),
+                    to_bytes(v),
+                )
+
+        return added_count
+
+    def hdel(self, name: str, *keys: str) -> int:
+        deleted_count = 0
+
+        with self.transaction():
+            for key in keys:
+                cursor = self._conn.execute(
+                    "DELETE FROM hashes WHERE key = ? AND field = ?",
+                    (_to_text(name), _to_text(key)),
+                )
+                deleted_count += cursor.rowcount
+
+        return deleted_count
+
+    def smembers(self, name: str) -> Set[bytes]:
+        rows = self._query("SELECT member FROM sets WHERE key = ?", _to_text(name))
+        return {member.encode() for member, in rows}
+
+    def sadd(self, name: str, *values: Any) -> int:
+        added_count = 0
+
+        with self.transaction():
+            for value in values:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO sets VALUES (?, ?)",
+                    (_to_text(name), _to_text(value)),
+                )
+                added_count += cursor.rowcount
+
+        return added_count
+
+    def srem(self, name: str, *values: Any) -> int:
+        removed_count = 0
+
+        with self.transaction():
+            for value in values:
+                cursor = self._conn.execute(
+                    "DELETE FROM sets WHERE key = ? AND member = ?",
+                    (_to_text(name), _to_text(value)),
+                )
+                removed_count += cursor.rowcount
+
+        return removed_count
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        added_count = 0
+
+        with self.transaction():
+            for member, score in mapping.items():
+                cursor = self._conn.execute(
+                    "UPDATE zsets SET score = ? WHERE key = ? AND member = ?",
+                    (float(score), _to_text(name), _to_text(member)),
+                )
+
+                if cursor.rowcount == 0:
+                    self._query(
+                        "INSERT INTO zsets VALUES (?, ?, ?)",
+                        _to_text(name),
+                        _to_text(member),
+                        float(score),
+                    )
+                    added_count += 1
+
+        return added_count
+
+    def zrem(self, name: str, *values: Any) -> int:
+        removed_count = 0
+
+        with self.transaction():
+            for value in values:
+                cursor = self._conn.execute(
+                    "DELETE FROM zsets WHERE key = ? AND member = ?",
+                    (_to_text(name), _to_text(value)),
+                )
+                removed_count += cursor.rowcount
+
+        return removed_count
+
+    def zcard(self, name: str) -> int:
+        rows = self._query("SELECT COUNT(*) FROM zsets WHERE key = ?", _to_text(name))
+        return int(rows[0][0])
+
+    def zrangebyscore(
+        self,
+        name: str,
+        min: float | str,
+        max: float | str,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False,
+    ) -> List[Any]:
+        min_score, is_min_exclusive = parse_score_bound(min)
+        max_score, is_max_exclusive = parse_score_bound(max)
+        sql = (
+            "SELECT member, score FROM zsets WHERE key = ?"
+            f" AND score {'>' if is_min_exclusive else '>='} ?"
+            f" AND score {'<' if is_max_exclusive else '<='} ?"
+            " ORDER BY score, member"
+        )
+        params: List[Any] = [_to_text(name), min_score, max_score]
+
+        if start is not None and num is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [num, start]
+
+        rows = self._query(sql, *params)
+
+        if withscores:
+            return [(member.encode(), score) for member, score in rows]
+
+        return [member.encode() for member, _ in rows]
+
+    def scan(
+        self, cursor: int = 0, match: Optional[str] = None
+    ) -> Tuple[int, List[bytes]]:
+        sql = " UNION ".join(
+            f"SELECT key FROM {table} WHERE key GLOB ?" for table in _TABLES
+        )
+        rows = self._query(sql, *([match or "*"] * len(_TABLES)))
+        return 0, [key.encode() for key, in rows]
+
+
+class SQLiteBackend(LocalBackend):
+    def __init__(self, path: str) -> None:
+        super().__init__(SQLiteStore(path))
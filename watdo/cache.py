@@ -0,0 +1,102 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Generic, TypeVar, Dict, Tuple, Callable, Awaitable, Hashable
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """An in-process cache whose entries expire `ttl` seconds after being set,
+    evicting the least recently used entry once `max_size` is reached.
+
+    Concurrent loads of the same key share a single call of the loader, and a
+    load racing an invalidation is never cached, so it can't bring back stale
+    data."""
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        self._loads: Dict[K, asyncio.Future[V]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever an entry is invalidated."""
+        return self._generation
+
+    def get(self, key: K) -> V:
+        """Raises `KeyError` if `key` isn't cached or has expired."""
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            raise KeyError(key)
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, *, generation: int | None = None) -> None:
+        """Cache `value`, unless `generation` is given and something has been
+        invalidated since it was read."""
+        if generation is not None and generation != self._generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    async def get_or_load(self, key: K, load: Callable[[], Awaitable[V]]) -> V:
+        try:
+            return self.get(key)
+        except KeyError:
+            pass
+
+        future = self._loads.get(key)
+
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loads[key] = future
+        generation = self._generation
+
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Retrieved so it isn't reported when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            self.set(key, value, generation=generation)
+            return value
+        finally:
+            del self._loads[key]
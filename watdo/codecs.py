@@ -0,0 +1,206 @@
+"""Encodings of the records stored for models.
+
+Records are written with the codec named by `RECORD_CODEC` and read back
+with whichever codec wrote them, so both can live side by side in the
+database while records get rewritten."""
+
+import json
+import struct
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import cast, Any, Dict, List, Tuple, NamedTuple
+from watdo.environ import RECORD_CODEC
+
+# Never the first byte of a JSON document, nor of any UTF-8 text
+MAGIC = b"\xff"
+FORMAT_VERSION = 1
+
+# Never change or reuse a tag, only add new ones
+FIELD_TAGS = {
+    "uuid": 1,
+    "created_at": 2,
+    "created_by": 3,
+    "channel_id": 4,
+    "utc_offset": 5,
+    "title": 6,
+    "category": 7,
+    "importance": 8,
+    "energy": 9,
+    "description": 10,
+    "last_done": 11,
+    "profile_id": 12,
+    "version": 13,
+    "due": 14,
+    "has_reminder": 15,
+    "is_auto_done": 16,
+    "next_reminder": 17,
+}
+_TAG_FIELDS = {tag: field for field, tag in FIELD_TAGS.items()}
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BIG_INT = range(7)
+_KIND_FORMATS = ("", "", "", "q", "d", "I", "I")
+_INT_MIN, _INT_MAX = -(2**63), 2**63 - 1
+
+
+class RecordCodec(ABC):
+    name: str
+
+    @abstractmethod
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def decode(self, raw_data: bytes) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class JSONCodec(RecordCodec):
+    name = "json"
+
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        return json.dumps(data).encode()
+
+    def decode(self, raw_data: bytes) -> Dict[str, Any]:
+        return cast(Dict[str, Any], json.loads(raw_data))
+
+
+class _Layout(NamedTuple):
+    fields: Tuple[Tuple[str, int], ...]
+    values: struct.Struct
+
+
+@lru_cache(maxsize=256)
+def _get_layout(shape: bytes) -> _Layout:
+    count = len(shape) // 2
+    fields: List[Tuple[str, int]] = []
+    value_format = "<"
+
+    for tag, kind in zip(shape[:count], shape[count:]):
+        field = _TAG_FIELDS.get(tag)
+
+        if field is None:
+            raise ValueError(f"Unknown field tag {tag}")
+
+        if kind >= len(_KIND_FORMATS):
+            raise ValueError(f"Unknown value kind {kind}")
+
+        fields.append((field, kind))
+        value_format += _KIND_FORMATS[kind]
+
+    return _Layout(tuple(fields), struct.Struct(value_format))
+
+
+class BinaryCodec(RecordCodec):
+    """Magic byte, format version and field count, a tag byte then a kind
+    byte for every field, the numbers and string lengths packed together,
+    then the UTF-8 strings back to back.
+
+    Records with the same fields share a layout, so decoding one takes a
+    cached lookup, a single unpack and a slice per string."""
+
+    name = "binary"
+
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        tags = bytearray()
+        kinds = bytearray()
+        values: List[Any] = []
+        strings: List[bytes] = []
+
+        for field, value in data.items():
+            tag = FIELD_TAGS.get(field)
+
+            if tag is None:
+                raise ValueError(f'No tag for field "{field}"')
+
+            tags.append(tag)
+
+            if value is None:
+                kinds.append(_NONE)
+            elif value is False:
+                kinds.append(_FALSE)
+            elif value is True:
+                kinds.append(_TRUE)
+            elif isinstance(value, int) and _INT_MIN <= value <= _INT_MAX:
+                kinds.append(_INT)
+                values.append(value)
+            elif isinstance(value, (int, str)):
+                encoded = (value if isinstance(value, str) else str(value)).encode()
+                kinds.append(_STR if isinstance(value, str) else _BIG_INT)
+                values.append(len(encoded))
+                strings.append(encoded)
+            elif isinstance(value, float):
+                kinds.append(_FLOAT)
+                values.append(value)
+            else:
+                t = type(value).__name__
+                raise TypeError(f"\"{field}\": '{t}' can't be encoded")
+
+        if len(tags) > 255:
+            raise ValueError("Too many fields")
+
+        layout = _get_layout(bytes(tags + kinds))
+        header = MAGIC + bytes((FORMAT_VERSION, len(tags)))
+        return b"".join((header, tags, kinds, layout.values.pack(*values), *strings))
+
+    def decode(self, raw_data: bytes) -> Dict[str, Any]:
+        if raw_data[1] != FORMAT_VERSION:
+            raise ValueError(f"Unknown record format version {raw_data[1]}")
+
+        values_start = 3 + raw_data[2] * 2
+        layout = _get_layout(raw_data[3:values_start])
+        try:
+            values = layout.values.unpack_from(raw_data, values_start)
+        except struct.error:
+            raise ValueError("Record is shorter than its layout") from None
+
+        offset = values_start + layout.values.size
+        data: Dict[str, Any] = {}
+        i = 0
+
+        for field, kind in layout.fields:
+            if kind == _NONE:
+                data[field] = None
+            elif kind == _FALSE:
+                data[field] = False
+            elif kind == _TRUE:
+                data[field] = True
+            elif kind == _INT or kind == _FLOAT:
+                data[field] = values[i]
+                i += 1
+            else:
+                end = offset + values[i]
+                text = raw_data[offset:end].decode()
+                data[field] = text if kind == _STR else int(text)
+                offset = end
+                i += 1
+
+        if offset != len(raw_data):
+            raise ValueError("Record length doesn't match its layout")
+
+        return data
+
+
+CODECS: Dict[str, RecordCodec] = {c.name: c for c in (JSONCodec(), BinaryCodec())}
+
+if RECORD_CODEC not in CODECS:
+    raise ValueError(f'Unknown RECORD_CODEC "{RECORD_CODEC}"')
+
+_codec = CODECS[RECORD_CODEC]
+
+
+def encode_record(data: Dict[str, Any]) -> bytes:
+    try:
+        return _codec.encode(data)
+    except ValueError:
+        # Fields added without a tag are still stored
+        return CODECS["json"].encode(data)
+
+
+def decode_record(raw_data: bytes | str) -> Dict[str, Any]:
+    if isinstance(raw_data, str):
+        raw_data = raw_data.encode()
+
+    if raw_data[:1] == MAGIC:
+        return CODECS["binary"].decode(raw_data)
+
+    return CODECS["json"].decode(raw_data)
@@ -1,9 +1,30 @@
 import math
-from typing import Generic, TypeVar, Iterator, List
-from watdo.models import Task, ScheduledTask
+import heapq
+import operator
+import functools
+import itertools
+from array import array
+from typing import (
+    Generic,
+    TypeVar,
+    Iterator,
+    Dict,
+    List,
+    Optional,
+    Callable,
+    Sequence,
+    Tuple,
+    NamedTuple,
+)
+from watdo import dt
+from watdo.errors import VersionConflict
+from watdo.models import MAX_WRITE_ATTEMPTS, Task, ScheduledTask
 
 T = TypeVar("T")
 
+# As many tasks as a page of paged embeds shows at most
+PRIORITY_PAGE_SIZE = 10
+
 
 class Collection(Generic[T]):
     def __init__(self, items: List[T]) -> None:
@@ -20,29 +41,248 @@ class Collection(Generic[T]):
         return self._items
 
 
+class TaskCounts(NamedTuple):
+    total: int
+    important: int
+    overdue: int
+    recurring: int
+    one_time: int
+    done: int
+
+
+class TaskColumns:
+    """The fields tasks are sorted, filtered and counted by, as one array per
+    field. Row `i` is about `tasks[i]`.
+
+    Each column is read from the tasks the first time it's used, so an
+    operation only pays for the fields it needs.
+
+    Unscheduled tasks are due at infinity, and tasks never done were last
+    done at infinity, so both sort last."""
+
+    def __init__(self, tasks: Sequence[Task]) -> None:
+        self.tasks = tasks
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    @functools.cached_property
+    def importance(self) -> "array[float]":
+        return array("d", map(Task.importance.get_value, self.tasks))
+
+    @functools.cached_property
+    def due(self) -> "array[float]":
+        return array("d", [t._due_time for t in self.tasks])
+
+    @functools.cached_property
+    def last_done(self) -> "array[float]":
+        return array(
+            "d",
+            [
+                math.inf if v is None else v
+                for v in map(Task.last_done.get_value, self.tasks)
+            ],
+        )
+
+    @functools.cached_property
+    def is_recurring(self) -> "array[int]":
+        return array(
+            "b",
+            [
+                isinstance(t, ScheduledTask)
+                and isinstance(ScheduledTask.due.get_value(t), str)
+                for t in self.tasks
+            ],
+        )
+
+    @functools.cached_property
+    def is_done(self) -> "array[int]":
+        return array("b", [t.is_done for t in self.tasks])
+
+    @functools.cached_property
+    def _categories(self) -> Tuple["array[int]", List[str]]:
+        codes: Dict[str, int] = {}
+        column = array(
+            "I",
+            [
+                codes.setdefault(c, len(codes))
+                for c in map(Task.category.get_value, self.tasks)
+            ],
+        )
+        return column, list(codes)
+
+    @property
+    def category(self) -> "array[int]":
+        """Codes of the categories, indexes into `categories`."""
+        return self._categories[0]
+
+    @property
+    def categories(self) -> List[str]:
+        """In the order they first appear."""
+        return self._categories[1]
+
+    def priority_keys(self) -> Iterator[Tuple[float, float, float, int]]:
+        """Sort keys of the rows by last done, then due date, then importance
+        descending. They end with the row index, which keeps ties in order
+        and the keys distinct."""
+        return zip(
+            self.last_done,
+            self.due,
+            map(operator.neg, self.importance),
+            itertools.count(),
+        )
+
+    def priority_order(self) -> List[int]:
+        # Stable sorts on one float each, least significant first, compare
+        # faster than a single sort on the keys' tuples
+        order = sorted(range(len(self)), key=self.importance.__getitem__, reverse=True)
+        order.sort(key=self.due.__getitem__)
+        order.sort(key=self.last_done.__getitem__)
+        return order
+
+    def overdue(self, now: float) -> List[int]:
+        return [i for i, due in enumerate(self.due) if due < now]
+
+    def by_category(self) -> Dict[str, List[int]]:
+        """Row indexes by category, in the order categories first appear."""
+        rows: List[List[int]] = [[] for _ in self.categories]
+
+        for i, code in enumerate(self.category):
+            rows[code].append(i)
+
+        return dict(zip(self.categories, rows))
+
+    def count(self, now: float) -> TaskCounts:
+        total = len(self)
+        recurring = sum(self.is_recurring)
+        return TaskCounts(
+            total=total,
+            important=sum(1 for i in self.importance if i),
+            overdue=len(self.overdue(now)),
+            recurring=recurring,
+            one_time=total - recurring,
+            done=sum(self.is_done),
+        )
+
+
 class TasksCollection(Collection[Task]):
+    def __init__(self, items: List[Task]) -> None:
+        super().__init__(items)
+        self._columns: Optional[TaskColumns] = None
+
+    @property
+    def columns(self) -> TaskColumns:
+        """Kept until the tasks change through this collection. Tasks changed
+        elsewhere meanwhile need a new collection."""
+        if self._columns is None or self._columns.tasks is not self._items:
+            self._columns = TaskColumns(self._items)
+
+        return self._columns
+
+    async def update_where(
+        self,
+        update: Callable[[Task], None],
+        *,
+        where: Optional[Callable[[Task], bool]] = None,
+    ) -> int:
+        """Apply `update` to the tasks matching `where` and save them atomically.
+
+        Tasks changed by someone else meanwhile are reloaded, matched and
+        updated again, up to `MAX_WRITE_ATTEMPTS` times in total.
+
+        Returns the number of tasks changed."""
+        tasks = [t for t in self._items if where is None or where(t)]
+        saved_count = 0
+        attempts = 1
+
+        while tasks:
+            for task in tasks:
+                update(task)
+
+            self._columns = None
+
+            try:
+                return saved_count + await Task.save_many(tasks[0].db, tasks)
+            except VersionConflict as error:
+                if attempts >= MAX_WRITE_ATTEMPTS:
+                    raise
+
+                saved_count += len(tasks) - len(error.tasks)
+                stale_tasks = error.tasks
+
+            attempts += 1
+            tasks = []
+
+            for stale_task in stale_tasks:
+                reloaded_task = await Task.from_uuid(
+                    stale_task.db, stale_task.profile, stale_task.uuid.value
+                )
+
+                if reloaded_task is not None and (
+                    where is None or where(reloaded_task)
+                ):
+                    tasks.append(reloaded_task)
+
+        return saved_count
+
+    async def delete_where(
+        self, *, where: Optional[Callable[[Task], bool]] = None
+    ) -> int:
+        """Delete the tasks matching `where` atomically.
+
+        Returns the number of tasks deleted."""
+        tasks = [t for t in self._items if where is None or where(t)]
+
+        if not tasks:
+            return 0
+
+        deleted_count = await Task.delete_many(tasks[0].db, tasks)
+        deleted_ids = {id(t) for t in tasks}
+        self._items = [t for t in self._items if id(t) not in deleted_ids]
+        return deleted_count
+
     def sort_by_priority(self) -> "TasksCollection":
-        self._items.sort(key=lambda t: t.importance.value, reverse=True)
-        self._items.sort(
-            key=lambda t: t.due_date.timestamp()
-            if isinstance(t, ScheduledTask)
-            else math.inf
-        )
-        self._items.sort(key=lambda t: t.last_done.value if t.last_done else math.inf)
+        order = self.columns.priority_order()
+        self._items = [self._items[i] for i in order]
         return self
 
+    def iter_by_priority(self) -> Iterator[Task]:
+        """The tasks in the order `sort_by_priority` gives, ordered as they're
+        taken. The first `PRIORITY_PAGE_SIZE` are picked in one pass over
+        their keys, and the rest are only sorted once more are taken."""
+        items = self._items
+        columns = self.columns
+        first_keys = heapq.nsmallest(PRIORITY_PAGE_SIZE, columns.priority_keys())
+
+        for key in first_keys:
+            yield items[key[-1]]
+
+        if len(first_keys) < len(items):
+            for row in columns.priority_order()[len(first_keys) :]:
+                yield items[row]
+
+    def group_by_category(self) -> Dict[str, List[Task]]:
+        return {
+            category: [self._items[i] for i in rows]
+            for category, rows in self.columns.by_category().items()
+        }
+
+    def count(self) -> TaskCounts:
+        return self.columns.count(dt.now())
+
     def get_dailies(self, *, overdue_only: bool = True) -> List[ScheduledTask[str]]:
         tasks = []
 
-        for task in self._items:
-            if not isinstance(task, ScheduledTask):
-                continue
+        with dt.frozen_now():
+            if overdue_only:
+                # Checked first, as it's much cheaper than telling if it's daily
+                overdue = self.columns.overdue(dt.now())
+                candidates = [self._items[i] for i in overdue]
+            else:
+                candidates = self._items
 
-            if task.is_daily:
-                if overdue_only:
-                    if task.is_overdue:
-                        tasks.append(task)
-                else:
+            for task in candidates:
+                if isinstance(task, ScheduledTask) and task.is_daily:
                     tasks.append(task)
 
         return tasks
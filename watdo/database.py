@@ -1,35 +1,324 @@
 import asyncio
-from typing import Dict, List, Optional, AsyncIterator
+from contextlib import asynccontextmanager
+from typing import (
+    cast,
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Optional,
+    Callable,
+    Awaitable,
+    Sequence,
+    AsyncIterator,
+    NamedTuple,
+    AsyncContextManager,
+)
 import redis
-from redis.asyncio import Redis
-from watdo.environ import REDIS_URL
+from watdo.cache import TTLCache
+from watdo.metrics import metrics
+from watdo.scripts import Script
+from watdo.backends import Backend, Command, create_backend
+from watdo.shortcuts import ShortcutStep, encode_shortcut, decode_shortcut
+from watdo.environ import (
+    REDIS_POOL_MIN_SIZE,
+    REDIS_POOL_MAX_SIZE,
+    REDIS_POOL_ACQUIRE_TIMEOUT,
+)
+
+# Bounds of the exponential backoff between reconnection attempts, in seconds
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+# Command shortcut tables are looked up for every message the bot sees
+SHORTCUT_CACHE_SIZE = 10000
+SHORTCUT_CACHE_TTL = 10 * 60
+
+
+def _decode(data: Any) -> Any:
+    return data.decode() if isinstance(data, bytes) else data
+
+
+def _decode_list(data: Any) -> List[Any]:
+    return [_decode(d) for d in data]
+
+
+def _decode_dict(data: Any) -> Dict[Any, Any]:
+    return {_decode(k): _decode(v) for k, v in data.items()}
+
+
+class Pipeline:
+    """Commands queued here are sent to the database in a single round trip.
+
+    The results of `execute` are in the same order the commands were queued."""
+
+    def __init__(
+        self, execute_many: Callable[[Sequence[Command]], Awaitable[List[Any]]]
+    ) -> None:
+        self._execute_many = execute_many
+        self._commands: List[Command] = []
+        self._decoders: List[Callable[[Any], Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._decoders)
+
+    def _queue(
+        self, decoder: Callable[[Any], Any], command: str, *args: Any, **kwargs: Any
+    ) -> None:
+        self._commands.append(Command(command, args, kwargs))
+        self._decoders.append(decoder)
+
+    async def execute(self) -> List[Any]:
+        if not self._decoders:
+            return []
+
+        commands, self._commands = self._commands, []
+        decoders, self._decoders = self._decoders, []
+        results = await self._execute_many(commands)
+        return [decode(result) for decode, result in zip(decoders, results)]
+
+    def get(self, key: str) -> None:
+        self._queue(_decode, "get", key)
+
+    def set(self, key: str, value: str) -> None:
+        self._queue(bool, "set", key, value)
+
+    def delete(self, *keys: str) -> None:
+        self._queue(int, "delete", *keys)
+
+    def hget(self, name: str, key: str) -> None:
+        self._queue(_decode, "hget", name, key)
+
+    def hmget(self, name: str, *keys: str) -> None:
+        self._queue(_decode_list, "hmget", name, keys)
+
+    def hmget_bytes(self, name: str, *keys: str) -> None:
+        self._queue(list, "hmget", name, keys)
+
+    def hgetall(self, name: str) -> None:
+        self._queue(_decode_dict, "hgetall", name)
+
+    def hset(self, name: str, *, key: str, value: str) -> None:
+        self._queue(int, "hset", name, key=key, value=value)
+
+    def hset_many(self, name: str, mapping: Dict[str, str]) -> None:
+        self._queue(int, "hset", name, mapping=mapping)
+
+    def hsetnx(self, name: str, *, key: str, value: str) -> None:
+        self._queue(bool, "hsetnx", name, key, value)
+
+    def hdel(self, name: str, *keys: str) -> None:
+        self._queue(int, "hdel", name, *keys)
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> None:
+        self._queue(int, "hincrby", name, key, amount)
+
+    def sadd(self, name: str, *members: str) -> None:
+        self._queue(int, "sadd", name, *members)
+
+    def srem(self, name: str, *members: str) -> None:
+        self._queue(int, "srem", name, *members)
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> None:
+        self._queue(int, "zadd", name, mapping)
+
+    def zrem(self, name: str, *members: str) -> None:
+        self._queue(int, "zrem", name, *members)
+
+    def run_script(
+        self, script: Script, keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> None:
+        self._queue(_decode, "run_script", script, keys, args)
+
+
+class PoolStats(NamedTuple):
+    max_size: int
+    in_use: int
+    waiting: int
+    reconnect_count: int
 
 
 class Database:
-    @staticmethod
-    def _init_conn() -> Redis:
-        return Redis.from_url(REDIS_URL, health_check_interval=30)
+    """Commands share a bounded pool of connections to the storage `backend`,
+    which defaults to the one configured by `STORAGE_BACKEND`.
+
+    A command failing to reach the server pauses new commands and reconnects
+    in the background, backing off exponentially until the server answers."""
+
+    def __init__(self, backend: Optional[Backend] = None) -> None:
+        self._backend = backend or create_backend()
+        self._slots = asyncio.Semaphore(REDIS_POOL_MAX_SIZE)
+        self._in_use_count = 0
+        self._waiting_count = 0
+        self._reconnect_count = 0
+        self._is_connected = asyncio.Event()
+        self._is_connected.set()
+        self._reconnect_task: Optional[asyncio.Task[None]] = None
+        self._shortcuts: TTLCache[str, Dict[str, List[ShortcutStep]]] = TTLCache(
+            max_size=SHORTCUT_CACHE_SIZE, ttl=SHORTCUT_CACHE_TTL
+        )
+        metrics.register_cache("shortcuts", self._shortcuts)
+
+    @property
+    def pool_stats(self) -> PoolStats:
+        return PoolStats(
+            max_size=REDIS_POOL_MAX_SIZE,
+            in_use=self._in_use_count,
+            waiting=self._waiting_count,
+            reconnect_count=self._reconnect_count,
+        )
+
+    async def initialize(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Concurrent commands each take a connection, which the pool keeps
+        try:
+            await asyncio.gather(
+                *(self._command("ping") for _ in range(REDIS_POOL_MIN_SIZE))
+            )
+        except redis.exceptions.ConnectionError:
+            pass
+
+    async def _wait_for_slot(self) -> None:
+        await self._is_connected.wait()
+        await self._slots.acquire()
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[None]:
+        """Hold one of the pool's connections for the duration of the block."""
+        self._waiting_count += 1
+
+        try:
+            await asyncio.wait_for(self._wait_for_slot(), REDIS_POOL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise redis.exceptions.ConnectionError(
+                f"No database connection got free in {REDIS_POOL_ACQUIRE_TIMEOUT}s"
+            ) from None
+        finally:
+            self._waiting_count -= 1
+
+        self._in_use_count += 1
+
+        try:
+            yield
+        except redis.exceptions.MaxConnectionsError:
+            # The pool ran out of connections, the server is fine
+            raise
+        except redis.exceptions.ConnectionError:
+            self._start_reconnect()
+            raise
+        finally:
+            self._in_use_count -= 1
+            self._slots.release()
+
+    async def _command(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        with metrics.measure(name, (args, kwargs)) as measurement:
+            async with self._acquire():
+                result = await self._backend.execute(name, *args, **kwargs)
+
+            measurement.set_result(result)
+            return result
+
+    async def _execute_many(
+        self, commands: Sequence[Command], *, transaction: bool
+    ) -> List[Any]:
+        # Scripts are sent by their hash, so their source isn't counted
+        request = [
+            c.args[1:] if c.name == "run_script" else (c.args, c.kwargs)
+            for c in commands
+        ]
+        operation = "transaction" if transaction else "pipeline"
+
+        with metrics.measure(operation, request, commands=len(commands)) as measurement:
+            async with self._acquire():
+                results = await self._backend.execute_many(
+                    commands, transaction=transaction
+                )
+
+            measurement.set_result(results)
+            return results
 
-    _conn = Redis.from_url(REDIS_URL, health_check_interval=30)
+    def _start_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._is_connected.clear()
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = RECONNECT_MIN_DELAY
 
-    async def _conn_health_check_loop(self) -> None:
         while True:
             try:
-                await self._conn.ping()
-            except redis.exceptions.ConnectionError:
-                self._conn = self._init_conn()
+                await self._backend.reconnect()
+            except (redis.exceptions.ConnectionError, OSError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            else:
+                break
 
-            await asyncio.sleep(1)
+        self._reconnect_count += 1
+        self._is_connected.set()
 
-    async def initialize(self, loop: asyncio.AbstractEventLoop) -> None:
-        loop.create_task(self._conn_health_check_loop())
+    @asynccontextmanager
+    async def pipeline(self, *, transaction: bool = False) -> AsyncIterator[Pipeline]:
+        """Queue commands and send them all in one round trip when the block exits.
+
+        Call `Pipeline.execute` inside the block to get results early."""
+        pipeline = Pipeline(
+            lambda commands: self._execute_many(commands, transaction=transaction)
+        )
+        yield pipeline
+        await pipeline.execute()
+
+    def transaction(self) -> AsyncContextManager[Pipeline]:
+        """Like `pipeline`, but the commands are applied atomically."""
+        return self.pipeline(transaction=True)
+
+    async def run_script(
+        self, script: Script, keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> Any:
+        """Run a script atomically."""
+        with metrics.measure(f"script:{script.name}", (keys, args)) as measurement:
+            async with self._acquire():
+                result = await self._backend.run_script(script, keys, args)
+
+            measurement.set_result(result)
+
+        return _decode(result)
 
     async def iter_keys(self, match: str) -> AsyncIterator[str]:
-        async for key in self._conn.scan_iter(match=match):
-            yield key.decode()
+        # Scanned a page at a time so no connection is held between pages
+        cursor = 0
+
+        while True:
+            cursor, keys = await self._command("scan", cursor, match=match)
+
+            for key in keys:
+                yield key.decode()
+
+            if cursor == 0:
+                break
+
+    async def publish(self, channel: str, message: str) -> int:
+        receiver_count = await self._command("publish", channel, message)
+        return receiver_count
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Optional[str]]:
+        """Yield the messages published to `channel` forever, on a connection of
+        its own. Yields `None` whenever (re)subscribed, since messages
+        published in between are lost."""
+        delay = RECONNECT_MIN_DELAY
+
+        while True:
+            try:
+                async for message in self._backend.subscribe(channel):
+                    if message is None:
+                        delay = RECONNECT_MIN_DELAY
+
+                    yield _decode(message)
+            except redis.exceptions.ConnectionError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
 
     async def get(self, key: str) -> Optional[str]:
-        data = await self._conn.get(key)
+        data = await self._command("get", key)
 
         if data is None:
             return None
@@ -37,30 +326,52 @@ class Database:
         data = data.decode() if isinstance(data, bytes) else data
         return data
 
-    async def set(self, key: str, value: str) -> None:
-        await self._conn.set(key, value)
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        data = await self._command("get", key)
+        return cast(Optional[bytes], data)
+
+    async def set(self, key: str, value: str | bytes) -> None:
+        await self._command("set", key, value)
+
+    async def mget(self, *keys: str) -> List[Optional[str]]:
+        if not keys:
+            return []
+
+        data = await self._command("mget", keys)
+        return [d.decode() if isinstance(d, bytes) else d for d in data]
+
+    async def mget_bytes(self, *keys: str) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+
+        data = await self._command("mget", keys)
+        return cast(List[Optional[bytes]], data)
+
+    async def delete(self, *keys: str) -> int:
+        deleted_count = await self._command("delete", *keys)
+        return deleted_count
 
     async def lrange(self, key: str) -> List[str]:
-        data = await self._conn.lrange(key, 0, -1)
+        data = await self._command("lrange", key, 0, -1)
         data = [d.decode() if isinstance(d, bytes) else d for d in data]
         return data
 
     async def lpush(self, key: str, value: str) -> None:
-        await self._conn.lpush(key, value)
+        await self._command("lpush", key, value)
 
     async def lrem(self, key: str, value: str) -> None:
-        await self._conn.lrem(key, 1, value)
+        await self._command("lrem", key, 1, value)
 
     async def lset(self, key: str, index: int, value: str) -> None:
-        await self._conn.lset(key, index, value)
+        await self._command("lset", key, index, value)
 
     async def hgetall(self, name: str) -> Dict[str, str]:
-        data = await self._conn.hgetall(name)
+        data = await self._command("hgetall", name)
         data = {k.decode(): v.decode() for k, v in data.items()}
         return data
 
     async def hget(self, name: str, key: str) -> Optional[str]:
-        data = await self._conn.hget(name, key)
+        data = await self._command("hget", name, key)
 
         if data is None:
             return None
@@ -68,45 +379,150 @@ class Database:
         data = data.decode() if isinstance(data, bytes) else data
         return data
 
+    async def hget_bytes(self, name: str, key: str) -> Optional[bytes]:
+        data = await self._command("hget", name, key)
+        return cast(Optional[bytes], data)
+
+    async def hvals(self, name: str) -> List[str]:
+        data = await self._command("hvals", name)
+        data = [d.decode() if isinstance(d, bytes) else d for d in data]
+        return data
+
+    async def hvals_bytes(self, name: str) -> List[bytes]:
+        data = await self._command("hvals", name)
+        return cast(List[bytes], data)
+
+    async def hmget(self, name: str, *keys: str) -> List[Optional[str]]:
+        if not keys:
+            return []
+
+        data = await self._command("hmget", name, keys)
+        return [d.decode() if isinstance(d, bytes) else d for d in data]
+
+    async def hmget_bytes(self, name: str, *keys: str) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+
+        data = await self._command("hmget", name, keys)
+        return cast(List[Optional[bytes]], data)
+
     async def hset(self, name: str, *, key: str, value: str) -> None:
-        await self._conn.hset(name, key=key, value=value)
+        await self._command("hset", name, key=key, value=value)
+
+    async def hset_many(self, name: str, mapping: Dict[str, str]) -> None:
+        if mapping:
+            await self._command("hset", name, mapping=mapping)
+
+    async def hsetnx(self, name: str, *, key: str, value: str) -> bool:
+        is_set = await self._command("hsetnx", name, key, value)
+        return bool(is_set)
 
     async def hdel(self, name: str, *keys: str) -> int:
-        deleted_count = await self._conn.hdel(name, *keys)
+        deleted_count = await self._command("hdel", name, *keys)
         return deleted_count
 
-    def _parse_shortcuts(self, command_str: Optional[str]) -> Optional[List[str]]:
-        if command_str is None:
-            return None
+    async def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        value = await self._command("hincrby", name, key, amount)
+        return value
 
-        if len(command_str) == 0:
-            return None
+    async def smembers(self, name: str) -> List[str]:
+        data = await self._command("smembers", name)
+        return [d.decode() if isinstance(d, bytes) else d for d in data]
 
-        return command_str.split("==%SEPARATOR%==")
+    async def sadd(self, name: str, *members: str) -> int:
+        added_count = await self._command("sadd", name, *members)
+        return added_count
 
-    async def get_command_shortcut(
-        self, user_id: str, name: str
-    ) -> Optional[List[str]]:
-        res = await self.hget(f"shortcuts:user.{user_id}", name)
-        return self._parse_shortcuts(res)
+    async def srem(self, name: str, *members: str) -> int:
+        removed_count = await self._command("srem", name, *members)
+        return removed_count
+
+    async def zadd(self, name: str, mapping: Dict[str, float]) -> None:
+        await self._command("zadd", name, mapping)
+
+    async def zrem(self, name: str, *members: str) -> int:
+        removed_count = await self._command("zrem", name, *members)
+        return removed_count
+
+    async def zcard(self, name: str) -> int:
+        count = await self._command("zcard", name)
+        return count
 
-    async def get_all_command_shortcuts(self, user_id: str) -> Dict[str, List[str]]:
+    async def zrangebyscore(
+        self,
+        name: str,
+        min_score: float | str,
+        max_score: float | str,
+        *,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+    ) -> List[str]:
+        data = cast(
+            List[bytes],
+            await self._command(
+                "zrangebyscore", name, min_score, max_score, start=start, num=num
+            ),
+        )
+        return [d.decode() for d in data]
+
+    async def zrangebyscore_withscores(
+        self,
+        name: str,
+        min_score: float | str,
+        max_score: float | str,
+        *,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        data = cast(
+            List[Tuple[bytes, float]],
+            await self._command(
+                "zrangebyscore",
+                name,
+                min_score,
+                max_score,
+                start=start,
+                num=num,
+                withscores=True,
+            ),
+        )
+        return [(member.decode(), score) for member, score in data]
+
+    async def _load_command_shortcuts(
+        self, user_id: str
+    ) -> Dict[str, List[ShortcutStep]]:
         res = await self.hgetall(f"shortcuts:user.{user_id}")
-        shortcuts = {}
+        return {name: decode_shortcut(steps) for name, steps in res.items()}
+
+    async def _get_command_shortcuts(
+        self, user_id: str
+    ) -> Dict[str, List[ShortcutStep]]:
+        # Cached even when empty, as most users who send messages have none
+        return await self._shortcuts.get_or_load(
+            user_id, lambda: self._load_command_shortcuts(user_id)
+        )
 
-        for name, command in res.items():
-            shortcuts[name] = self._parse_shortcuts(command) or [" "]
+    async def get_command_shortcut(
+        self, user_id: str, name: str
+    ) -> Optional[List[ShortcutStep]]:
+        return (await self._get_command_shortcuts(user_id)).get(name)
 
-        return shortcuts
+    async def get_all_command_shortcuts(
+        self, user_id: str
+    ) -> Dict[str, List[ShortcutStep]]:
+        return dict(await self._get_command_shortcuts(user_id))
 
     async def set_command_shortcut(
-        self, user_id: str, name: str, command: List[str]
+        self, user_id: str, name: str, steps: Sequence[ShortcutStep]
     ) -> None:
         await self.hset(
             f"shortcuts:user.{user_id}",
             key=name,
-            value="==%SEPARATOR%==".join(command),
+            value=encode_shortcut(steps),
         )
+        self._shortcuts.invalidate(user_id)
 
     async def delete_command_shortcut(self, user_id: str, name: str) -> int:
-        return await self.hdel(f"shortcuts:user.{user_id}", name)
+        deleted_count = await self.hdel(f"shortcuts:user.{user_id}", name)
+        self._shortcuts.invalidate(user_id)
+        return deleted_count
@@ -1,20 +1,28 @@
 import os
+import copy
+import time
 import glob
 import asyncio
 import logging
-from typing import cast, Any, List
+from contextvars import ContextVar
+from typing import cast, Any, List, Tuple, Sequence
 import redis
 import discord
 from discord.ext import commands as dc
+from discord.ext.commands.view import StringView
 from watdo import dt
 from watdo.errors import CancelCommand
 from watdo.environ import IS_DEV, SYNC_SLASH_COMMANDS
 from watdo.logging import get_logger
+from watdo.metrics import metrics
 from watdo.reminder import Reminder
 from watdo.database import Database
+from watdo.shortcuts import ShortcutStep, MAX_SHORTCUT_DEPTH, MAX_SHORTCUT_STEPS
 from watdo.discord.cogs import BaseCog
 from watdo.discord.embeds import ErrorEmbed
 
+_command_started_at: ContextVar[float] = ContextVar("command_started_at")
+
 
 class Bot(dc.Bot):
     def __init__(self, *, loop: asyncio.AbstractEventLoop, database: Database) -> None:
@@ -31,6 +39,9 @@ class Bot(dc.Bot):
             if name.startswith("_on_") and name.endswith("_event"):
                 self._add_event(name.lstrip("_").rstrip("_event"))
 
+        self.before_invoke(self._before_command)
+        self.after_invoke(self._after_command)
+
     def _add_event(self, event_name: str) -> None:
         event = getattr(self, f"_{event_name}_event")
 
@@ -66,35 +77,90 @@ class Bot(dc.Bot):
 
         await super().start(token, reconnect=reconnect)
 
-    async def _process_commands(
-        self, command: List[str], message: discord.Message
-    ) -> None:
-        try:
-            # Remove command the same as the trigger message to avoid infinite loop
-            command.remove(message.content)
-        except ValueError:
-            pass
+    async def _before_command(self, ctx: dc.Context["Bot"]) -> None:
+        # Database operations from here on are the command's, not the message's
+        if ctx.command is not None:
+            metrics.enter_scope(f"command:{ctx.command.qualified_name}")
+            _command_started_at.set(time.perf_counter())
+
+    async def _after_command(self, ctx: dc.Context["Bot"]) -> None:
+        started_at = _command_started_at.get(None)
+
+        if ctx.command is not None and started_at is not None:
+            latency = time.perf_counter() - started_at
+            metrics.observe_command(ctx.command.qualified_name, latency)
+
+    async def _expand_shortcut(
+        self,
+        user_id: str,
+        steps: Sequence[ShortcutStep],
+        *,
+        parents: Tuple[str, ...],
+    ) -> List[ShortcutStep]:
+        """Inline the shortcuts referenced by `steps`, skipping ones that would
+        recurse or nest deeper than `MAX_SHORTCUT_DEPTH`."""
+        prefix = str(self.command_prefix)
+        expanded: List[ShortcutStep] = []
+
+        for step in steps:
+            if step.command is None:
+                step = ShortcutStep.parse(step.args, prefix)
+
+            if step.command is not None:
+                expanded.append(step)
+            elif step.args not in parents and len(parents) < MAX_SHORTCUT_DEPTH:
+                nested_steps = await self.db.get_command_shortcut(user_id, step.args)
+
+                if nested_steps is not None:
+                    expanded += await self._expand_shortcut(
+                        user_id, nested_steps, parents=(*parents, step.args)
+                    )
+
+            if len(expanded) >= MAX_SHORTCUT_STEPS:
+                return expanded[:MAX_SHORTCUT_STEPS]
+
+        return expanded
 
-        for c in command:
-            message.content = c
-            await self.on_message(message)
+    async def _run_shortcut(
+        self, steps: Sequence[ShortcutStep], message: discord.Message
+    ) -> None:
+        prefix = str(self.command_prefix)
+
+        for step in steps:
+            # Invoked directly, as parsing and dispatching was done already
+            step_message = copy.copy(message)
+            step_message.content = step.as_text(prefix)
+            ctx: dc.Context[Bot] = dc.Context(
+                message=step_message,
+                bot=self,
+                view=StringView(step.args),
+                prefix=prefix,
+                command=self.all_commands.get(step.command or ""),
+                invoked_with=step.command,
+            )
+            await self.invoke(ctx)
 
     async def process_command_shortcuts(self, message: discord.Message) -> bool:
+        user_id = str(message.author.id)
+
         try:
-            command = await self.db.get_command_shortcut(
-                str(message.author.id),
-                message.content,
+            steps = await self.db.get_command_shortcut(user_id, message.content)
+
+            if steps is None:
+                return False
+
+            steps = await self._expand_shortcut(
+                user_id, steps, parents=(message.content,)
             )
         except redis.exceptions.ConnectionError:
-            command = None
-
-        if command is None:
             return False
 
-        self.loop.create_task(self._process_commands(command, message))
+        self.loop.create_task(self._run_shortcut(steps, message))
         return True
 
     async def on_message(self, message: discord.Message) -> None:
+        metrics.enter_scope("message")
+
         try:
             await self.process_command_shortcuts(message)
 
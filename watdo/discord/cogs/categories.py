@@ -1,6 +1,6 @@
-from collections import defaultdict
 from discord.ext import commands as dc
 from watdo.models import Task
+from watdo.safe_data import TaskCategory
 from watdo.discord import Bot
 from watdo.discord.cogs import BaseCog
 from watdo.discord.embeds import Embed
@@ -14,10 +14,7 @@ class Categories(BaseCog):
         """Show your tasks by category."""
         profile = await self.get_profile(ctx)
         tasks_coll = await Task.get_tasks_of_profile(self.db, profile)
-        categories = defaultdict(list)
-
-        for task in tasks_coll:
-            categories[task.category.value].append(task)
+        categories = tasks_coll.group_by_category()
 
         embed = Embed(self.bot, "TASKS")
 
@@ -43,24 +40,21 @@ class Categories(BaseCog):
             await BaseCog.send(ctx, f'Category "{old_name}" not found ❌')
             return
 
-        for task in tasks:
-            task.category.set(new_name)
-            self.bot.loop.create_task(task.save())
+        category = TaskCategory(new_name)
+
+        def rename(task: Task) -> None:
+            task.category = category
 
+        renamed_count = await tasks.update_where(rename)
         await BaseCog.send(
-            ctx, f'Category "{old_name}" has been renamed to "{new_name}" ✅'
+            ctx,
+            f'Category "{old_name}" has been renamed to "{new_name}" ✅ '
+            f"({renamed_count} task(s))",
         )
 
-    async def _delete_category_task(
-        self, ctx: dc.Context[Bot], uid: str, task: Task
-    ) -> None:
-        await task.delete()
-        await BaseCog.send(ctx, f'Task "{task.title.value}" has been removed ✅')
-
     @dc.hybrid_command(aliases=["dc"])  # type: ignore[arg-type]
     async def delete_category(self, ctx: dc.Context[Bot], name: str) -> None:
         """Delete a category."""
-        uid = str(ctx.author.id)
         profile = await self.get_profile(ctx)
         tasks = await Task.get_tasks_of_profile(self.db, profile, category=name)
 
@@ -68,8 +62,10 @@ class Categories(BaseCog):
             await BaseCog.send(ctx, f'Category "{name}" not found ❌')
             return
 
-        for task in tasks:
-            self.bot.loop.create_task(self._delete_category_task(ctx, uid, task))
+        deleted_count = await tasks.delete_where()
+        await BaseCog.send(
+            ctx, f'Category "{name}" has been removed ✅ ({deleted_count} task(s))'
+        )
 
 
 async def setup(bot: Bot) -> None:
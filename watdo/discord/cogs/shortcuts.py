@@ -1,6 +1,7 @@
 from typing import List
 from discord.ext import commands as dc
 from watdo.errors import CancelCommand
+from watdo.shortcuts import ShortcutStep
 from watdo.discord import Bot
 from watdo.discord.cogs import BaseCog
 
@@ -9,7 +10,8 @@ class Shortcuts(BaseCog, description="Speed up your workflow with command shortc
     @dc.hybrid_command()  # type: ignore[arg-type]
     async def set_short(self, ctx: dc.Context[Bot], name: str) -> None:
         """Set a command shortcut."""
-        command: List[str] = []
+        prefix = str(self.bot.command_prefix)
+        command: List[ShortcutStep] = []
 
         while True:
             if len(command) == 0:
@@ -33,21 +35,22 @@ class Shortcuts(BaseCog, description="Speed up your workflow with command shortc
             if inp == "CANCEL":
                 raise CancelCommand()
 
-            command.append(inp)
+            command.append(ShortcutStep.parse(inp, prefix))
 
         await self.db.set_command_shortcut(str(ctx.author.id), name, command)
 
-        cs = "".join(f"```\n{c}\n```" for c in command)
+        cs = "".join(f"```\n{c.as_text(prefix)}\n```" for c in command)
         await BaseCog.send(ctx, f"Command shortcut set ✅\n**{name}**\n{cs}")
 
     @dc.hybrid_command()  # type: ignore[arg-type]
     async def shorts(self, ctx: dc.Context[Bot]) -> None:
         """Show all your command shortcuts."""
+        prefix = str(self.bot.command_prefix)
         data = await self.db.get_all_command_shortcuts(str(ctx.author.id))
         message = []
 
         for name, command in data.items():
-            cs = "".join(f"```\n{c}\n```" for c in command)
+            cs = "".join(f"```\n{c.as_text(prefix) or ' '}\n```" for c in command)
             message.append(f"**{name}**\n{cs}")
 
         await BaseCog.send(ctx, "\n".join(message) or "No command shortcuts ❌")
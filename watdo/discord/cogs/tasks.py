@@ -1,18 +1,23 @@
 import time
+import functools
 from uuid import uuid4
-from typing import Dict, Optional, Tuple, Sequence, Callable, Awaitable
-import recurrent
-import dateparser
+from typing import Optional, Tuple, Sequence, Callable, Awaitable
 import discord
 from discord.ext import commands as dc
-from watdo import dt
+from watdo import dt, due_dates
 from watdo.errors import CancelCommand
 from watdo.models import Profile, Task, ScheduledTask, DueT
 from watdo.safe_data import Timestamp
 from watdo.collections import TasksCollection
 from watdo.discord import Bot
 from watdo.discord.cogs import BaseCog
-from watdo.discord.embeds import Embed, TaskEmbed, PagedEmbed
+from watdo.discord.embeds import (
+    Embed,
+    TaskEmbed,
+    PagedEmbed,
+    IterEmbeds,
+    RangeEmbeds,
+)
 
 
 class Tasks(BaseCog):
@@ -24,47 +29,18 @@ class Tasks(BaseCog):
 
         embed = Embed(self.bot, "TASKS SUMMARY")
 
-        total = 0
-        is_important = 0
-        overdue = 0
-        recurring = 0
-        one_time = 0
-        done = 0
-        max_categ_len = 0
-        categories: Dict[str, int] = {}
+        categories = await Task.get_category_counts(self.db, profile)
+        max_categ_len = max((len(c) for c in categories), default=0)
 
-        for task in tasks:
-            total += 1
+        with dt.frozen_now():
+            counts = tasks.count()
 
-            if task.importance.value:
-                is_important += 1
-
-            if isinstance(task, ScheduledTask):
-                if task.is_overdue:
-                    overdue += 1
-
-            if isinstance(task, ScheduledTask) and task.is_recurring:
-                recurring += 1
-            else:
-                one_time += 1
-
-            if task.is_done:
-                done += 1
-
-            if len(task.category.value) > max_categ_len:
-                max_categ_len = len(task.category.value)
-
-            try:
-                categories[task.category.value] += 1
-            except KeyError:
-                categories[task.category.value] = 1
-
-        embed.add_field(name="Total", value=total)
-        embed.add_field(name="Important", value=is_important)
-        embed.add_field(name="Overdue", value=overdue)
-        embed.add_field(name="Recurring", value=recurring)
-        embed.add_field(name="One-Time", value=one_time)
-        embed.add_field(name="Done", value=done)
+        embed.add_field(name="Total", value=counts.total)
+        embed.add_field(name="Important", value=counts.important)
+        embed.add_field(name="Overdue", value=counts.overdue)
+        embed.add_field(name="Recurring", value=counts.recurring)
+        embed.add_field(name="One-Time", value=counts.one_time)
+        embed.add_field(name="Done", value=counts.done)
 
         if categories:
             c = "\n".join(
@@ -76,23 +52,36 @@ class Tasks(BaseCog):
 
         await BaseCog.send(ctx, embed=embed)
 
+    def _build_task_embed(self, task: Task, *, is_simple: bool) -> discord.Embed:
+        with dt.frozen_now():
+            return TaskEmbed(self.bot, task, is_simple=is_simple)
+
     async def _send_tasks(
         self,
         ctx: dc.Context[Bot],
-        tasks_getter: Callable[[], Awaitable[Sequence[Task]]],
+        tasks_getter: Callable[[], Awaitable[Sequence[Task] | TasksCollection]],
         *,
         as_text: bool,
         is_simple: bool = False,
     ) -> None:
-        async def embeds_getter() -> Tuple[discord.Embed, ...]:
-            return tuple(
-                TaskEmbed(self.bot, task, is_simple=is_simple)
-                for task in await tasks_getter()
-            )
+        """A `TasksCollection` is shown by priority, ordered only as far as
+        its pages are viewed."""
+        build_embed = functools.partial(self._build_task_embed, is_simple=is_simple)
+
+        async def embeds_getter() -> Sequence[discord.Embed]:
+            tasks = await tasks_getter()
+
+            if isinstance(tasks, TasksCollection):
+                return IterEmbeds(tasks.iter_by_priority(), len(tasks), build_embed)
+
+            return IterEmbeds(iter(tasks), len(tasks), build_embed)
 
         if as_text:
             tasks = await tasks_getter()
 
+            if isinstance(tasks, TasksCollection):
+                tasks = tasks.sort_by_priority().items
+
             if not tasks:
                 await BaseCog.send(ctx, "No tasks.")
                 return
@@ -112,47 +101,24 @@ class Tasks(BaseCog):
     ) -> None:
         """Show your tasks list."""
 
-        async def tasks_getter() -> Sequence[Task]:
-            tasks = await Task.get_tasks_of_profile(
+        async def tasks_getter() -> TasksCollection:
+            return await Task.get_tasks_of_profile(
                 self.db, profile, category=category or None
             )
-            tasks.sort_by_priority()
-            return tasks.items
 
         profile = await self.get_profile(ctx)
         await self._send_tasks(ctx, tasks_getter, as_text=as_text)
 
-    def _parse_due(self, ctx: dc.Context[Bot], due: str, utc_offset: float) -> DueT:
-        tz = dt.utc_offset_to_tz(utc_offset)
-        date = dateparser.parse(
-            due,
-            settings={
-                "RETURN_AS_TIMEZONE_AWARE": True,
-                "TIMEZONE": tz.tzname(dt.date_now(utc_offset)) or "",
-            },
-        )
-
-        if date is not None:
-            return date.timestamp()  # type: ignore[return-value]
-
-        rr: Optional[str | dt.datetime] = recurrent.parse(
-            due,
-            now=dt.date_now(utc_offset),
-        )
+    async def _parse_due(
+        self, ctx: dc.Context[Bot], due: str, utc_offset: float
+    ) -> DueT:
+        parsed_due = await due_dates.parse_due(due, utc_offset)
 
-        if isinstance(rr, str):
-            if "DTSTART:" not in rr:
-                date_now = dt.date_now(utc_offset)
-                d = date_now.strftime("%Y%m%dT%H%M%S")
-                rr = f"DTSTART:{d}\n{rr}"
+        if parsed_due is None:
+            self.bot.loop.create_task(BaseCog.send(ctx, f"Failed to parse `{due}`"))
+            raise CancelCommand()
 
-            return rr  # type: ignore[return-value]
-
-        if isinstance(rr, dt.datetime_type):
-            return rr.timestamp()  # type: ignore[return-value]
-
-        self.bot.loop.create_task(BaseCog.send(ctx, f"Failed to parse `{due}`"))
-        raise CancelCommand()
+        return parsed_due  # type: ignore[return-value]
 
     async def _update_task(
         self,
@@ -175,9 +141,10 @@ class Tasks(BaseCog):
                 existing_task.db,
                 profile=existing_task.profile,
                 profile_id=existing_task.profile_id.value,
-                last_done=existing_task.last_done.value
-                if existing_task.last_done
-                else None,
+                last_done=(
+                    existing_task.last_done.value if existing_task.last_done else None
+                ),
+                version=existing_task.version.value,
                 uuid=existing_task.uuid.value,
                 created_at=existing_task.created_at.value,
                 created_by=existing_task.created_by.value,
@@ -196,9 +163,10 @@ class Tasks(BaseCog):
                 existing_task.db,
                 profile=existing_task.profile,
                 profile_id=existing_task.profile_id.value,
-                last_done=existing_task.last_done.value
-                if existing_task.last_done
-                else None,
+                last_done=(
+                    existing_task.last_done.value if existing_task.last_done else None
+                ),
+                version=existing_task.version.value,
                 uuid=existing_task.uuid.value,
                 created_at=existing_task.created_at.value,
                 created_by=existing_task.created_by.value,
@@ -209,13 +177,14 @@ class Tasks(BaseCog):
                 category=category,
                 importance=importance,
                 energy=energy,
-                due=self._parse_due(ctx, due, profile.utc_offset.value),
+                due=await self._parse_due(ctx, due, profile.utc_offset.value),
                 description=description,
                 has_reminder=has_reminder,
                 is_auto_done=is_auto_done,
             )
 
-            task.next_reminder = Timestamp(task.due_date.timestamp())
+            if task.due_date is not None:
+                task.next_reminder = Timestamp(task.due_date.timestamp())
 
         await task.save()
         await BaseCog.send(ctx, "Task updated ✅", embed=TaskEmbed(self.bot, task))
@@ -268,13 +237,14 @@ class Tasks(BaseCog):
                 category=category,
                 importance=importance,
                 energy=energy,
-                due=self._parse_due(ctx, due, profile.utc_offset.value),
+                due=await self._parse_due(ctx, due, profile.utc_offset.value),
                 description=description,
                 has_reminder=has_reminder,
                 is_auto_done=is_auto_done,
             )
 
-            task.next_reminder = Timestamp(task.due_date.timestamp())
+            if task.due_date is not None:
+                task.next_reminder = Timestamp(task.due_date.timestamp())
 
         await task.save()
         await BaseCog.send(ctx, "Task added ✅", embed=TaskEmbed(self.bot, task))
@@ -355,13 +325,37 @@ class Tasks(BaseCog):
         as_text: bool = False,
     ) -> None:
         """Show priority tasks."""
+        if category:
+            await self._send_tasks(
+                ctx,
+                lambda: self._get_do_tasks(ctx, category),
+                as_text=as_text,
+                is_simple=True,
+            )
+            return
 
-        async def tasks_getter() -> Sequence[Task]:
-            tasks = await self._get_do_tasks(ctx, category)
-            tasks.sort_by_priority()
-            return tasks.items
+        profile = await self.get_profile(ctx)
 
-        await self._send_tasks(ctx, tasks_getter, as_text=as_text, is_simple=True)
+        if as_text:
+            await self._send_tasks(
+                ctx, lambda: Task.get_by_priority(self.db, profile), as_text=True
+            )
+            return
+
+        # Only the tasks of the pages viewed are fetched, from the priority index
+        async def load_range(start: int, stop: int) -> Sequence[Task]:
+            return await Task.get_by_priority(
+                self.db, profile, start=start, num=stop - start
+            )
+
+        async def embeds_getter() -> Sequence[discord.Embed]:
+            return RangeEmbeds(
+                await Task.count_undone(self.db, profile),
+                load_range,
+                functools.partial(self._build_task_embed, is_simple=True),
+            )
+
+        await PagedEmbed(ctx, embeds_getter).send()
 
     @dc.hybrid_command(aliases=["dailies"])  # type: ignore[arg-type]
     async def do_dailies(
@@ -407,7 +401,7 @@ class Tasks(BaseCog):
         task = await self.task_from_title(ctx, title)
 
         try:
-            await task.done()
+            task = await task.done()
         except ValueError as error:
             await BaseCog.send(ctx, str(error))
         else:
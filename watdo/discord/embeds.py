@@ -1,7 +1,22 @@
 import math
 import logging
 import asyncio
-from typing import TYPE_CHECKING, cast, Any, Tuple, Callable, Awaitable
+from abc import ABC, abstractmethod
+from typing import (
+    TYPE_CHECKING,
+    cast,
+    overload,
+    Any,
+    Set,
+    Dict,
+    List,
+    TypeVar,
+    Generic,
+    Callable,
+    Iterator,
+    Sequence,
+    Awaitable,
+)
 import discord
 from discord.ext import commands as dc
 from watdo import dt
@@ -10,6 +25,8 @@ from watdo.models import Profile, Task, ScheduledTask
 if TYPE_CHECKING:
     from watdo.discord import Bot
 
+T = TypeVar("T")
+
 
 class Embed(discord.Embed):
     def __init__(self, bot: "Bot", title: str, **kwargs: Any) -> None:
@@ -97,10 +114,11 @@ class TaskEmbed(Embed):
             date_format = "%b %d, %Y\n%I:%M %p"
 
             if isinstance(task, ScheduledTask):
-                self.add_field(
-                    name="Due Date",
-                    value=f"{task.due_date.strftime(date_format)}",
-                )
+                if task.due_date is not None:
+                    self.add_field(
+                        name="Due Date",
+                        value=f"{task.due_date.strftime(date_format)}",
+                    )
 
                 if task.is_recurring:
                     self.set_footer(text=task.rrulestr)
@@ -123,11 +141,107 @@ class TaskEmbed(Embed):
                 self.add_field(name="Created By", value=created_by.mention)
 
 
+class LazyEmbeds(Sequence[discord.Embed], ABC):
+    """Embeds built the first time they're accessed. Those from `start` to
+    `stop` can only be accessed once `load` is awaited for them."""
+
+    def __init__(self, length: int) -> None:
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    async def load(self, start: int, stop: int) -> None:
+        pass
+
+    @abstractmethod
+    def _get(self, index: int) -> discord.Embed:
+        raise NotImplementedError
+
+    @overload
+    def __getitem__(self, index: int) -> discord.Embed: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[discord.Embed]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> discord.Embed | Sequence[discord.Embed]:
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(self._length)))
+
+        if index < 0:
+            index += self._length
+
+        if not 0 <= index < self._length:
+            raise IndexError("embed index out of range")
+
+        return self._get(index)
+
+
+class IterEmbeds(LazyEmbeds, Generic[T]):
+    """Embeds of `length` items, taken from `items` as far as the accessed
+    index, so an iterator that orders them as it goes only has to order the
+    pages that are shown."""
+
+    def __init__(
+        self,
+        items: Iterator[T],
+        length: int,
+        build: Callable[[T], discord.Embed],
+    ) -> None:
+        super().__init__(length)
+        self._items = items
+        self._build = build
+        self._embeds: List[discord.Embed] = []
+
+    def _get(self, index: int) -> discord.Embed:
+        while len(self._embeds) <= index:
+            self._embeds.append(self._build(next(self._items)))
+
+        return self._embeds[index]
+
+
+class RangeEmbeds(LazyEmbeds, Generic[T]):
+    """Embeds of `length` items, fetched with `load_range` a page at a time."""
+
+    def __init__(
+        self,
+        length: int,
+        load_range: Callable[[int, int], Awaitable[Sequence[T]]],
+        build: Callable[[T], discord.Embed],
+    ) -> None:
+        super().__init__(length)
+        self._load_range = load_range
+        self._build = build
+        self._embeds: Dict[int, discord.Embed] = {}
+
+    async def load(self, start: int, stop: int) -> None:
+        missing = [
+            i for i in range(start, min(stop, self._length)) if i not in self._embeds
+        ]
+
+        if not missing:
+            return
+
+        items = await self._load_range(missing[0], missing[-1] + 1)
+
+        for index, item in enumerate(items, missing[0]):
+            self._embeds[index] = self._build(item)
+
+    def _get(self, index: int) -> discord.Embed:
+        try:
+            return self._embeds[index]
+        except KeyError:
+            # Not loaded, or removed since the length was counted
+            raise IndexError("embed not loaded") from None
+
+
 class PagedEmbed:
     def __init__(
         self,
         ctx: dc.Context["Bot"],
-        embeds_getter: Callable[[], Awaitable[Tuple[discord.Embed, ...]]],
+        embeds_getter: Callable[[], Awaitable[Sequence[discord.Embed]]],
         *,
         timeout: float = 60 * 60,  # 1 hour
         empty_message: str = "No items.",
@@ -141,7 +255,8 @@ class PagedEmbed:
         self.embeds_len = 1
 
         self.message: discord.Message
-        self.embeds: Tuple[discord.Embed, ...]
+        self.embeds: Sequence[discord.Embed]
+        self._footed: Set[int] = set()
 
         self._controls = {
             "extract": "✴",
@@ -154,16 +269,34 @@ class PagedEmbed:
 
     async def update_embeds(self) -> None:
         self.embeds = await self.embeds_getter()
-        self._set_embeds_footer()
+        self._footed.clear()
+
+    async def _get_page(self, start: int, stop: int) -> List[discord.Embed]:
+        """The embeds from `start` to `stop`, numbered. Only embeds that are
+        shown are numbered, as they may be built lazily."""
+        page = []
+
+        if isinstance(self.embeds, LazyEmbeds):
+            await self.embeds.load(start, stop)
+
+        for index in range(start, min(stop, len(self.embeds))):
+            try:
+                embed = self.embeds[index]
+            except IndexError:
+                break
 
-    def _set_embeds_footer(self) -> None:
-        for index, embed in enumerate(self.embeds):
-            page_no = f"{index + 1}/{len(self.embeds)}"
+            if index not in self._footed:
+                self._footed.add(index)
+                page_no = f"{index + 1}/{len(self.embeds)}"
 
-            if embed.footer.text is None:
-                embed.set_footer(text=page_no)
-            else:
-                embed.set_footer(text=f"{page_no} • {embed.footer.text}")
+                if embed.footer.text is None:
+                    embed.set_footer(text=page_no)
+                else:
+                    embed.set_footer(text=f"{page_no} • {embed.footer.text}")
+
+            page.append(embed)
+
+        return page
 
     def _get_last_page_index(self) -> int:
         try:
@@ -172,7 +305,7 @@ class PagedEmbed:
         except ZeroDivisionError:
             return 0
 
-    def _process_reaction(self, reaction: str, user: discord.User) -> None:
+    async def _process_reaction(self, reaction: str, user: discord.User) -> None:
         embeds = self.embeds
 
         if len(embeds) == 0:
@@ -192,22 +325,16 @@ class PagedEmbed:
         elif reaction == self._controls["refresh"]:
             pass
 
-        embeds = embeds[
-            self.current_page * self.embeds_len : self.current_page * self.embeds_len
-            + self.embeds_len
-        ]
+        start = self.current_page * self.embeds_len
+        page = await self._get_page(start, start + self.embeds_len)
 
-        if len(embeds) == 0:
+        if len(page) == 0:
             self.current_page = self._get_last_page_index()
-            embeds = embeds[
-                self.current_page
-                * self.embeds_len : self.current_page
-                * self.embeds_len
-                + self.embeds_len
-            ]
+            start = self.current_page * self.embeds_len
+            page = await self._get_page(start, start + self.embeds_len)
 
         self.ctx.bot.loop.create_task(
-            self.message.edit(embeds=embeds or [self.empty_message])
+            self.message.edit(embeds=page or [self.empty_message])
         )
         self.ctx.bot.loop.create_task(
             self.ctx.bot.remove_reaction(
@@ -232,17 +359,14 @@ class PagedEmbed:
                 break
 
             await self.update_embeds()
-            self._process_reaction(str(reaction), user)
+            await self._process_reaction(str(reaction), user)
 
     async def send(self) -> discord.Message:
         from watdo.discord.cogs import BaseCog
 
         await self.update_embeds()
-        self.message = await BaseCog.send(
-            self.ctx,
-            embeds=self.embeds[self.current_page : self.embeds_len]
-            or [self.empty_message],
-        )
+        page = await self._get_page(self.current_page, self.embeds_len)
+        self.message = await BaseCog.send(self.ctx, embeds=page or [self.empty_message])
 
         for emoji in self._controls.values():
             self.ctx.bot.loop.create_task(self.message.add_reaction(emoji))
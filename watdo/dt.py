@@ -1,15 +1,37 @@
 import time
 import datetime as dt
-from typing import NewType
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NewType, Iterator, Optional
 
 datetime_type = dt.datetime
 datetime = NewType("datetime", dt.datetime)
 timezone = NewType("timezone", dt.timezone)
 
+_frozen_now: ContextVar[Optional[float]] = ContextVar("frozen_now", default=None)
+
+
+def now() -> float:
+    """The current timestamp, unless frozen by `frozen_now`."""
+    frozen_now = _frozen_now.get()
+    return time.time() if frozen_now is None else frozen_now
+
+
+@contextmanager
+def frozen_now() -> Iterator[None]:
+    """Make `now` and `date_now` return the same time within the block, so
+    what's derived from them is consistent and computed once per render."""
+    token = _frozen_now.set(now())
+
+    try:
+        yield
+    finally:
+        _frozen_now.reset(token)
+
 
 def date_now(utc_offset: float) -> datetime:
     tz = dt.timezone(dt.timedelta(hours=utc_offset))
-    return datetime(dt.datetime.now(tz))
+    return datetime(dt.datetime.fromtimestamp(now(), tz))
 
 
 def fromtimestamp(timestamp: float, utc_offset: float) -> datetime:
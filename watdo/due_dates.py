@@ -0,0 +1,88 @@
+"""Parsing of natural language due dates, like "tomorrow at 5pm" or "every
+morning".
+
+A parse takes up to hundreds of milliseconds, so it runs in a thread pool
+rather than on the event loop. Results are cached by phrase, UTC offset and
+the time bucket they were parsed in, whose start is the "now" relative
+phrases are parsed against."""
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import recurrent
+import dateparser
+from watdo import dt
+from watdo.cache import TTLCache
+from watdo.metrics import metrics
+
+# Relative phrases like "in 2 hours" can be off by this many seconds at most
+TIME_BUCKET = 60
+
+PARSE_CACHE_SIZE = 1024
+PARSE_WORKERS = 2
+
+# Parses running or waiting for a worker, beyond which callers wait their turn
+PARSE_QUEUE_SIZE = 64
+
+# Guessing the language of a phrase was most of the cost of parsing it
+LANGUAGES = ["en"]
+
+_executor = ThreadPoolExecutor(
+    max_workers=PARSE_WORKERS, thread_name_prefix="due_dates"
+)
+_slots = asyncio.Semaphore(PARSE_QUEUE_SIZE)
+_cache: TTLCache[Tuple[str, float, int], Optional[str | float]] = TTLCache(
+    max_size=PARSE_CACHE_SIZE, ttl=TIME_BUCKET
+)
+metrics.register_cache("due_dates", _cache)
+
+
+def normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def parse(phrase: str, utc_offset: float, now: float) -> Optional[str | float]:
+    """Parse `phrase` into a timestamp, or into an RRULE string if it recurs.
+    Returns `None` if it's neither."""
+    date_now = dt.fromtimestamp(now, utc_offset)
+    date = dateparser.parse(
+        phrase,
+        languages=LANGUAGES,
+        settings={
+            "RETURN_AS_TIMEZONE_AWARE": True,
+            "TIMEZONE": date_now.tzname() or "",
+            "RELATIVE_BASE": date_now.replace(tzinfo=None),
+        },
+    )
+
+    if date is not None:
+        return date.timestamp()
+
+    rr: Optional[str | dt.datetime] = recurrent.parse(phrase, now=date_now)
+
+    if isinstance(rr, str):
+        if "DTSTART:" not in rr:
+            d = date_now.strftime("%Y%m%dT%H%M%S")
+            rr = f"DTSTART:{d}\n{rr}"
+
+        return rr
+
+    if isinstance(rr, dt.datetime_type):
+        return rr.timestamp()
+
+    return None
+
+
+async def parse_due(phrase: str, utc_offset: float) -> Optional[str | float]:
+    """Like `parse`, relative to now, without blocking the event loop."""
+    phrase = normalize(phrase)
+    bucket = int(time.time() // TIME_BUCKET)
+
+    async def load() -> Optional[str | float]:
+        async with _slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                _executor, parse, phrase, utc_offset, bucket * TIME_BUCKET
+            )
+
+    return await _cache.get_or_load((phrase, utc_offset, bucket), load)
@@ -1,6 +1,23 @@
 import os
 
 IS_DEV = bool(int(os.environ["IS_DEV"]))
-REDIS_URL = str(os.environ["REDIS_URL"])
+REDIS_URL = str(os.environ.get("REDIS_URL", "redis://localhost"))
 DISCORD_TOKEN = str(os.environ["DISCORD_TOKEN"])
 SYNC_SLASH_COMMANDS = bool(int(os.environ["SYNC_SLASH_COMMANDS"]))
+RECORD_CODEC = str(os.environ.get("RECORD_CODEC", "binary"))
+REDIS_POOL_MIN_SIZE = int(os.environ.get("REDIS_POOL_MIN_SIZE", "1"))
+REDIS_POOL_MAX_SIZE = int(os.environ.get("REDIS_POOL_MAX_SIZE", "16"))
+REDIS_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("REDIS_POOL_ACQUIRE_TIMEOUT", "5"))
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_PUBSUB = bool(int(os.environ.get("PROFILE_CACHE_PUBSUB", "0")))
+STORAGE_BACKEND = str(os.environ.get("STORAGE_BACKEND", "redis"))
+SQLITE_PATH = str(os.environ.get("SQLITE_PATH", "watdo.sqlite3"))
+METRICS_SUMMARY_INTERVAL = float(os.environ.get("METRICS_SUMMARY_INTERVAL", "3600"))
+METRICS_HOST = str(os.environ.get("METRICS_HOST", "127.0.0.1"))
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+LOOP_MONITOR = bool(int(os.environ.get("LOOP_MONITOR", "1")))
+LOOP_MONITOR_INTERVAL = float(os.environ.get("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_LAG_THRESHOLD = float(
+    os.environ.get("LOOP_LAG_THRESHOLD", "0.1" if IS_DEV else "0.5")
+)
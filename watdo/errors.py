@@ -1,7 +1,8 @@
-from typing import TYPE_CHECKING, Any, Type
+from typing import TYPE_CHECKING, Any, Type, Sequence
 from discord.ext import commands as dc
 
 if TYPE_CHECKING:
+    from watdo.models import Task
     from watdo.safe_data import SafeData
 
 
@@ -17,3 +18,10 @@ class CustomException(Exception):
 class InvalidData(CustomException):
     def __init__(self, cls: "Type[SafeData[Any]]", message: str, *args: object) -> None:
         super().__init__(f"{cls.__name__} {message}", *args)
+
+
+class VersionConflict(CustomException):
+    def __init__(self, tasks: "Sequence[Task]", *args: object) -> None:
+        titles = ", ".join(f'"{t.title.value}"' for t in tasks)
+        super().__init__(f"{titles} got changed meanwhile, please try again.", *args)
+        self.tasks = tasks
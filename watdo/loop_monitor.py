@@ -0,0 +1,112 @@
+"""Detects callbacks that block the event loop, which stalls the gateway
+heartbeat of every guild the bot is in.
+
+A task on the loop measures how late it wakes up, while a watchdog thread
+takes the stack of the loop thread whenever the task hasn't woken up for
+longer than the threshold. The blocking callback is reported once the loop
+gets free again, with that stack and the scope that ran it."""
+
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Any, NamedTuple, Optional
+from watdo.logging import get_logger
+from watdo.metrics import metrics, scoped_task_factory, DEFAULT_SCOPE
+
+
+class Stall(NamedTuple):
+    scope: str
+    task_name: Optional[str]
+    stack: str
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        interval: float,
+        threshold: float,
+    ) -> None:
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._stall: Optional[Stall] = None
+        self._beat_task: Optional[asyncio.Task[None]] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Must be called from the loop's thread."""
+        self._loop_thread_id = threading.get_ident()
+
+        # Lets the watchdog tell which scope the blocking task runs in
+        self.loop.set_task_factory(scoped_task_factory)
+
+        self._stopped.clear()
+        self._beat_task = self.loop.create_task(self._beat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="LoopMonitor", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Must be called from the loop's thread. Waits for the watchdog to
+        exit."""
+        self._stopped.set()
+
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+            self._beat_task = None
+
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+        self.loop.set_task_factory(None)
+
+    async def _beat(self) -> None:
+        logger = get_logger("LoopMonitor")
+
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - self._last_beat - self.interval, 0)
+            metrics.loop_lag.observe(lag)
+
+            if lag >= self.threshold:
+                stall, self._stall = self._stall, None
+
+                # Reported here, as the loop's thread owns the log handlers
+                if stall is None:
+                    logger.warning(f"Event loop was blocked for {lag:.3f}s")
+                else:
+                    metrics.observe_stall(stall.scope)
+                    logger.warning(
+                        f"Event loop was blocked for {lag:.3f}s by {stall.scope}"
+                        f" (task {stall.task_name})\n{stall.stack}"
+                    )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+
+            if blocked_for < self.threshold or self._stall is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+
+            if frame is None:
+                continue
+
+            task: Optional[asyncio.Task[Any]] = asyncio.current_task(self.loop)
+            self._stall = Stall(
+                scope=metrics.get_task_scope(task) if task else DEFAULT_SCOPE,
+                task_name=task.get_name() if task else None,
+                stack="".join(traceback.format_stack(frame)),
+            )
@@ -0,0 +1,333 @@
+"""Counters, latency histograms and payload sizes of database operations, and
+of what the bot does with them.
+
+Every database operation is also attributed to the scope it ran in, which is the bot
+command or background job that caused it, so the round trips a command costs
+can be compared between versions. Tasks inherit the scope they were created
+in."""
+
+import math
+import time
+import asyncio
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Iterator, Sequence, Coroutine, Generator
+from watdo.cache import TTLCache
+from watdo.logging import get_logger
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    math.inf,
+)
+
+# Upper bounds of the reminder lag buckets, in seconds
+REMINDER_LAG_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, math.inf)
+
+# Operations outside of any command or job
+DEFAULT_SCOPE = "other"
+
+_scope: ContextVar[str] = ContextVar("metrics_scope", default=DEFAULT_SCOPE)
+
+# The scope of each task, readable from other threads unlike context variables
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task[Any], str]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _set_task_scope(name: str) -> None:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return
+
+    if task is not None:
+        _task_scopes[task] = name
+
+
+def scoped_task_factory(
+    loop: asyncio.AbstractEventLoop,
+    coro: Coroutine[Any, Any, Any] | Generator[Any, None, Any],
+    **kwargs: Any,
+) -> "asyncio.Task[Any]":
+    """Create tasks like the default factory, keeping track of the scope each
+    was created in."""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    _task_scopes[task] = _scope.get()
+    return task
+
+
+def payload_size(value: Any) -> int:
+    """Estimate how many bytes `value` takes on the wire."""
+    if value is None:
+        return 0
+
+    if isinstance(value, (bytes, str)):
+        return len(value)
+
+    if isinstance(value, (int, float)):
+        return len(str(value))
+
+    if isinstance(value, dict):
+        return sum(payload_size(k) + payload_size(v) for k, v in value.items())
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(payload_size(v) for v in value)
+
+    return len(str(value))
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket the `q` quantile falls in."""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+        }
+
+
+class Stats:
+    """What a group of database operations cost."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.commands = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = Histogram()
+
+    def record(
+        self,
+        *,
+        commands: int,
+        latency: float,
+        bytes_out: int,
+        bytes_in: int,
+        is_error: bool,
+    ) -> None:
+        self.calls += 1
+        self.commands += commands
+        self.errors += is_error
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        self.latency.observe(latency)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "round_trips": self.calls,
+            "commands": self.commands,
+            "errors": self.errors,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class ScopeStats(Stats):
+    def __init__(self) -> None:
+        super().__init__()
+        self.invocations = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"invocations": self.invocations, **super().as_dict()}
+
+
+class Measurement:
+    def __init__(self, operation: str, *, commands: int, bytes_out: int) -> None:
+        self.operation = operation
+        self.commands = commands
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+
+    def set_result(self, result: Any) -> None:
+        self.bytes_in = payload_size(result)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.operations: Dict[str, Stats] = {}
+        self.scopes: Dict[str, ScopeStats] = {}
+        self.commands: Dict[str, Histogram] = {}
+        self.reminder_lag = Histogram(REMINDER_LAG_BUCKETS)
+        self.loop_lag = Histogram()
+        self.stalls: Dict[str, int] = {}
+        self.caches: Dict[str, TTLCache[Any, Any]] = {}
+        self.started_at = time.time()
+
+    def register_cache(self, name: str, cache: TTLCache[Any, Any]) -> None:
+        self.caches[name] = cache
+
+    def observe_command(self, name: str, latency: float) -> None:
+        histogram = self.commands.get(name)
+
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+
+        histogram.observe(latency)
+
+    def observe_stall(self, scope: str) -> None:
+        self.stalls[scope] = self.stalls.get(scope, 0) + 1
+
+    def get_task_scope(self, task: "asyncio.Task[Any]") -> str:
+        return _task_scopes.get(task, DEFAULT_SCOPE)
+
+    def _get_scope(self, name: str) -> ScopeStats:
+        stats = self.scopes.get(name)
+
+        if stats is None:
+            stats = self.scopes[name] = ScopeStats()
+
+        return stats
+
+    def enter_scope(self, name: str) -> None:
+        """Attribute the operations of the current task, and of tasks it
+        creates from now on, to `name`."""
+        _scope.set(name)
+        _set_task_scope(name)
+        self._get_scope(name).invocations += 1
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Like `enter_scope`, but only for the duration of the block."""
+        token = _scope.set(name)
+        _set_task_scope(name)
+        self._get_scope(name).invocations += 1
+
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+            _set_task_scope(_scope.get())
+
+    @contextmanager
+    def measure(
+        self, operation: str, request: Any, *, commands: int = 1
+    ) -> Iterator[Measurement]:
+        """Record one round trip to the database, sending `request`.
+
+        Call `Measurement.set_result` with the reply to count the bytes in."""
+        measurement = Measurement(
+            operation, commands=commands, bytes_out=payload_size(request)
+        )
+        start_time = time.perf_counter()
+        is_error = False
+
+        try:
+            yield measurement
+        except BaseException:
+            is_error = True
+            raise
+        finally:
+            latency = time.perf_counter() - start_time
+            operation_stats = self.operations.get(operation)
+
+            if operation_stats is None:
+                operation_stats = self.operations[operation] = Stats()
+
+            for stats in (operation_stats, self._get_scope(_scope.get())):
+                stats.record(
+                    commands=measurement.commands,
+                    latency=latency,
+                    bytes_out=measurement.bytes_out,
+                    bytes_in=measurement.bytes_in,
+                    is_error=is_error,
+                )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "operations": {k: v.as_dict() for k, v in self.operations.items()},
+            "scopes": {k: v.as_dict() for k, v in self.scopes.items()},
+            "commands": {k: v.as_dict() for k, v in self.commands.items()},
+            "reminder_lag": self.reminder_lag.as_dict(),
+            "loop_lag": self.loop_lag.as_dict(),
+            "stalls": dict(self.stalls),
+            "caches": {
+                k: {"size": len(v), "hits": v.hits, "misses": v.misses}
+                for k, v in self.caches.items()
+            },
+        }
+
+    def summary(self) -> str:
+        lines: List[str] = [
+            "scope: invocations, round trips/invocation, p50/p99 latency, bytes out/in"
+        ]
+
+        for name, stats in sorted(self.scopes.items()):
+            round_trips = stats.calls / max(stats.invocations, 1)
+            lines.append(
+                f"{name}: {stats.invocations}, {round_trips:.1f},"
+                f" {stats.latency.quantile(0.5) * 1000:.1f}ms"
+                f"/{stats.latency.quantile(0.99) * 1000:.1f}ms,"
+                f" {stats.bytes_out}/{stats.bytes_in}"
+            )
+
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        self.operations.clear()
+        self.scopes.clear()
+        self.commands.clear()
+        self.reminder_lag = Histogram(REMINDER_LAG_BUCKETS)
+        self.loop_lag = Histogram()
+        self.stalls.clear()
+        self.started_at = time.time()
+
+
+metrics = Metrics()
+
+
+async def log_summary_periodically(interval: float) -> None:
+    logger = get_logger("metrics")
+
+    while True:
+        await asyncio.sleep(interval)
+
+        if metrics.scopes:
+            logger.info(f"Database usage\n{metrics.summary()}")
@@ -0,0 +1,238 @@
+"""Serves `metrics` over HTTP in the Prometheus text exposition format, on the
+event loop of the bot."""
+
+import math
+import asyncio
+from typing import Any, Dict, List, Tuple, Callable, Optional
+from watdo.cache import TTLCache
+from watdo.logging import get_logger
+from watdo.database import Database
+from watdo.metrics import metrics, Histogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# How long a scraper gets to send its request
+REQUEST_TIMEOUT = 5
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    def __init__(self) -> None:
+        self._lines: List[str] = []
+
+    def __str__(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+    def declare(self, name: str, kind: str, help_text: str) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(
+        self, name: str, value: float, labels: Optional[Dict[str, str]] = None
+    ) -> None:
+        self._lines.append(
+            f"{name}{_format_labels(labels or {})} {_format_value(value)}"
+        )
+
+    def histogram(
+        self,
+        name: str,
+        histogram: Histogram,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        labels = labels or {}
+        cumulative_count = 0
+
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative_count += count
+            bucket_labels = {**labels, "le": _format_value(bound)}
+            self.sample(f"{name}_bucket", cumulative_count, bucket_labels)
+
+        self.sample(f"{name}_sum", histogram.sum, labels)
+        self.sample(f"{name}_count", histogram.count, labels)
+
+
+def _hits(cache: TTLCache[Any, Any]) -> float:
+    return cache.hits
+
+
+def _misses(cache: TTLCache[Any, Any]) -> float:
+    return cache.misses
+
+
+def _hit_ratio(cache: TTLCache[Any, Any]) -> float:
+    return cache.hits / max(cache.hits + cache.misses, 1)
+
+
+def render(db: Database) -> str:
+    exposition = Exposition()
+
+    exposition.declare(
+        "watdo_command_latency_seconds", "histogram", "Latency of bot commands."
+    )
+    for name, histogram in sorted(metrics.commands.items()):
+        exposition.histogram(
+            "watdo_command_latency_seconds", histogram, {"command": name}
+        )
+
+    exposition.declare(
+        "watdo_db_operation_latency_seconds",
+        "histogram",
+        "Latency of database round trips, including waiting for a connection.",
+    )
+    for name, stats in sorted(metrics.operations.items()):
+        exposition.histogram(
+            "watdo_db_operation_latency_seconds", stats.latency, {"operation": name}
+        )
+
+    for metric, attribute, help_text in (
+        ("watdo_db_round_trips_total", "calls", "Database round trips."),
+        ("watdo_db_commands_total", "commands", "Database commands sent."),
+        ("watdo_db_errors_total", "errors", "Failed database round trips."),
+        ("watdo_db_sent_bytes_total", "bytes_out", "Estimated bytes sent."),
+        ("watdo_db_received_bytes_total", "bytes_in", "Estimated bytes received."),
+    ):
+        exposition.declare(metric, "counter", f"{help_text} By originating scope.")
+
+        for name, scope_stats in sorted(metrics.scopes.items()):
+            exposition.sample(metric, getattr(scope_stats, attribute), {"scope": name})
+
+    exposition.declare(
+        "watdo_scope_invocations_total",
+        "counter",
+        "Invocations of commands and background jobs.",
+    )
+    for name, scope_stats in sorted(metrics.scopes.items()):
+        exposition.sample(
+            "watdo_scope_invocations_total", scope_stats.invocations, {"scope": name}
+        )
+
+    exposition.declare(
+        "watdo_reminder_lag_seconds",
+        "histogram",
+        "How long after their scheduled time reminders fire.",
+    )
+    exposition.histogram("watdo_reminder_lag_seconds", metrics.reminder_lag)
+
+    exposition.declare(
+        "watdo_event_loop_lag_seconds",
+        "histogram",
+        "How late the event loop wakes up from sleeping.",
+    )
+    exposition.histogram("watdo_event_loop_lag_seconds", metrics.loop_lag)
+
+    exposition.declare(
+        "watdo_event_loop_stalls_total",
+        "counter",
+        "Callbacks that blocked the event loop for longer than the threshold.",
+    )
+    for name, count in sorted(metrics.stalls.items()):
+        exposition.sample("watdo_event_loop_stalls_total", count, {"scope": name})
+
+    exposition.declare(
+        "watdo_background_tasks", "gauge", "Tasks scheduled on the event loop."
+    )
+    exposition.sample("watdo_background_tasks", len(asyncio.all_tasks()))
+
+    pool_stats = db.pool_stats
+    exposition.declare(
+        "watdo_db_pool_connections", "gauge", "Database connections by state."
+    )
+    exposition.sample(
+        "watdo_db_pool_connections", pool_stats.in_use, {"state": "in_use"}
+    )
+    exposition.sample(
+        "watdo_db_pool_connections", pool_stats.waiting, {"state": "waiting"}
+    )
+    exposition.sample(
+        "watdo_db_pool_connections", pool_stats.max_size, {"state": "max"}
+    )
+
+    cache_metrics: List[Tuple[str, str, str, Callable[[TTLCache[Any, Any]], float]]]
+    cache_metrics = [
+        ("watdo_cache_hits_total", "counter", "Cache lookups that hit.", _hits),
+        ("watdo_cache_misses_total", "counter", "Cache lookups that missed.", _misses),
+        (
+            "watdo_cache_hit_ratio",
+            "gauge",
+            "Share of cache lookups that hit.",
+            _hit_ratio,
+        ),
+        ("watdo_cache_entries", "gauge", "Entries in the cache.", len),
+    ]
+
+    for metric, kind, help_text, get_value in cache_metrics:
+        exposition.declare(metric, kind, help_text)
+
+        for name, cache in sorted(metrics.caches.items()):
+            exposition.sample(metric, get_value(cache), {"cache": name})
+
+    return str(exposition)
+
+
+def _response(status: str, body: str, content_type: str) -> bytes:
+    data = body.encode()
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode() + data
+
+
+async def _handle(
+    db: Database, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+
+        # Headers are irrelevant here, but must be read before answering
+        while await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT) not in (
+            b"\r\n",
+            b"\n",
+            b"",
+        ):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+
+        if len(parts) < 2 or parts[0] != "GET":
+            response = _response("405 Method Not Allowed", "", "text/plain")
+        elif parts[1].split("?")[0] != "/metrics":
+            response = _response("404 Not Found", "", "text/plain")
+        else:
+            response = _response("200 OK", render(db), CONTENT_TYPE)
+
+        writer.write(response)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(db: Database, host: str, port: int) -> asyncio.Server:
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle(db, reader, writer), host, port
+    )
+    get_logger("metrics_server").info(f"Serving metrics on {host}:{port}/metrics")
+    return server
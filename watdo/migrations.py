@@ -0,0 +1,38 @@
+import sys
+import asyncio
+from watdo.models import Task
+from watdo.database import Database
+from watdo.logging import get_logger
+from watdo.metrics import metrics
+from watdo._main_runner import async_main_runner
+
+
+async def migrate_tasks(db: Database) -> int:
+    """Bring the tasks of every profile up to the current task schema."""
+    logger = get_logger("migrations.migrate_tasks")
+    metrics.enter_scope("migration")
+    profile_ids = set()
+    migrated_count = 0
+
+    for pattern in ("tasks:profile.*", "task_records:profile.*"):
+        async for key in db.iter_keys(pattern):
+            profile_ids.add(key.split(".")[1])
+
+    for profile_id in profile_ids:
+        count = await Task.migrate_profile(db, profile_id)
+        migrated_count += count
+
+        if count > 0:
+            logger.info(f"Migrated {count} task(s) of profile {profile_id}")
+
+    logger.info(f"Migrated {migrated_count} task(s) in total")
+    return migrated_count
+
+
+async def async_main(loop: asyncio.AbstractEventLoop) -> int:
+    await migrate_tasks(Database())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(async_main_runner(async_main))
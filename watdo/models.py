@@ -1,15 +1,38 @@
 import json
+import math
 import time
+import functools
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, cast, Optional, Dict, Any, TypeVar, Generic
+from typing import (
+    TYPE_CHECKING,
+    cast,
+    Optional,
+    Dict,
+    List,
+    Set,
+    Any,
+    TypeVar,
+    Generic,
+    Callable,
+    Sequence,
+    Awaitable,
+    Tuple,
+    Type,
+)
 from dateutil import rrule
 import recurrent
-from watdo import dt
+from watdo import dt, codecs, scripts
+from watdo.errors import VersionConflict
+from watdo.cache import TTLCache
+from watdo.metrics import metrics
 from watdo.database import Database
+from watdo.environ import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL, PROFILE_CACHE_PUBSUB
 from watdo.safe_data import (
-    SafeData,
+    Field,
+    OptionalField,
     Boolean,
     UUID,
+    Version,
     Timestamp,
     UTCOffset,
     UnitRange,
@@ -23,11 +46,65 @@ from watdo.safe_data import (
 if TYPE_CHECKING:
     from watdo.collections import TasksCollection
 
+T = TypeVar("T")
 DueT = TypeVar("DueT", str, float)
 
+# Bump this whenever a new index is added, so that `Task.migrate_profile`
+# rebuilds the indexes of profiles stored with an older schema.
+TASK_SCHEMA_VERSION = 7
+
+PROFILE_INVALIDATIONS_CHANNEL = "profile_invalidations"
+
+# How many times a write is attempted when other writes keep getting in first
+MAX_WRITE_ATTEMPTS = 3
+
+# Recurring tasks are loaded again on every listing and reminder sweep
+RRULE_CACHE_SIZE = 4096
+
+# Values from 0 to this, like timestamps until the year 2286, sort as text
+MAX_SORTABLE = 1e10
+_SORTABLE_WIDTH = 18
+
+
+def _sortable(value: float) -> str:
+    """Format `value` as fixed width text that sorts like the value does.
+    Infinity sorts last."""
+    if value == math.inf:
+        return "~" * _SORTABLE_WIDTH
+
+    return f"{min(max(value, 0), MAX_SORTABLE):0{_SORTABLE_WIDTH}.6f}"
+
+
+@functools.lru_cache(maxsize=RRULE_CACHE_SIZE)
+def _compile_rrule(due: str, utc_offset: float) -> rrule.rrule:
+    """Parse a `DTSTART` and `RRULE` string once, in the timezone of
+    `utc_offset`. The rule is shared, so it must not be mutated."""
+    tz = dt.utc_offset_to_tz(utc_offset)
+    rule = cast(rrule.rrule, rrule.rrulestr(due))
+    return rule.replace(dtstart=rule._dtstart.replace(tzinfo=tz))
+
 
 class Model(ABC):
-    """A unique data entity of a given database."""
+    """A unique data entity of a given database.
+
+    Fields keep bare values in slots and are validated when set, so a loaded
+    model is a single object rather than one per field."""
+
+    __slots__ = ("_database", "_uuid", "_created_at", "_created_by", "_channel_id")
+    _fields: Tuple[Field[Any], ...] = ()
+
+    uuid = Field(UUID)
+    created_at = Field(Timestamp)
+    created_by = Field(SnowflakeID)
+    channel_id = Field(SnowflakeID)
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        # Subclass fields first, the order `as_json` always had
+        cls._fields = tuple(
+            v for c in cls.__mro__ for v in vars(c).values() if isinstance(v, Field)
+        )
 
     def __init__(
         self,
@@ -39,54 +116,57 @@ class Model(ABC):
         channel_id: int,
     ) -> None:
         self._database = database
-        self.uuid = UUID(uuid)
-        self.created_at = Timestamp(created_at)
-        self.created_by = SnowflakeID(created_by)
-        self.channel_id = SnowflakeID(channel_id)
-
-        for key, value in self.__dict__.items():
-            if key.startswith("_"):
-                continue
-
-            if value is None:
-                continue
-
-            if not isinstance(value, SafeData):
-                t = type(value).__name__
-                raise TypeError(f"\"{key}\": '{t}' should be 'SafeData'")
+        self.uuid = uuid
+        self.created_at = created_at
+        self.created_by = created_by
+        self.channel_id = channel_id
 
     @property
     def db(self) -> Database:
         return self._database
 
     def as_json(self) -> Dict[str, Any]:
-        res: Dict[str, Any] = {}
-
-        for key, value in self.__dict__.items():
-            if key.startswith("_"):
-                continue
-
-            if value is None:
-                res[key] = value
-            else:
-                res[key] = value.value
-
-        return res
+        return {f.name: f.get_value(self) for f in self._fields}
 
     def as_json_str(self, *, indent: Optional[int] = None) -> str:
         return json.dumps(self.as_json(), indent=indent)
 
+    def as_record(self) -> bytes:
+        """Encode this model with the configured record codec."""
+        return codecs.encode_record(self.as_json())
+
     @abstractmethod
     async def save(self) -> None:
         raise NotImplementedError
 
 
 class Profile(Model):
+    __slots__ = ("_utc_offset",)
+
+    utc_offset = Field(UTCOffset)
+
+    _cache: TTLCache[str, Optional["Profile"]] = TTLCache(
+        max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL
+    )
+    _channel_cache: TTLCache[int, Optional[str]] = TTLCache(
+        max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL
+    )
+
+    @staticmethod
+    def _key(uuid: str) -> str:
+        return f"profile.{uuid}"
+
+    @staticmethod
+    def _channel_key(channel_id: int) -> str:
+        return f"profile:channel.{channel_id}"
+
     @classmethod
     async def from_channel_id(
         cls, db: Database, channel_id: int
     ) -> Optional["Profile"]:
-        profile_id = await db.get(f"profile:channel.{channel_id}")
+        profile_id = await cls._channel_cache.get_or_load(
+            channel_id, lambda: db.get(cls._channel_key(channel_id))
+        )
 
         if profile_id is None:
             return None
@@ -94,13 +174,64 @@ class Profile(Model):
         return await cls.from_id(db, profile_id)
 
     @classmethod
-    async def from_id(cls, db: Database, uuid: str) -> Optional["Profile"]:
-        raw_data = await db.get(f"profile.{uuid}")
+    async def _load(cls, db: Database, uuid: str) -> Optional["Profile"]:
+        raw_data = await db.get_bytes(cls._key(uuid))
 
         if raw_data is None:
             return None
 
-        return cls(db, **json.loads(raw_data))
+        return cls(db, **codecs.decode_record(raw_data))
+
+    @classmethod
+    async def from_id(cls, db: Database, uuid: str) -> Optional["Profile"]:
+        return await cls._cache.get_or_load(uuid, lambda: cls._load(db, uuid))
+
+    @classmethod
+    async def from_ids(
+        cls, db: Database, uuids: Sequence[str]
+    ) -> Dict[str, Optional["Profile"]]:
+        profiles: Dict[str, Optional[Profile]] = {}
+
+        for uuid in uuids:
+            try:
+                profiles[uuid] = cls._cache.get(uuid)
+            except KeyError:
+                pass
+
+        missing_uuids = [uuid for uuid in uuids if uuid not in profiles]
+        generation = cls._cache.generation
+        raw_data = await db.mget_bytes(*(cls._key(uuid) for uuid in missing_uuids))
+
+        for uuid, d in zip(missing_uuids, raw_data):
+            profile = None if d is None else cls(db, **codecs.decode_record(d))
+            profiles[uuid] = profile
+            cls._cache.set(uuid, profile, generation=generation)
+
+        return profiles
+
+    @classmethod
+    def invalidate(cls, key: str) -> None:
+        """Drop the cached data stored under the database `key`."""
+        if key.startswith("profile:channel."):
+            cls._channel_cache.invalidate(int(key.removeprefix("profile:channel.")))
+        elif key.startswith("profile."):
+            cls._cache.invalidate(key.removeprefix("profile."))
+
+    @classmethod
+    async def listen_for_invalidations(cls, db: Database) -> None:
+        """Keep the caches of this process in sync with writes of other ones."""
+        async for key in db.subscribe(PROFILE_INVALIDATIONS_CHANNEL):
+            if key is None:
+                # Anything could have changed while not subscribed
+                cls._cache.clear()
+                cls._channel_cache.clear()
+            else:
+                cls.invalidate(key)
+
+    @staticmethod
+    async def _publish_invalidation(db: Database, key: str) -> None:
+        if PROFILE_CACHE_PUBSUB:
+            await db.publish(PROFILE_INVALIDATIONS_CHANNEL, key)
 
     def __init__(
         self,
@@ -112,7 +243,7 @@ class Profile(Model):
         created_by: int,
         channel_id: int,
     ) -> None:
-        self.utc_offset = UTCOffset(utc_offset)
+        self.utc_offset = utc_offset
 
         super().__init__(
             database,
@@ -123,22 +254,297 @@ class Profile(Model):
         )
 
     async def save(self) -> None:
-        await self.db.set(f"profile.{self.uuid.value}", self.as_json_str())
+        key = self._key(self.uuid.value)
+        await self.db.set(key, self.as_record())
+
+        # Loads that started before the write would cache the old record
+        self._cache.invalidate(self.uuid.value)
+        self._cache.set(self.uuid.value, self)
+        await self._publish_invalidation(self.db, key)
 
     async def add_channel(self, channel_id: int) -> None:
-        await self.db.set(f"profile:channel.{channel_id}", self.uuid.value)
+        key = self._channel_key(channel_id)
+        await self.db.set(key, self.uuid.value)
+        self._channel_cache.invalidate(channel_id)
+        self._channel_cache.set(channel_id, self.uuid.value)
+        await self._publish_invalidation(self.db, key)
+
+
+metrics.register_cache("profiles", Profile._cache)
+metrics.register_cache("profile_channels", Profile._channel_cache)
 
 
 class Task(Model):
+    __slots__ = (
+        "_profile",
+        "_title",
+        "_category",
+        "_importance",
+        "_energy",
+        "_description",
+        "_last_done",
+        "_profile_id",
+        "_version",
+    )
+
+    title = Field(TaskTitle)
+    category = Field(TaskCategory)
+    importance = Field(UnitRange)
+    energy = Field(UnitRange)
+    description = OptionalField(TaskDescription)
+    last_done = OptionalField(Timestamp)
+    profile_id = Field(UUID)
+    version = Field(Version)
+
+    _migrated_profiles: Set[str] = set()
+
+    @staticmethod
+    def _records_key(profile_id: str) -> str:
+        return f"task_records:profile.{profile_id}"
+
+    @staticmethod
+    def _legacy_key(profile_id: str) -> str:
+        return f"tasks:profile.{profile_id}"
+
+    @staticmethod
+    def _schema_key(profile_id: str) -> str:
+        return f"task_schema:profile.{profile_id}"
+
+    @staticmethod
+    def _titles_key(profile_id: str) -> str:
+        return f"task_titles:profile.{profile_id}"
+
+    @staticmethod
+    def _category_key(profile_id: str, category: str) -> str:
+        return f"task_category:profile.{profile_id}:{category}"
+
+    @staticmethod
+    def _categories_key(profile_id: str) -> str:
+        return f"task_categories:profile.{profile_id}"
+
+    @staticmethod
+    def _meta_key(profile_id: str) -> str:
+        return f"task_meta:profile.{profile_id}"
+
+    @staticmethod
+    def _priorities_key(profile_id: str) -> str:
+        return f"task_priorities:profile.{profile_id}"
+
+    @staticmethod
+    def _reminders_key() -> str:
+        return "task_reminders"
+
+    @property
+    def _reminder_member(self) -> str:
+        return f"{self.profile_id.value}:{self.uuid.value}"
+
+    @property
+    def _reminder_time(self) -> Optional[float]:
+        return None
+
+    @property
+    def _due_time(self) -> float:
+        return math.inf
+
+    @property
+    def _priority_member(self) -> str:
+        """Ranks this task in the priorities set, by the key
+        `TasksCollection.sort_by_priority` sorts by and then by newest first,
+        the order tasks are loaded in. Empty if it's done, as those aren't
+        ranked."""
+        if self.is_done:
+            return ""
+
+        return ":".join(
+            (
+                _sortable(self.last_done.value if self.last_done else math.inf),
+                _sortable(self._due_time),
+                _sortable(1 - self.importance.value),
+                _sortable(MAX_SORTABLE - self.created_at.value),
+                self.uuid.value,
+            )
+        )
+
+    def _script_keys(self) -> List[str]:
+        profile_id = self._profile.uuid.value
+        return [
+            self._records_key(profile_id),
+            self._meta_key(profile_id),
+            self._titles_key(profile_id),
+            self._categories_key(profile_id),
+            self._reminders_key(),
+            self._priorities_key(profile_id),
+        ]
+
+    def _script_args(self, *args: str | bytes) -> List[str | bytes]:
+        return [
+            self._category_key(self._profile.uuid.value, ""),
+            self.uuid.value,
+            self._reminder_member,
+            *args,
+        ]
+
+    def _write_args(self, flag: bool, *, is_checked: bool = True) -> List[str | bytes]:
+        reminder_time = self._reminder_time
+        version = self.version.value
+        data = self.as_json()
+
+        if is_checked:
+            data["version"] = version + 1
+
+        return self._script_args(
+            codecs.encode_record(data),
+            self.title.value,
+            self.category.value,
+            "" if reminder_time is None else str(reminder_time),
+            "1" if flag else "0",
+            str(version) if is_checked else "",
+            str(data["version"]),
+            self._priority_member,
+        )
+
+    def _index_args(self, raw_data: bytes) -> List[str | bytes]:
+        reminder_time = self._reminder_time
+        return self._script_args(
+            raw_data,
+            self.title.value,
+            self.category.value,
+            "" if reminder_time is None else str(reminder_time),
+            "",
+            "",
+            str(self.version.value),
+            self._priority_member,
+        )
+
+    @staticmethod
+    async def migrate_profile(db: Database, profile_id: str) -> int:
+        """Bring the stored tasks of a profile up to `TASK_SCHEMA_VERSION`.
+
+        Moves the legacy task list to the per-task hash, then rebuilds every
+        index of the profile from the records. Records that already exist in
+        the hash are newer than the legacy list and are never overwritten, and
+        the rebuild never writes records, so this is safe to run while the bot
+        is online and more than once."""
+        schema_version = await db.get(Task._schema_key(profile_id))
+
+        if schema_version is not None and int(schema_version) >= TASK_SCHEMA_VERSION:
+            Task._migrated_profiles.add(profile_id)
+            return 0
+
+        migrated_count = await db.run_script(
+            scripts.MOVE_LEGACY_TASKS,
+            [Task._legacy_key(profile_id), Task._records_key(profile_id)],
+            [],
+        )
+
+        profile = await Profile.from_id(db, profile_id)
+
+        if profile is not None:
+            await Task._rebuild_indexes(db, profile)
+
+        await db.set(Task._schema_key(profile_id), str(TASK_SCHEMA_VERSION))
+        Task._migrated_profiles.add(profile_id)
+        return migrated_count
+
+    @staticmethod
+    async def _rebuild_indexes(db: Database, profile: Profile) -> None:
+        """Clear the indexes of `profile` and index its tasks again.
+
+        Tasks written after their record was read are read and indexed again,
+        unless the write indexed them itself."""
+        profile_id = profile.uuid.value
+        records_key = Task._records_key(profile_id)
+        raw_records = await db.hvals_bytes(records_key)
+        is_cleared = False
+
+        while not is_cleared or raw_records:
+            tasks = [await Task._from_raw_data(db, profile, r) for r in raw_records]
+
+            # Oldest first so the newest of duplicate titles ends up indexed
+            order = sorted(range(len(tasks)), key=lambda i: tasks[i].created_at.value)
+
+            if not is_cleared:
+                categories = set(await db.hgetall(Task._categories_key(profile_id)))
+                categories.update(t.category.value for t in tasks)
+
+            async with db.transaction() as pipe:
+                if not is_cleared:
+                    pipe.delete(
+                        Task._meta_key(profile_id),
+                        Task._titles_key(profile_id),
+                        Task._categories_key(profile_id),
+                        Task._priorities_key(profile_id),
+                        *(Task._category_key(profile_id, c) for c in categories),
+                    )
+                    is_cleared = True
+
+                for i in order:
+                    pipe.run_script(
+                        scripts.INDEX_TASK,
+                        tasks[i]._script_keys(),
+                        tasks[i]._index_args(raw_records[i]),
+                    )
+
+                results = await pipe.execute()
+
+            results = results[len(results) - len(order) :]
+            changed_uuids = [
+                tasks[i].uuid.value
+                for i, result in zip(order, results)
+                if result == scripts.CONFLICT
+            ]
+            raw_records = []
+
+            if changed_uuids:
+                records = await db.hmget_bytes(records_key, *changed_uuids)
+                raw_records = [r for r in records if r is not None]
+
+    @staticmethod
+    async def _ensure_migrated(db: Database, profile_id: str) -> None:
+        if profile_id not in Task._migrated_profiles:
+            await Task.migrate_profile(db, profile_id)
+
+    @staticmethod
+    async def from_uuid(db: Database, profile: Profile, uuid: str) -> Optional["Task"]:
+        profile_id = profile.uuid.value
+        await Task._ensure_migrated(db, profile_id)
+        raw_data = await db.hget_bytes(Task._records_key(profile_id), uuid)
+
+        if raw_data is None:
+            return None
+
+        return await Task._from_raw_data(db, profile, raw_data)
+
     @staticmethod
     async def from_title(
         db: Database, profile: Profile, title: str
     ) -> Optional["Task"]:
-        for task in await Task.get_tasks_of_profile(db, profile):
-            if task.title.value == title:
-                return task
+        profile_id = profile.uuid.value
+        await Task._ensure_migrated(db, profile_id)
+        uuid = await db.hget(Task._titles_key(profile_id), title)
 
-        return None
+        if uuid is None:
+            return None
+
+        task = await Task.from_uuid(db, profile, uuid)
+
+        if task is None or task.title.value != title:
+            # Stale entry of a deleted or renamed task
+            await db.hdel(Task._titles_key(profile_id), title)
+            return None
+
+        return task
+
+    @staticmethod
+    async def get_category_counts(db: Database, profile: Profile) -> Dict[str, int]:
+        profile_id = profile.uuid.value
+        await Task._ensure_migrated(db, profile_id)
+        counts = await db.hgetall(Task._categories_key(profile_id))
+
+        # Emptied categories are only removed by the next rebuild
+        return {
+            category: int(count) for category, count in counts.items() if int(count) > 0
+        }
 
     @staticmethod
     def _fix_data(data: Dict[str, Any]) -> bool:
@@ -155,6 +561,51 @@ class Task(Model):
 
         return should_save
 
+    @staticmethod
+    async def _from_raw_data(db: Database, profile: Profile, raw_data: bytes) -> "Task":
+        data = codecs.decode_record(raw_data)
+
+        should_save = Task._fix_data(data)
+
+        if data.get("due") is None:
+            task = Task(db, profile=profile, **data)
+        else:
+            task = ScheduledTask(db, profile=profile, **data)
+
+        if should_save:
+            result = await db.run_script(
+                scripts.SAVE_TASK, task._script_keys(), task._write_args(False)
+            )
+
+            # Someone else saving it first fixes it too
+            if result != scripts.CONFLICT:
+                task._handle_write_result(result)
+
+        return task
+
+    @staticmethod
+    async def _load_tasks(
+        db: Database, profile: Profile, *, category: Optional[str] = None
+    ) -> List["Task"]:
+        profile_id = profile.uuid.value
+
+        if category is None:
+            tasks_data = await db.hvals_bytes(Task._records_key(profile_id))
+        else:
+            uuids = await db.smembers(Task._category_key(profile_id, category))
+            tasks_data = [
+                d
+                for d in await db.hmget_bytes(Task._records_key(profile_id), *uuids)
+                if d is not None
+            ]
+
+        tasks = [await Task._from_raw_data(db, profile, d) for d in tasks_data]
+
+        # Newest first, the same order the legacy list had. Ties go by uuid,
+        # as they do in the priorities set.
+        tasks.sort(key=lambda t: (-t.created_at.value, t.uuid.value))
+        return tasks
+
     @staticmethod
     async def get_tasks_of_profile(
         db: Database,
@@ -165,27 +616,15 @@ class Task(Model):
     ) -> "TasksCollection":
         from watdo.collections import TasksCollection
 
-        profile_id = profile.uuid.value
-        tasks_data = await db.lrange(f"tasks:profile.{profile_id}")
+        await Task._ensure_migrated(db, profile.uuid.value)
         tasks = []
 
-        for index, raw_data in enumerate(tasks_data):
-            data = json.loads(raw_data)
-
-            should_save = Task._fix_data(data)
-
-            if data.get("due") is None:
-                task = Task(db, profile=profile, **data)
-            else:
-                task = ScheduledTask(db, profile=profile, **data)
-
-            if should_save:
-                await db.lset(f"tasks:profile.{profile_id}", index, task.as_json_str())
-
+        for task in await Task._load_tasks(db, profile, category=category):
             if ignore_done and task.is_done:
                 continue
 
             if category is not None:
+                # Guard against an index entry left by an interrupted write
                 if task.category.value != category:
                     continue
 
@@ -193,6 +632,47 @@ class Task(Model):
 
         return TasksCollection(tasks)
 
+    @staticmethod
+    async def count_undone(db: Database, profile: Profile) -> int:
+        profile_id = profile.uuid.value
+        await Task._ensure_migrated(db, profile_id)
+        return await db.zcard(Task._priorities_key(profile_id))
+
+    @staticmethod
+    async def get_by_priority(
+        db: Database,
+        profile: Profile,
+        *,
+        start: int = 0,
+        num: Optional[int] = None,
+    ) -> List["Task"]:
+        """Get `num` undone tasks of `profile` from `start`, or all of them, in
+        the order `TasksCollection.sort_by_priority` gives. Other tasks aren't
+        loaded."""
+        profile_id = profile.uuid.value
+        await Task._ensure_migrated(db, profile_id)
+        members = await db.zrangebyscore(
+            Task._priorities_key(profile_id),
+            "-inf",
+            "+inf",
+            start=start if num is not None else None,
+            num=num,
+        )
+
+        if num is None:
+            members = members[start:]
+
+        if not members:
+            return []
+
+        uuids = [m.rsplit(":", 1)[1] for m in members]
+        records = await db.hmget_bytes(Task._records_key(profile_id), *uuids)
+
+        # Records missing are of tasks deleted since their members were read
+        return [
+            await Task._from_raw_data(db, profile, r) for r in records if r is not None
+        ]
+
     def __init__(
         self,
         database: Database,
@@ -205,19 +685,21 @@ class Task(Model):
         description: Optional[str],
         last_done: Optional[float],
         profile_id: str,
+        version: int = 0,
         uuid: str,
         created_at: float,
         created_by: int,
         channel_id: int,
     ) -> None:
         self._profile = profile
-        self.title = TaskTitle(title)
-        self.category = TaskCategory(category)
-        self.importance = UnitRange(importance)
-        self.energy = UnitRange(energy)
-        self.description = TaskDescription(description) if description else None
-        self.last_done = Timestamp(last_done) if last_done else None
-        self.profile_id = UUID(profile_id)
+        self.title = title
+        self.category = category
+        self.importance = importance
+        self.energy = energy
+        self.description = description or None
+        self.last_done = last_done or None
+        self.profile_id = profile_id
+        self.version = version
 
         super().__init__(
             database,
@@ -250,40 +732,264 @@ class Task(Model):
 
         return dt.fromtimestamp(self.last_done.value, self._profile.utc_offset.value)
 
-    async def save(self) -> None:
-        tasks = await self.get_tasks_of_profile(self.db, self._profile)
-        profile_id = self._profile.uuid.value
+    @staticmethod
+    async def save_many(db: Database, tasks: Sequence["Task"]) -> int:
+        """Save `tasks` atomically in a single round trip.
+
+        Returns the number of tasks saved. Tasks changed by someone else since
+        they were loaded are left untouched and raised in a `VersionConflict`
+        after the others are saved."""
+        for profile_id in {t.profile.uuid.value for t in tasks}:
+            await Task._ensure_migrated(db, profile_id)
+
+        async with db.transaction() as pipe:
+            for task in tasks:
+                pipe.run_script(
+                    scripts.SAVE_TASK, task._script_keys(), task._write_args(False)
+                )
+
+            results = await pipe.execute()
+
+        conflicts = [t for t, r in zip(tasks, results) if r == scripts.CONFLICT]
+        saved_count = 0
+
+        for task, result in zip(tasks, results):
+            if result != scripts.CONFLICT:
+                saved_count += task._handle_write_result(result)
+
+        if conflicts:
+            raise VersionConflict(conflicts)
 
-        for index, task in enumerate(tasks):
-            if task.uuid.value == self.uuid.value:
-                await self.db.lset(
-                    f"tasks:profile.{profile_id}", index, self.as_json_str()
+        return saved_count
+
+    @staticmethod
+    async def delete_many(db: Database, tasks: Sequence["Task"]) -> int:
+        """Delete `tasks` atomically in a single round trip.
+
+        Returns the number of tasks that were still stored."""
+        for profile_id in {t.profile.uuid.value for t in tasks}:
+            await Task._ensure_migrated(db, profile_id)
+
+        async with db.transaction() as pipe:
+            for task in tasks:
+                pipe.run_script(
+                    scripts.DELETE_TASK, task._script_keys(), task._script_args()
                 )
-                break
-        else:
-            await self.db.lpush(f"tasks:profile.{profile_id}", self.as_json_str())
+
+            return sum(await pipe.execute())
+
+    @staticmethod
+    async def update_where(
+        db: Database,
+        profile: Profile,
+        update: Callable[["Task"], None],
+        *,
+        category: Optional[str] = None,
+        where: Optional[Callable[["Task"], bool]] = None,
+    ) -> int:
+        """Apply `update` to every task of `profile` that matches `category` and
+        `where`, then save them all at once.
+
+        Returns the number of tasks changed."""
+        tasks = await Task.get_tasks_of_profile(db, profile, category=category)
+        return await tasks.update_where(update, where=where)
+
+    def _on_written(self) -> None:
+        pass
+
+    def _handle_write_result(self, result: int) -> bool:
+        if result == scripts.CONFLICT:
+            raise VersionConflict([self])
+
+        if result:
+            self.version = Version(self.version.value + 1)
+            self._on_written()
+
+        return bool(result)
+
+    async def retry_on_conflict(
+        self, write: Callable[["Task"], Awaitable[T]]
+    ) -> Optional[T]:
+        """Call `write` with this task, then with a freshly loaded copy each time
+        it raises `VersionConflict`, up to `MAX_WRITE_ATTEMPTS` times in total.
+
+        Returns `None` if the task got deleted in the meantime."""
+        task = self
+        attempts = 1
+
+        while True:
+            try:
+                return await write(task)
+            except VersionConflict:
+                if attempts >= MAX_WRITE_ATTEMPTS:
+                    raise
+
+            attempts += 1
+            reloaded_task = await Task.from_uuid(
+                self.db, self._profile, self.uuid.value
+            )
+
+            if reloaded_task is None:
+                return None
+
+            task = reloaded_task
+
+    async def save(self) -> None:
+        """Save this task.
+
+        Raises `VersionConflict` if it was changed since it was loaded."""
+        await self._ensure_migrated(self.db, self._profile.uuid.value)
+        result = await self.db.run_script(
+            scripts.SAVE_TASK, self._script_keys(), self._write_args(False)
+        )
+        self._handle_write_result(result)
+
+    async def update(self) -> bool:
+        """Save this task only if it's still stored.
+
+        Returns `False` if it has been deleted in the meantime. Raises
+        `VersionConflict` if it was changed since it was loaded."""
+        await self._ensure_migrated(self.db, self._profile.uuid.value)
+        result = await self.db.run_script(
+            scripts.SAVE_TASK, self._script_keys(), self._write_args(True)
+        )
+        return self._handle_write_result(result)
 
     async def delete(self) -> None:
-        profile_id = self._profile.uuid.value
-        data = self.as_json_str()
-        await self.db.lrem(f"tasks:profile.{profile_id}", data)
+        await self._ensure_migrated(self.db, self._profile.uuid.value)
+        await self.db.run_script(
+            scripts.DELETE_TASK, self._script_keys(), self._script_args()
+        )
+
+    async def complete(self) -> None:
+        """Mark this task as done in a single attempt.
 
-    async def done(self) -> None:
+        Raises `VersionConflict` if it was changed since it was loaded."""
         if self.is_done:
             raise ValueError(f'"{self.title.value}" is already done.')
 
         self.last_done = Timestamp(time.time())
+        is_kept = isinstance(self, ScheduledTask) and self.is_recurring
 
-        await self.save()
+        await self._ensure_migrated(self.db, self._profile.uuid.value)
+        result = await self.db.run_script(
+            scripts.COMPLETE_TASK, self._script_keys(), self._write_args(is_kept)
+        )
 
-        if isinstance(self, ScheduledTask):
-            if not self.is_recurring:
-                await self.delete()
-        else:
-            await self.delete()
+        if result == scripts.CONFLICT:
+            raise VersionConflict([self])
+
+        if not result:
+            raise ValueError(f'"{self.title.value}" no longer exists.')
+
+        if is_kept:
+            self._handle_write_result(result)
+
+    async def done(self) -> "Task":
+        """Mark this task as done, retrying on a fresh copy if it got changed
+        meanwhile. Returns the task that got done."""
+
+        async def complete(task: Task) -> Task:
+            await task.complete()
+            return task
+
+        task = await self.retry_on_conflict(complete)
+
+        if task is None:
+            raise ValueError(f'"{self.title.value}" no longer exists.')
+
+        return task
+
+
+class DueField(Field[RRuleString | Timestamp]):
+    """A recurrence rule if it's a string, otherwise a timestamp."""
+
+    def __init__(self) -> None:
+        super().__init__(Timestamp)
+
+    def _get_data_type(self, value: Any) -> Type[RRuleString | Timestamp]:
+        return RRuleString if isinstance(value, str) else Timestamp
 
 
 class ScheduledTask(Task, Generic[DueT]):
+    __slots__ = (
+        "_due",
+        "_has_reminder",
+        "_is_auto_done",
+        "_next_reminder",
+        "_memo",
+        "_rrule",
+    )
+
+    due = DueField()
+    has_reminder = Field(Boolean)
+    is_auto_done = Field(Boolean)
+    next_reminder = OptionalField(Timestamp)
+
+    _reminder_listeners: List[Callable[[float], None]] = []
+
+    @staticmethod
+    def add_reminder_listener(listener: Callable[[float], None]) -> None:
+        """Call `listener` with the timestamp of every reminder scheduled."""
+        ScheduledTask._reminder_listeners.append(listener)
+
+    @staticmethod
+    async def get_next_reminder_time(db: Database, timestamp: float) -> Optional[float]:
+        """Get the earliest reminder time strictly after `timestamp`."""
+        data = await db.zrangebyscore_withscores(
+            Task._reminders_key(), f"({timestamp}", "+inf", start=0, num=1
+        )
+
+        if not data:
+            return None
+
+        return data[0][1]
+
+    @staticmethod
+    async def get_due_reminders(
+        db: Database, timestamp: float
+    ) -> List["ScheduledTask[str] | ScheduledTask[float]"]:
+        """Get the tasks whose `next_reminder` is at or before `timestamp`."""
+        reminders_key = Task._reminders_key()
+        members: Dict[str, List[str]] = {}
+        tasks: List["ScheduledTask[str] | ScheduledTask[float]"] = []
+
+        for member in await db.zrangebyscore(reminders_key, "-inf", timestamp):
+            profile_id, uuid = member.split(":")
+            members.setdefault(profile_id, []).append(uuid)
+
+        if not members:
+            return tasks
+
+        profiles = await Profile.from_ids(db, list(members))
+
+        async with db.pipeline() as pipe:
+            for profile_id, uuids in members.items():
+                pipe.hmget_bytes(Task._records_key(profile_id), *uuids)
+
+            for (profile_id, uuids), records in zip(
+                members.items(), await pipe.execute()
+            ):
+                profile = profiles[profile_id]
+
+                for uuid, raw_data in zip(uuids, records):
+                    task = None
+
+                    if profile is not None and raw_data is not None:
+                        task = await Task._from_raw_data(db, profile, raw_data)
+
+                    if (
+                        not isinstance(task, ScheduledTask)
+                        or task.next_reminder is None
+                    ):
+                        # Stale entry of a deleted or unscheduled task
+                        pipe.zrem(reminders_key, f"{profile_id}:{uuid}")
+                        continue
+
+                    tasks.append(task)
+
+        return tasks
+
     def __init__(
         self,
         database: Database,
@@ -300,27 +1006,21 @@ class ScheduledTask(Task, Generic[DueT]):
         has_reminder: bool = True,
         is_auto_done: bool = False,
         next_reminder: Optional[float] = None,
+        version: int = 0,
         uuid: str,
         created_at: float,
         created_by: int,
         channel_id: int,
     ) -> None:
-        self.due: RRuleString | Timestamp
-        self.has_reminder = Boolean(has_reminder)
-        self.is_auto_done = Boolean(is_auto_done)
-        self.next_reminder = Timestamp(next_reminder) if next_reminder else None
+        # Created on first use
+        self._memo: Optional[Dict[str, Tuple[Tuple[Any, ...], Any]]] = None
+        self.has_reminder = has_reminder
+        self.is_auto_done = is_auto_done
+        self.next_reminder = next_reminder or None
+        self.due = due
 
-        if isinstance(due, float):
-            self.due = Timestamp(due)
-        elif isinstance(due, str):
-            self.due = RRuleString(due)
-
-            # Set timezone to rrule
-            tz = dt.utc_offset_to_tz(profile.utc_offset.value)
-            dtstart = rrule.rrulestr(due)._dtstart.replace(tzinfo=tz)  # type: ignore[union-attr]
-            self._rrule: rrule.rrule = cast(
-                rrule.rrule, rrule.rrulestr(due.split("\n")[1], dtstart=dtstart)
-            )
+        if isinstance(due, str):
+            self._rrule = _compile_rrule(self.due.value, profile.utc_offset.value)
 
         super().__init__(
             database,
@@ -332,33 +1032,84 @@ class ScheduledTask(Task, Generic[DueT]):
             description=description,
             last_done=last_done,
             profile_id=profile_id,
+            version=version,
             uuid=uuid,
             created_at=created_at,
             created_by=created_by,
             channel_id=channel_id,
         )
 
+    @property
+    def _reminder_time(self) -> Optional[float]:
+        if self.next_reminder is None:
+            return None
+
+        return self.next_reminder.value
+
+    @property
+    def _due_time(self) -> float:
+        due_date = self.due_date
+        return math.inf if due_date is None else due_date.timestamp()
+
+    def _on_written(self) -> None:
+        if self.next_reminder is not None:
+            for listener in self._reminder_listeners:
+                listener(self.next_reminder.value)
+
+    @property
+    def _schedule_key(self) -> Tuple[Any, ...]:
+        # Bare values, as wrapping each of them isn't needed here
+        return (
+            ScheduledTask.due.get_value(self),
+            ScheduledTask.last_done.get_value(self),
+            ScheduledTask.next_reminder.get_value(self),
+            Profile.utc_offset.get_value(self._profile),
+        )
+
+    def _memoize(self, name: str, key: Tuple[Any, ...], compute: Callable[[], T]) -> T:
+        """Return what `compute` returns, computing it again only once `key`
+        changes."""
+        if self._memo is None:
+            self._memo = {}
+
+        memo = self._memo.get(name)
+
+        if memo is None or memo[0] != key:
+            memo = self._memo[name] = (key, compute())
+
+        return cast(T, memo[1])
+
     @property
     def is_recurring(self) -> bool:
         return isinstance(self.due.value, str)
 
     @property
     def is_done(self) -> bool:
+        return self._memoize("is_done", self._schedule_key, self._compute_is_done)
+
+    def _compute_is_done(self) -> bool:
         if not self.is_recurring:
             return self.last_done is not None
 
+        due_date = self.due_date
+
+        # A rule without occurrences left has nothing more to do
+        if due_date is None:
+            return True
+
         if self.last_done is None:
             return False
 
         if self.next_reminder is None:
             return self.last_done is not None
 
-        return self.due_date.timestamp() == self.next_reminder.value
+        return due_date.timestamp() == self.next_reminder.value
 
     @property
     def rrule(self) -> rrule.rrule:
+        """A copy of the compiled rule, as the rule itself is shared."""
         if isinstance(self._rrule, rrule.rrule):
-            return self._rrule
+            return self._rrule.replace()
 
         raise TypeError(self._rrule)
 
@@ -370,7 +1121,11 @@ class ScheduledTask(Task, Generic[DueT]):
         )
 
     @property
-    def due_date(self) -> dt.datetime:
+    def due_date(self) -> Optional[dt.datetime]:
+        """`None` once a recurrence rule has no occurrences left."""
+        return self._memoize("due_date", self._schedule_key, self._compute_due_date)
+
+    def _compute_due_date(self) -> Optional[dt.datetime]:
         due = self.due.value
 
         if isinstance(due, float):
@@ -380,7 +1135,18 @@ class ScheduledTask(Task, Generic[DueT]):
 
     @property
     def is_overdue(self) -> bool:
-        if self.due_date < dt.date_now(self._profile.utc_offset.value):
+        # Only reused while the time is frozen, otherwise "now" keeps changing
+        return self._memoize(
+            "is_overdue", (*self._schedule_key, dt.now()), self._compute_is_overdue
+        )
+
+    def _compute_is_overdue(self) -> bool:
+        due_date = self.due_date
+
+        if due_date is None:
+            return False
+
+        if due_date < dt.date_now(self._profile.utc_offset.value):
             return True
 
         return False
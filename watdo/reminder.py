@@ -1,9 +1,14 @@
+import time
+import math
 import asyncio
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Optional, Set
 import redis
 from watdo import dt
+from watdo.errors import VersionConflict
 from watdo.models import Profile, Task, ScheduledTask
+from watdo.metrics import metrics
 from watdo.database import Database
+from watdo.migrations import migrate_tasks
 from watdo.safe_data import Timestamp
 from watdo.discord.cogs import BaseCog
 from watdo.discord.embeds import TaskEmbed
@@ -11,6 +16,10 @@ from watdo.discord.embeds import TaskEmbed
 if TYPE_CHECKING:
     from watdo.discord import Bot
 
+# Upper bound of a single sleep. Reminders scheduled by this process wake the
+# loop immediately; this only bounds the delay of ones written by others.
+MAX_SLEEP = 5 * 60
+
 
 class Reminder:
     def __init__(
@@ -23,8 +32,24 @@ class Reminder:
         self.db = database
         self.bot = bot
 
+        self._wakeup = asyncio.Event()
+        self._next_wake: Optional[float] = None
+        self._pending: Set[str] = set()
+
+        ScheduledTask.add_reminder_listener(self._on_reminder_scheduled)
+
+    def _on_reminder_scheduled(self, timestamp: float) -> None:
+        if self._next_wake is None or timestamp < self._next_wake:
+            self._wakeup.set()
+
     async def remind(self, task: ScheduledTask[str] | ScheduledTask[float]) -> None:
-        if not task.is_done and task.has_reminder.value:
+        if not task.is_done:
+            await self._send_reminder(task)
+
+    async def _send_reminder(
+        self, task: ScheduledTask[str] | ScheduledTask[float]
+    ) -> None:
+        if task.has_reminder.value:
             channel_id = task.channel_id.value
             user = self.bot.get_user(task.created_by.value)
             channel: Any = (
@@ -41,55 +66,86 @@ class Reminder:
 
             await BaseCog.send(channel, content, embed=embed)
 
-    async def _update_task(
-        self,
-        profile: Profile,
-        task: ScheduledTask[str] | ScheduledTask[float],
-    ) -> None:
+    async def _reschedule(self, profile: Profile, task: Task) -> None:
+        # A reloaded task might not be scheduled anymore
+        if not isinstance(task, ScheduledTask):
+            return
+
         utc_offset = profile.utc_offset.value
+        next_date = None
 
         if task.is_recurring:
-            ts = task.rrule.after(dt.date_now(utc_offset)).timestamp()
-            task.next_reminder = Timestamp(ts)
-        else:
-            task.next_reminder = None
+            # None once the rule has no occurrences left
+            next_date = task.rrule.after(dt.date_now(utc_offset))
 
-        await task.save()
-        await self.remind(task)
-
-        if task.is_auto_done.value:
-            await task.done()
+        if next_date is None:
+            task.next_reminder = None
+        else:
+            task.next_reminder = Timestamp(next_date.timestamp())
 
-    async def _run(self) -> None:
-        while True:
+        # Reminded only once the write went through, since a conflicting
+        # write gets retried. Completing also stores the rescheduled reminder.
+        if task.is_auto_done.value and not task.is_done:
             try:
-                async for key in self.db.iter_keys("tasks:profile.*"):
-                    profile_id = key.split(".")[1]
-                    profile = await Profile.from_id(self.db, profile_id)
+                await task.complete()
+            except ValueError:
+                return
 
-                    if profile is None:
-                        continue
+            await self._send_reminder(task)
+        elif await task.update():
+            await self.remind(task)
 
-                    utc_offset = profile.utc_offset.value
+    async def _update_task(
+        self,
+        profile: Profile,
+        task: ScheduledTask[str] | ScheduledTask[float],
+    ) -> None:
+        if task.next_reminder is not None:
+            lag = time.time() - task.next_reminder.value
+            metrics.reminder_lag.observe(max(lag, 0))
+
+        try:
+            await task.retry_on_conflict(lambda t: self._reschedule(profile, t))
+        except VersionConflict:
+            # Still in the reminders index if it's due, so it's retried later
+            pass
+        finally:
+            self._pending.discard(task.uuid.value)
+
+    async def _sleep_until(self, timestamp: float) -> None:
+        delay = min(timestamp - time.time(), MAX_SLEEP)
+        self._next_wake = time.time() + delay
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+        except asyncio.TimeoutError:
+            pass
 
-                    for task_index, task in enumerate(
-                        await Task.get_tasks_of_profile(self.db, profile)
-                    ):
-                        if not isinstance(task, ScheduledTask):
+    async def _run(self) -> None:
+        while True:
+            # Cleared before reading so reminders scheduled meanwhile aren't missed
+            self._wakeup.clear()
+            self._next_wake = None
+            now = time.time()
+
+            # Tasks created in the block are attributed to the tick as well
+            with metrics.scope("reminder"):
+                try:
+                    for task in await ScheduledTask.get_due_reminders(self.db, now):
+                        if task.uuid.value in self._pending:
                             continue
 
-                        if task.next_reminder is None:
-                            continue
+                        self._pending.add(task.uuid.value)
+                        self.bot.loop.create_task(self._update_task(task.profile, task))
 
-                        if (
-                            task.next_reminder.value
-                            <= dt.date_now(utc_offset).timestamp()
-                        ):
-                            self.bot.loop.create_task(self._update_task(profile, task))
-            except redis.exceptions.ConnectionError:
-                pass
+                    next_time = await ScheduledTask.get_next_reminder_time(self.db, now)
+                except redis.exceptions.ConnectionError:
+                    next_time = now + 60
 
-            await asyncio.sleep(60)
+            await self._sleep_until(next_time or math.inf)
 
     def start(self) -> None:
+        # Index the reminders of profiles that weren't touched since the
+        # task schema changed, otherwise they would never fire
+        self.loop.create_task(migrate_tasks(self.db))
         self.loop.create_task(self._run())
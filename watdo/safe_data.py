@@ -1,26 +1,40 @@
 import codecs
 from abc import ABC, abstractmethod
-from typing import cast, Generic, TypeVar
+from typing import cast, overload, Any, Generic, Optional, Type, TypeVar
 from watdo.errors import InvalidData
 
 T = TypeVar("T")
 N = TypeVar("N", int, float)
+S = TypeVar("S", bound="SafeData[Any]")
 
 
 class SafeData(ABC, Generic[T]):
+    __slots__ = ("_value",)
     is_mutable = False
 
     def __init__(self, value: T) -> None:
         self._value: T
         self._set(value)
 
+    @classmethod
+    def trusted(cls: Type[S], value: Any) -> S:
+        """Wrap a `value` that was already cleaned, without validating it again."""
+        data = cls.__new__(cls)
+        data._value = value
+        return data
+
     @property
     def value(self) -> T:
         return self._value
 
+    @classmethod
+    def clean(cls, value: T) -> T:
+        """Return `value` the way it's kept, raising `InvalidData` if invalid."""
+        cls.validate(value)
+        return value
+
     def _set(self, value: T) -> T:
-        self.validate(value)
-        self._value = value
+        self._value = self.clean(value)
         return self._value
 
     def set(self, value: T) -> T:
@@ -38,11 +52,13 @@ class SafeData(ABC, Generic[T]):
 
 
 class String(SafeData[str], ABC):
+    __slots__ = ()
     min_len: int
     max_len: int
 
-    def _set(self, value: str) -> str:
-        return super()._set(value.strip())
+    @classmethod
+    def clean(cls, value: str) -> str:
+        return super().clean(value.strip())
 
     @classmethod
     def validate(cls, value: str) -> None:
@@ -56,6 +72,7 @@ class String(SafeData[str], ABC):
 
 
 class Number(Generic[N], SafeData[N], ABC):
+    __slots__ = ()
     is_inclusive = True
     min_val: N
     max_val: N
@@ -77,53 +94,70 @@ class Number(Generic[N], SafeData[N], ABC):
 
 
 class Boolean(SafeData[bool]):
+    __slots__ = ()
+
     @classmethod
     def validate(cls, value: bool) -> None:
         pass
 
 
 class UUID(String):
+    __slots__ = ()
     min_len = 32
     max_len = 32
 
 
 class SnowflakeID(Number[int]):
+    __slots__ = ()
     min_val = 10000000000000000
     max_val = 99999999999999999999
 
 
+class Version(Number[int]):
+    __slots__ = ()
+    min_val = 0
+    max_val = 9007199254740992
+
+
 class Timestamp(Number[float]):
+    __slots__ = ()
     min_val = 0
     max_val = 9999999999
 
 
 class UTCOffset(Number[float]):
+    __slots__ = ()
     is_inclusive = False
     min_val = -24
     max_val = 24
 
 
 class UnitRange(Number[float]):
+    __slots__ = ()
     min_val = -1
     max_val = 1
 
 
 class RRuleString(String):
+    __slots__ = ()
     min_len = 7
     max_len = 1000
 
 
 class TaskTitle(String):
+    __slots__ = ()
     min_len = 1
     max_len = 200
 
 
 class TaskCategory(String):
+    __slots__ = ()
     min_len = 0
     max_len = 50
 
 
 class TaskDescription(String):
+    __slots__ = ()
     min_len = 0
     max_len = 4000
 
@@ -132,3 +166,80 @@ class TaskDescription(String):
         desc_bytes = bytes(self.value, "utf-8")
         desc_escaped = codecs.escape_decode(desc_bytes)[0]
         return cast(bytes, desc_escaped).decode("utf-8").rstrip()
+
+
+class Field(Generic[S]):
+    """A model attribute keeping the bare value of a `SafeData` type in a slot.
+
+    Values are validated once when set, from either a bare value or a
+    `SafeData` instance, and wrapped again without validation when read."""
+
+    def __init__(self, data_type: Type[S]) -> None:
+        self.data_type = data_type
+        self.name = ""
+        self._slot = ""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+        self._slot = f"_{name}"
+
+    def _get_data_type(self, value: Any) -> Type[S]:
+        return self.data_type
+
+    @overload
+    def __get__(self, instance: None, owner: type) -> "Field[S]": ...
+
+    @overload
+    def __get__(self, instance: object, owner: type) -> S: ...
+
+    def __get__(self, instance: Optional[object], owner: type) -> "Field[S] | S":
+        if instance is None:
+            return self
+
+        value = getattr(instance, self._slot)
+        return self._get_data_type(value).trusted(value)
+
+    def get_value(self, instance: object) -> Any:
+        """The bare value, without wrapping it."""
+        return getattr(instance, self._slot)
+
+    def __set__(self, instance: object, value: Any) -> None:
+        if isinstance(value, SafeData):
+            if isinstance(value, self._get_data_type(value.value)):
+                # Validated when it was created
+                setattr(instance, self._slot, value.value)
+                return
+
+            # Another type, validated for a different field
+            value = value.value
+
+        setattr(instance, self._slot, self._get_data_type(value).clean(value))
+
+
+class OptionalField(Field[S]):
+    """A `Field` that can also be `None`."""
+
+    @overload  # type: ignore[override]
+    def __get__(self, instance: None, owner: type) -> "OptionalField[S]": ...
+
+    @overload
+    def __get__(self, instance: object, owner: type) -> Optional[S]: ...
+
+    def __get__(
+        self, instance: Optional[object], owner: type
+    ) -> "OptionalField[S] | Optional[S]":
+        if instance is None:
+            return self
+
+        value = getattr(instance, self._slot)
+
+        if value is None:
+            return None
+
+        return self._get_data_type(value).trusted(value)
+
+    def __set__(self, instance: object, value: Any) -> None:
+        if value is None:
+            setattr(instance, self._slot, None)
+        else:
+            super().__set__(instance, value)
@@ -0,0 +1,437 @@
+"""Server-side task operations, each applied atomically in one round trip.
+
+Every task script takes the same keys and leading arguments:
+
+    KEYS: records, meta, titles, categories, reminders, priorities
+    ARGV: category key prefix, task uuid, reminder member, ...
+
+The title, category and priority member a task is indexed under, and its
+version, are kept in the meta hash, so the scripts never need to decode task
+records.
+
+Undone tasks are ranked in the priorities sorted set by their member alone,
+as all of them score 0. Members are computed by `Task` and encoded so that
+they sort in the order `TasksCollection.sort_by_priority` gives. Category
+set keys are derived from the prefix inside the scripts, which is fine on a
+single Redis node but not on a cluster.
+
+Writes take the version the task had when it was loaded and the version it
+is written with. If another write got in first the script changes nothing
+and returns `CONFLICT`. An empty expected version skips that check.
+
+Backends that can't run Lua run the Python twin of each script instead."""
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, Callable, Optional, Sequence, NamedTuple
+
+if TYPE_CHECKING:
+    from watdo.backends.local import SyncStore
+
+
+class Script(NamedTuple):
+    name: str
+    source: str
+    apply: "Callable[[SyncStore, Sequence[str], Sequence[str | bytes]], Any]"
+
+
+_PRELUDE = """
+local records_key = KEYS[1]
+local meta_key = KEYS[2]
+local titles_key = KEYS[3]
+local categories_key = KEYS[4]
+local reminders_key = KEYS[5]
+local priorities_key = KEYS[6]
+local category_prefix = ARGV[1]
+local uuid = ARGV[2]
+local member = ARGV[3]
+
+local function get_meta()
+    local meta = redis.call("HGET", meta_key, uuid)
+
+    if meta then
+        return cjson.decode(meta)
+    end
+
+    return nil
+end
+
+local function unindex_title(title)
+    if redis.call("HGET", titles_key, title) == uuid then
+        redis.call("HDEL", titles_key, title)
+    end
+end
+
+local function unindex_category(category)
+    redis.call("SREM", category_prefix .. category, uuid)
+
+    if redis.call("HINCRBY", categories_key, category, -1) <= 0 then
+        redis.call("HDEL", categories_key, category)
+    end
+end
+
+local function unrank(meta)
+    if meta and meta.priority and meta.priority ~= "" then
+        redis.call("ZREM", priorities_key, meta.priority)
+    end
+end
+
+local function is_conflict(meta, expected_version)
+    if expected_version == "" then
+        return false
+    end
+
+    local version = 0
+
+    if meta and meta.version then
+        version = meta.version
+    end
+
+    return version ~= tonumber(expected_version)
+end
+
+local function upsert(meta, record, title, category, next_reminder, version, priority)
+    redis.call("HSET", records_key, uuid, record)
+
+    if meta and meta.title ~= title then
+        unindex_title(meta.title)
+    end
+
+    redis.call("HSET", titles_key, title, uuid)
+
+    if not meta or meta.category ~= category then
+        if meta then
+            unindex_category(meta.category)
+        end
+
+        redis.call("SADD", category_prefix .. category, uuid)
+        redis.call("HINCRBY", categories_key, category, 1)
+    end
+
+    if next_reminder == "" then
+        redis.call("ZREM", reminders_key, member)
+    else
+        redis.call("ZADD", reminders_key, next_reminder, member)
+    end
+
+    if not meta or meta.priority ~= priority then
+        unrank(meta)
+
+        if priority ~= "" then
+            redis.call("ZADD", priorities_key, 0, priority)
+        end
+    end
+
+    redis.call(
+        "HSET",
+        meta_key,
+        uuid,
+        cjson.encode({
+            title = title,
+            category = category,
+            version = tonumber(version),
+            priority = priority
+        })
+    )
+end
+
+local function remove(meta)
+    redis.call("ZREM", reminders_key, member)
+
+    if meta then
+        unindex_title(meta.title)
+        unindex_category(meta.category)
+        unrank(meta)
+        redis.call("HDEL", meta_key, uuid)
+    end
+
+    return redis.call("HDEL", records_key, uuid)
+end
+"""
+
+CONFLICT = -1
+
+# ARGV: ..., record, title, category, next reminder or "", "1" to only update,
+#   expected version, new version, priority member or "" if done
+# Returns 1 if the task was written, 0 if it had to exist but didn't.
+SAVE_TASK_SOURCE = _PRELUDE + """
+local meta = get_meta()
+
+if ARGV[8] == "1" and not meta then
+    return 0
+end
+
+if is_conflict(meta, ARGV[9]) then
+    return -1
+end
+
+upsert(meta, ARGV[4], ARGV[5], ARGV[6], ARGV[7], ARGV[10], ARGV[11])
+return 1
+"""
+
+# Returns 1 if the task was deleted, 0 if it was already gone.
+DELETE_TASK_SOURCE = _PRELUDE + """
+return remove(get_meta())
+"""
+
+# ARGV: ..., record, title, category, next reminder or "", "1" to keep the task,
+#   expected version, new version, priority member or "" if done
+# Completes a task that still exists: a kept (recurring) task is updated with
+# its new last done time and reminder, any other task is deleted.
+# Returns 1 if the task was completed, 0 if it was already gone.
+COMPLETE_TASK_SOURCE = _PRELUDE + """
+local meta = get_meta()
+
+if not meta then
+    return 0
+end
+
+if is_conflict(meta, ARGV[9]) then
+    return -1
+end
+
+if ARGV[8] == "1" then
+    upsert(meta, ARGV[4], ARGV[5], ARGV[6], ARGV[7], ARGV[10], ARGV[11])
+else
+    remove(meta)
+end
+
+return 1
+"""
+
+
+# ARGV: ..., record as it was read, title, category, next reminder or "", "",
+#   "", version, priority member or "" if done
+# Indexes a task without writing its record, unless a write indexed it since
+# the indexes were cleared. Returns 1 if the task was indexed, 0 if it was
+# indexed already or is gone, or `CONFLICT` if its record changed meanwhile.
+INDEX_TASK_SOURCE = _PRELUDE + """
+if get_meta() then
+    return 0
+end
+
+local record = redis.call("HGET", records_key, uuid)
+
+if not record then
+    return 0
+end
+
+if record ~= ARGV[4] then
+    return -1
+end
+
+upsert(nil, record, ARGV[5], ARGV[6], ARGV[7], ARGV[10], ARGV[11])
+return 1
+"""
+
+
+def _text(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _bytes(value: str | bytes) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+class _TaskWrite:
+    """The Python twin of the Lua prelude."""
+
+    def __init__(
+        self, store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+    ) -> None:
+        self.store = store
+        self.records_key = keys[0]
+        self.meta_key = keys[1]
+        self.titles_key = keys[2]
+        self.categories_key = keys[3]
+        self.reminders_key = keys[4]
+        self.priorities_key = keys[5]
+        self.category_prefix = _text(args[0])
+        self.uuid = _text(args[1])
+        self.member = _text(args[2])
+
+    def get_meta(self) -> Optional[Dict[str, Any]]:
+        meta = self.store.hget(self.meta_key, self.uuid)
+        return None if meta is None else json.loads(meta)
+
+    def unindex_title(self, title: str) -> None:
+        if self.store.hget(self.titles_key, title) == self.uuid.encode():
+            self.store.hdel(self.titles_key, title)
+
+    def unindex_category(self, category: str) -> None:
+        self.store.srem(self.category_prefix + category, self.uuid)
+
+        if self.store.hincrby(self.categories_key, category, -1) <= 0:
+            self.store.hdel(self.categories_key, category)
+
+    def unrank(self, meta: Optional[Dict[str, Any]]) -> None:
+        if meta is not None and meta.get("priority"):
+            self.store.zrem(self.priorities_key, meta["priority"])
+
+    def is_conflict(
+        self, meta: Optional[Dict[str, Any]], expected_version: str | bytes
+    ) -> bool:
+        if _text(expected_version) == "":
+            return False
+
+        version = (meta or {}).get("version") or 0
+        return bool(version != float(expected_version))
+
+    def upsert(
+        self,
+        meta: Optional[Dict[str, Any]],
+        record: str | bytes,
+        title: str | bytes,
+        category: str | bytes,
+        next_reminder: str | bytes,
+        version: str | bytes,
+        priority: str | bytes,
+    ) -> None:
+        title = _text(title)
+        category = _text(category)
+        priority = _text(priority)
+        self.store.hset(self.records_key, key=self.uuid, value=record)
+
+        if meta is not None and meta["title"] != title:
+            self.unindex_title(meta["title"])
+
+        self.store.hset(self.titles_key, key=title, value=self.uuid)
+
+        if meta is None or meta["category"] != category:
+            if meta is not None:
+                self.unindex_category(meta["category"])
+
+            self.store.sadd(self.category_prefix + category, self.uuid)
+            self.store.hincrby(self.categories_key, category, 1)
+
+        if _text(next_reminder) == "":
+            self.store.zrem(self.reminders_key, self.member)
+        else:
+            self.store.zadd(self.reminders_key, {self.member: float(next_reminder)})
+
+        if meta is None or meta.get("priority") != priority:
+            self.unrank(meta)
+
+            if priority != "":
+                self.store.zadd(self.priorities_key, {priority: 0})
+
+        meta = {
+            "title": title,
+            "category": category,
+            "version": int(version),
+            "priority": priority,
+        }
+        self.store.hset(self.meta_key, key=self.uuid, value=json.dumps(meta))
+
+    def remove(self, meta: Optional[Dict[str, Any]]) -> int:
+        self.store.zrem(self.reminders_key, self.member)
+
+        if meta is not None:
+            self.unindex_title(meta["title"])
+            self.unindex_category(meta["category"])
+            self.unrank(meta)
+            self.store.hdel(self.meta_key, self.uuid)
+
+        return self.store.hdel(self.records_key, self.uuid)
+
+
+def _save_task(
+    store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+) -> int:
+    write = _TaskWrite(store, keys, args)
+    meta = write.get_meta()
+
+    if _text(args[7]) == "1" and meta is None:
+        return 0
+
+    if write.is_conflict(meta, args[8]):
+        return CONFLICT
+
+    write.upsert(meta, args[3], args[4], args[5], args[6], args[9], args[10])
+    return 1
+
+
+def _delete_task(
+    store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+) -> int:
+    write = _TaskWrite(store, keys, args)
+    return write.remove(write.get_meta())
+
+
+def _complete_task(
+    store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+) -> int:
+    write = _TaskWrite(store, keys, args)
+    meta = write.get_meta()
+
+    if meta is None:
+        return 0
+
+    if write.is_conflict(meta, args[8]):
+        return CONFLICT
+
+    if _text(args[7]) == "1":
+        write.upsert(meta, args[3], args[4], args[5], args[6], args[9], args[10])
+    else:
+        write.remove(meta)
+
+    return 1
+
+
+def _index_task(
+    store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+) -> int:
+    write = _TaskWrite(store, keys, args)
+
+    if write.get_meta() is not None:
+        return 0
+
+    record = store.hget(write.records_key, write.uuid)
+
+    if record is None:
+        return 0
+
+    if record != _bytes(args[3]):
+        return CONFLICT
+
+    write.upsert(None, record, args[4], args[5], args[6], args[9], args[10])
+    return 1
+
+
+# KEYS: legacy task list, records
+# Copies the legacy list to the records hash, keeping records that already
+# exist as they're newer, then deletes the list. Done in one go so tasks
+# pushed to the list by older processes are never deleted uncopied.
+# Returns how many records were copied.
+MOVE_LEGACY_TASKS_SOURCE = """
+local copied_count = 0
+
+for _, record in ipairs(redis.call("LRANGE", KEYS[1], 0, -1)) do
+    local uuid = cjson.decode(record).uuid
+    copied_count = copied_count + redis.call("HSETNX", KEYS[2], uuid, record)
+end
+
+redis.call("DEL", KEYS[1])
+return copied_count
+"""
+
+
+def _move_legacy_tasks(
+    store: "SyncStore", keys: Sequence[str], args: Sequence[str | bytes]
+) -> int:
+    copied_count = 0
+
+    for record in store.lrange(keys[0], 0, -1):
+        uuid = json.loads(record)["uuid"]
+        copied_count += store.hsetnx(keys[1], uuid, record)
+
+    store.delete(keys[0])
+    return copied_count
+
+
+SAVE_TASK = Script("save_task", SAVE_TASK_SOURCE, _save_task)
+DELETE_TASK = Script("delete_task", DELETE_TASK_SOURCE, _delete_task)
+COMPLETE_TASK = Script("complete_task", COMPLETE_TASK_SOURCE, _complete_task)
+INDEX_TASK = Script("index_task", INDEX_TASK_SOURCE, _index_task)
+MOVE_LEGACY_TASKS = Script(
+    "move_legacy_tasks", MOVE_LEGACY_TASKS_SOURCE, _move_legacy_tasks
+)
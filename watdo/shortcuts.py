@@ -0,0 +1,45 @@
+"""Command shortcuts: named sequences of steps run as if sent one by one."""
+
+import json
+from typing import List, Optional, Sequence, NamedTuple
+
+# Shortcuts used to be stored as the text of their steps joined with this
+LEGACY_SEPARATOR = "==%SEPARATOR%=="
+
+# Bounds of a single shortcut run once nested shortcuts are expanded
+MAX_SHORTCUT_DEPTH = 5
+MAX_SHORTCUT_STEPS = 50
+
+
+class ShortcutStep(NamedTuple):
+    """A command invoked with `args`. When `command` is `None`, `args` is plain
+    text that runs the shortcut it names, if any."""
+
+    command: Optional[str]
+    args: str
+
+    @classmethod
+    def parse(cls, text: str, prefix: str) -> "ShortcutStep":
+        if not text.startswith(prefix):
+            return cls(None, text)
+
+        words = text[len(prefix) :].split(None, 1)
+        return cls(words[0] if words else "", words[1] if len(words) > 1 else "")
+
+    def as_text(self, prefix: str) -> str:
+        if self.command is None:
+            return self.args
+
+        return f"{prefix}{self.command} {self.args}".rstrip()
+
+
+def encode_shortcut(steps: Sequence[ShortcutStep]) -> str:
+    return json.dumps({"steps": [list(s) for s in steps]})
+
+
+def decode_shortcut(raw_data: str) -> List[ShortcutStep]:
+    if raw_data.startswith('{"steps":'):
+        return [ShortcutStep(*s) for s in json.loads(raw_data)["steps"]]
+
+    # Legacy steps get parsed once the command prefix is known
+    return [ShortcutStep(None, text) for text in raw_data.split(LEGACY_SEPARATOR)]